@@ -0,0 +1,76 @@
+# -*-  Mode: Python; -*-
+# /*
+#  * Copyright (c) 2016
+#  *
+#  * This program is free software; you can redistribute it and/or modify
+#  * it under the terms of the GNU General Public License version 2 as
+#  * published by the Free Software Foundation;
+#  *
+#  * This program is distributed in the hope that it will be useful,
+#  * but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  * GNU General Public License for more details.
+#  *
+#  * You should have received a copy of the GNU General Public License
+#  * along with this program; if not, write to the Free Software
+#  * Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#  */
+
+# Converts a binary trace of tcp-variants-comparison --tracing to the text
+# files the example used to write for its first flow, one "time value" line
+# per change:
+#
+#   python tcp-trace-convert.py TcpVariantsComparison-trace.bin
+#
+# writes TcpVariantsComparison-cwnd.data, -ssth.data, -rtt.data, -rto.data,
+# -next-tx.data, -inflight.data and -next-rx.data next to it (or with the
+# --prefix given).  The trace is read in blocks; --flow selects another flow
+# (the index of its source) and --metrics a subset of the files.
+
+import argparse
+import sys
+
+from tcp_trace import METRICS, TcpTrace, text_line
+
+
+def convert (path, prefix, metrics=None, flow=0):
+    """Write prefix-<metric>.data of flow (None: every flow) for every metric;
+    returns {metric: lines}."""
+    metrics = metrics or METRICS
+    files = dict ((name, open ("%s-%s.data" % (prefix, name), "w")) for name in metrics)
+    counts = dict ((name, 0) for name in metrics)
+    try:
+        for record in TcpTrace (path).records ():
+            name = METRICS[record[2]]
+            if name in files and (flow is None or record[1] == flow):
+                files[name].write (text_line (record) + "\n")
+                counts[name] += 1
+    finally:
+        for f in files.values ():
+            f.close ()
+    return counts
+
+
+def main (argv):
+    parser = argparse.ArgumentParser (description="Convert a tcp-variants-comparison trace to .data text files")
+    parser.add_argument ("trace", help="binary trace (<prefix>-trace.bin)")
+    parser.add_argument ("--prefix", help="prefix of the text files (default: from the trace name)")
+    parser.add_argument ("--flow", type=int, default=0, help="flow to convert (default: 0)")
+    parser.add_argument ("--metrics", default=",".join (METRICS),
+                         help="comma separated metrics among %s" % ",".join (METRICS))
+    args = parser.parse_args (argv[1:])
+
+    metrics = args.metrics.split (",")
+    for name in metrics:
+        if name not in METRICS:
+            parser.error ("unknown metric %s" % name)
+    prefix = args.prefix
+    if prefix is None:
+        prefix = args.trace[:-len ("-trace.bin")] if args.trace.endswith ("-trace.bin") else args.trace
+    counts = convert (args.trace, prefix, metrics, args.flow)
+    for name in metrics:
+        print ("%s-%s.data: %d lines" % (prefix, name, counts[name]))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit (main (sys.argv))
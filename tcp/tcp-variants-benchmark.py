@@ -0,0 +1,111 @@
+# -*-  Mode: Python; -*-
+# /*
+#  * Copyright (c) 2016
+#  *
+#  * This program is free software; you can redistribute it and/or modify
+#  * it under the terms of the GNU General Public License version 2 as
+#  * published by the Free Software Foundation;
+#  *
+#  * This program is distributed in the hope that it will be useful,
+#  * but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  * GNU General Public License for more details.
+#  *
+#  * You should have received a copy of the GNU General Public License
+#  * along with this program; if not, write to the Free Software
+#  * Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#  */
+
+# Setup time and peak memory of tcp-variants-comparison against the number of
+# flows.
+#
+# For every --flows count the example is run --repeat times with
+# --timing=true --build_only=true and the median setup time it prints and the
+# median peak resident set size of the process (from os.wait4) are reported;
+# --run also runs the simulations (--duration seconds) and reports their run
+# time.  --routing selects the routing of the example (static: linear setup).
+# --save writes the curve as JSON lines, one record per count.
+#
+#   python examples/tcp/tcp-variants-benchmark.py --flows 10,100,1000,10000 --routing static
+#
+# The example is run through "./waf --run" from the ns-3 directory (--ns3),
+# which adds waf to the measured memory; --binary runs the built program
+# directly instead.
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+
+_SETUP = re.compile (r"Setup time: ([0-9.]+) s")
+_RUN = re.compile (r"Run time: ([0-9.]+) s")
+
+
+def _median (values):
+    values = sorted (values)
+    n = len (values)
+    if n % 2:
+        return values[n // 2]
+    return (values[n // 2 - 1] + values[n // 2]) / 2.0
+
+
+def command (flows, options, binary=None):
+    """Command line running tcp-variants-comparison with flows flows and options."""
+    options = ["--num_flows=%d" % flows, "--timing=true"] + options
+    if binary:
+        return [binary] + options
+    return ["./waf", "--run", " ".join (["tcp-variants-comparison"] + options)]
+
+
+def measure (flows, repeat, run, options, binary=None, cwd=None):
+    """Median (setup time in s, peak RSS in MB, run time in s or None)."""
+    args = command (flows, options + ["--build_only=%s" % ("false" if run else "true")], binary)
+    setups = []
+    rss = []
+    runs = []
+    for i in range (repeat):
+        child = subprocess.Popen (args, cwd=cwd, stdout=subprocess.PIPE)
+        output = child.stdout.read ().decode ("utf-8", "replace")
+        child.stdout.close ()
+        pid, status, usage = os.wait4 (child.pid, 0)
+        setup = _SETUP.search (output)
+        if status != 0 or setup is None:
+            raise RuntimeError ("%s exited with status %d" % (" ".join (args), status))
+        setups.append (float (setup.group (1)))
+        # ru_maxrss is in kB on Linux
+        rss.append (usage.ru_maxrss / 1024.0)
+        if run:
+            runs.append (float (_RUN.search (output).group (1)))
+    return _median (setups), _median (rss), _median (runs) if runs else None
+
+
+def main (argv):
+    parser = argparse.ArgumentParser (description="Setup time and peak memory of tcp-variants-comparison")
+    parser.add_argument ("--flows", default="10,100,1000,10000", help="comma separated numbers of flows")
+    parser.add_argument ("--routing", default="static", choices=["global", "static"])
+    parser.add_argument ("--repeat", type=int, default=3)
+    parser.add_argument ("--run", action="store_true", help="also run the simulations")
+    parser.add_argument ("--duration", type=float, default=10.0, help="simulated seconds with --run")
+    parser.add_argument ("--ns3", default=".", help="ns-3 directory, where waf is run")
+    parser.add_argument ("--binary", help="built tcp-variants-comparison program, run instead of waf")
+    parser.add_argument ("--save", help="write the results to this JSON lines file")
+    args = parser.parse_args (argv[1:])
+
+    options = ["--routing=%s" % args.routing, "--duration=%g" % args.duration]
+    out = open (args.save, "w") if args.save else None
+    print ("%-8s %12s %14s %12s %10s" % ("flows", "setup (s)", "us per flow", "peak (MB)", "run (s)"))
+    for flows in [int (n) for n in args.flows.split (",")]:
+        setup, rss, run = measure (flows, args.repeat, args.run, options, args.binary, args.ns3)
+        print ("%-8d %12.3f %14.1f %12.1f %10s" % (flows, setup, setup / flows * 1e6, rss,
+                                                   "%.3f" % run if run is not None else "-"))
+        if out is not None:
+            out.write (json.dumps ({"flows": flows, "routing": args.routing, "setup": setup,
+                                    "peakRss": rss, "run": run}, sort_keys=True) + "\n")
+    if out is not None:
+        out.close ()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit (main (sys.argv))
@@ -36,6 +36,11 @@
 #include <iostream>
 #include <fstream>
 #include <string>
+#include <sstream>
+#include <vector>
+#include <list>
+#include <algorithm>
+#include <cmath>
 
 #include "ns3/core-module.h"
 #include "ns3/network-module.h"
@@ -49,156 +54,535 @@
 #include "ns3/event-id.h"
 #include "ns3/flow-monitor-helper.h"
 #include "ns3/ipv4-global-routing-helper.h"
+#include "ns3/ipv4-static-routing-helper.h"
+#include "ns3/system-wallclock-ms.h"
 #include "ns3/traffic-control-module.h"
+#include "ns3/ipv4-queue-disc-item.h"
 
 using namespace ns3;
 
 NS_LOG_COMPONENT_DEFINE ("TcpVariantsComparison");
 
-bool firstCwnd = true;
-bool firstSshThr = true;
-bool firstRtt = true;
-bool firstRto = true;
-Ptr<OutputStreamWrapper> cWndStream;
-Ptr<OutputStreamWrapper> ssThreshStream;
-Ptr<OutputStreamWrapper> rttStream;
-Ptr<OutputStreamWrapper> rtoStream;
-Ptr<OutputStreamWrapper> nextTxStream;
-Ptr<OutputStreamWrapper> nextRxStream;
-Ptr<OutputStreamWrapper> inFlightStream;
-uint32_t cWndValue;
-uint32_t ssThreshValue;
+/*
+ * Tracing (--tracing) writes every congestion window, slow start threshold,
+ * RTT, RTO, next tx sequence, bytes in flight and next rx sequence change of
+ * every flow as a fixed-size binary record (time, flow, metric, value), the
+ * flow being the index of its source, into one in-memory buffer of
+ * TraceWriter, written to <prefix>-trace.bin in blocks of --trace_buffer
+ * records instead of one flushed text line per change.  tcp-trace-convert.py
+ * writes the <prefix>-cwnd.data, -ssth.data, ... text files of a flow from
+ * it, and tcp_trace.py loads a metric directly as arrays.
+ *
+ * File layout: the magic "NSTCPTR1", uint32 0x01020304 (byte order check),
+ * uint32 record size (24), then the records:
+ *   double time (s), uint32 flow, uint16 metric, uint16 flags, double value
+ * flags bit 0 marks the initial value of a metric, reported at time 0.
+ */
+class TraceWriter
+{
+public:
+  enum Metric
+  {
+    CWND = 0,
+    SSTHRESH,
+    RTT,
+    RTO,
+    NEXT_TX,
+    IN_FLIGHT,
+    NEXT_RX
+  };
+
+  TraceWriter ();
+  ~TraceWriter ();
+  void Open (std::string fileName, uint32_t bufferRecords);
+  void Write (uint32_t flow, Metric metric, double value, bool initial = false);
+  void Close ();
+
+private:
+  struct Record
+  {
+    double time;
+    uint32_t flow;
+    uint16_t metric;
+    uint16_t flags;
+    double value;
+  };
+
+  void Flush ();
+
+  std::ofstream m_file;
+  std::vector<Record> m_buffer;
+  std::size_t m_count;
+};
+
+TraceWriter::TraceWriter ()
+  : m_count (0)
+{
+}
+
+TraceWriter::~TraceWriter ()
+{
+  Close ();
+}
+
+void
+TraceWriter::Open (std::string fileName, uint32_t bufferRecords)
+{
+  m_file.open (fileName.c_str (), std::ios::out | std::ios::binary);
+  NS_ABORT_MSG_UNLESS (m_file.is_open (), "Cannot open " << fileName);
+  m_buffer.resize (std::max (bufferRecords, 1u));
+  m_count = 0;
+  uint32_t order = 0x01020304;
+  uint32_t recordSize = sizeof (Record);
+  m_file.write ("NSTCPTR1", 8);
+  m_file.write (reinterpret_cast<const char *> (&order), sizeof (order));
+  m_file.write (reinterpret_cast<const char *> (&recordSize), sizeof (recordSize));
+}
+
+void
+TraceWriter::Write (uint32_t flow, Metric metric, double value, bool initial)
+{
+  Record &record = m_buffer[m_count];
+  record.time = initial ? 0.0 : Simulator::Now ().GetSeconds ();
+  record.flow = flow;
+  record.metric = metric;
+  record.flags = initial ? 1 : 0;
+  record.value = value;
+  if (++m_count == m_buffer.size ())
+    {
+      Flush ();
+    }
+}
+
+void
+TraceWriter::Flush ()
+{
+  if (m_count > 0)
+    {
+      m_file.write (reinterpret_cast<const char *> (&m_buffer[0]), m_count * sizeof (Record));
+      m_count = 0;
+    }
+}
+
+void
+TraceWriter::Close ()
+{
+  if (m_file.is_open ())
+    {
+      Flush ();
+      m_file.close ();
+    }
+}
+
+TraceWriter traceWriter;
+
+// Values of transport_prot
+const char *tcpVariants[] = {
+  "ns3::TcpNewReno", "ns3::TcpWestwood", "ns3::TcpWestwoodPlus", "ns3::TcpHybla",
+  "ns3::TcpHighSpeed", "ns3::TcpHtcp", "ns3::TcpVegas", "ns3::TcpVeno",
+  "ns3::TcpBic", "ns3::TcpScalable", "ns3::TcpYeah", "ns3::TcpIllinois"
+};
+
+/*
+ * Trace state of one flow, bound to the trace callbacks of its sockets, so
+ * that every change is written under the flow id (the index of the source)
+ * at a constant cost whatever the number of flows.
+ */
+struct FlowTrace
+{
+  uint32_t flow;
+  bool firstCwnd;
+  bool firstSshThr;
+  bool firstRtt;
+  bool firstRto;
+  bool sinkTraced;
+  uint32_t cWndValue;
+  uint32_t ssThreshValue;
+};
+
+std::vector<FlowTrace> flowTraces;
 
 
 static void
-CwndTracer (uint32_t oldval, uint32_t newval)
+CwndTracer (FlowTrace *trace, uint32_t oldval, uint32_t newval)
 {
-  if (firstCwnd)
+  if (trace->firstCwnd)
     {
-      *cWndStream->GetStream () << "0.0 " << oldval << std::endl;
-      firstCwnd = false;
+      traceWriter.Write (trace->flow, TraceWriter::CWND, oldval, true);
+      trace->firstCwnd = false;
     }
-  *cWndStream->GetStream () << Simulator::Now ().GetSeconds () << " " << newval << std::endl;
-  cWndValue = newval;
+  traceWriter.Write (trace->flow, TraceWriter::CWND, newval);
+  trace->cWndValue = newval;
 
-  if (!firstSshThr)
+  if (!trace->firstSshThr)
     {
-      *ssThreshStream->GetStream () << Simulator::Now ().GetSeconds () << " " << ssThreshValue << std::endl;
+      traceWriter.Write (trace->flow, TraceWriter::SSTHRESH, trace->ssThreshValue);
     }
 }
 
 static void
-SsThreshTracer (uint32_t oldval, uint32_t newval)
+SsThreshTracer (FlowTrace *trace, uint32_t oldval, uint32_t newval)
 {
-  if (firstSshThr)
+  if (trace->firstSshThr)
     {
-      *ssThreshStream->GetStream () << "0.0 " << oldval << std::endl;
-      firstSshThr = false;
+      traceWriter.Write (trace->flow, TraceWriter::SSTHRESH, oldval, true);
+      trace->firstSshThr = false;
     }
-  *ssThreshStream->GetStream () << Simulator::Now ().GetSeconds () << " " << newval << std::endl;
-  ssThreshValue = newval;
+  traceWriter.Write (trace->flow, TraceWriter::SSTHRESH, newval);
+  trace->ssThreshValue = newval;
 
-  if (!firstCwnd)
+  if (!trace->firstCwnd)
     {
-      *cWndStream->GetStream () << Simulator::Now ().GetSeconds () << " " << cWndValue << std::endl;
+      traceWriter.Write (trace->flow, TraceWriter::CWND, trace->cWndValue);
     }
 }
 
 static void
-RttTracer (Time oldval, Time newval)
+RttTracer (FlowTrace *trace, Time oldval, Time newval)
 {
-  if (firstRtt)
+  if (trace->firstRtt)
     {
-      *rttStream->GetStream () << "0.0 " << oldval.GetSeconds () << std::endl;
-      firstRtt = false;
+      traceWriter.Write (trace->flow, TraceWriter::RTT, oldval.GetSeconds (), true);
+      trace->firstRtt = false;
     }
-  *rttStream->GetStream () << Simulator::Now ().GetSeconds () << " " << newval.GetSeconds () << std::endl;
+  traceWriter.Write (trace->flow, TraceWriter::RTT, newval.GetSeconds ());
 }
 
 static void
-RtoTracer (Time oldval, Time newval)
+RtoTracer (FlowTrace *trace, Time oldval, Time newval)
 {
-  if (firstRto)
+  if (trace->firstRto)
     {
-      *rtoStream->GetStream () << "0.0 " << oldval.GetSeconds () << std::endl;
-      firstRto = false;
+      traceWriter.Write (trace->flow, TraceWriter::RTO, oldval.GetSeconds (), true);
+      trace->firstRto = false;
     }
-  *rtoStream->GetStream () << Simulator::Now ().GetSeconds () << " " << newval.GetSeconds () << std::endl;
+  traceWriter.Write (trace->flow, TraceWriter::RTO, newval.GetSeconds ());
 }
 
 static void
-NextTxTracer (SequenceNumber32 old, SequenceNumber32 nextTx)
+NextTxTracer (FlowTrace *trace, SequenceNumber32 old, SequenceNumber32 nextTx)
 {
-  *nextTxStream->GetStream () << Simulator::Now ().GetSeconds () << " " << nextTx << std::endl;
+  traceWriter.Write (trace->flow, TraceWriter::NEXT_TX, nextTx.GetValue ());
 }
 
 static void
-InFlightTracer (uint32_t old, uint32_t inFlight)
+InFlightTracer (FlowTrace *trace, uint32_t old, uint32_t inFlight)
 {
-  *inFlightStream->GetStream () << Simulator::Now ().GetSeconds () << " " << inFlight << std::endl;
+  traceWriter.Write (trace->flow, TraceWriter::IN_FLIGHT, inFlight);
 }
 
 static void
-NextRxTracer (SequenceNumber32 old, SequenceNumber32 nextRx)
+NextRxTracer (FlowTrace *trace, SequenceNumber32 old, SequenceNumber32 nextRx)
 {
-  *nextRxStream->GetStream () << Simulator::Now ().GetSeconds () << " " << nextRx << std::endl;
+  traceWriter.Write (trace->flow, TraceWriter::NEXT_RX, nextRx.GetValue ());
 }
 
+// Scheduled right after the BulkSendApplication of the flow has started,
+// i.e. once it has created its socket
 static void
-TraceCwnd (std::string cwnd_tr_file_name)
+TraceSource (Ptr<BulkSendApplication> app, FlowTrace *trace)
 {
-  AsciiTraceHelper ascii;
-  cWndStream = ascii.CreateFileStream (cwnd_tr_file_name.c_str ());
-  Config::ConnectWithoutContext ("/NodeList/1/$ns3::TcpL4Protocol/SocketList/0/CongestionWindow", MakeCallback (&CwndTracer));
+  Ptr<Socket> socket = app->GetSocket ();
+  NS_ABORT_MSG_UNLESS (socket, "BulkSendApplication of flow " << trace->flow << " has no socket");
+  socket->TraceConnectWithoutContext ("CongestionWindow", MakeBoundCallback (&CwndTracer, trace));
+  socket->TraceConnectWithoutContext ("SlowStartThreshold", MakeBoundCallback (&SsThreshTracer, trace));
+  socket->TraceConnectWithoutContext ("RTT", MakeBoundCallback (&RttTracer, trace));
+  socket->TraceConnectWithoutContext ("RTO", MakeBoundCallback (&RtoTracer, trace));
+  socket->TraceConnectWithoutContext ("NextTxSequence", MakeBoundCallback (&NextTxTracer, trace));
+  socket->TraceConnectWithoutContext ("BytesInFlight", MakeBoundCallback (&InFlightTracer, trace));
 }
 
+static void SinkRxTracer (FlowTrace *trace, PacketSink *sink, Ptr<const Packet> packet, const Address &from);
+
 static void
-TraceSsThresh (std::string ssthresh_tr_file_name)
+UntraceSink (FlowTrace *trace, PacketSink *sink)
 {
-  AsciiTraceHelper ascii;
-  ssThreshStream = ascii.CreateFileStream (ssthresh_tr_file_name.c_str ());
-  Config::ConnectWithoutContext ("/NodeList/1/$ns3::TcpL4Protocol/SocketList/0/SlowStartThreshold", MakeCallback (&SsThreshTracer));
+  sink->TraceDisconnectWithoutContext ("Rx", MakeBoundCallback (&SinkRxTracer, trace, sink));
 }
 
+// Rx trace of the PacketSinks of the sink node of a flow: the first packet
+// received comes from the socket the sink accepted for the flow.  PacketSink
+// has no trace of its accepted sockets, so the receive buffer of the socket is
+// traced from here on.  The first data segment changed NextRxSequence in this
+// same event, so its current value is written now, and the value it had when
+// the connection was accepted (what the sink has read, less this packet) as
+// the initial one.  The sink is bound as a plain pointer, as it owns this
+// callback, and the callback is disconnected once the sink is done calling it.
 static void
-TraceRtt (std::string rtt_tr_file_name)
+SinkRxTracer (FlowTrace *trace, PacketSink *sink, Ptr<const Packet> packet, const Address &from)
 {
-  AsciiTraceHelper ascii;
-  rttStream = ascii.CreateFileStream (rtt_tr_file_name.c_str ());
-  Config::ConnectWithoutContext ("/NodeList/1/$ns3::TcpL4Protocol/SocketList/0/RTT", MakeCallback (&RttTracer));
+  if (trace->sinkTraced)
+    {
+      return;
+    }
+  std::list<Ptr<Socket> > sockets = sink->GetAcceptedSockets ();
+  NS_ABORT_MSG_IF (sockets.empty (), "PacketSink of flow " << trace->flow << " has no accepted socket");
+  Ptr<TcpRxBuffer> rxBuffer = DynamicCast<TcpSocketBase> (sockets.back ())->GetRxBuffer ();
+  traceWriter.Write (trace->flow, TraceWriter::NEXT_RX,
+                     (rxBuffer->HeadSequence () - packet->GetSize ()).GetValue (), true);
+  traceWriter.Write (trace->flow, TraceWriter::NEXT_RX, rxBuffer->NextRxSequence ().GetValue ());
+  rxBuffer->TraceConnectWithoutContext ("NextRxSequence", MakeBoundCallback (&NextRxTracer, trace));
+  trace->sinkTraced = true;
+  Simulator::ScheduleNow (&UntraceSink, trace, sink);
 }
 
+// Trace flow, from the BulkSendApplication source to the PacketSinks of sinkNode
 static void
-TraceRto (std::string rto_tr_file_name)
+TraceFlow (FlowTrace *trace, Ptr<Application> source, Ptr<Node> sinkNode)
 {
-  AsciiTraceHelper ascii;
-  rtoStream = ascii.CreateFileStream (rto_tr_file_name.c_str ());
-  Config::ConnectWithoutContext ("/NodeList/1/$ns3::TcpL4Protocol/SocketList/0/RTO", MakeCallback (&RtoTracer));
+  TimeValue start;
+  source->GetAttribute ("StartTime", start);
+  Simulator::Schedule (start.Get () + NanoSeconds (1), &TraceSource,
+                       DynamicCast<BulkSendApplication> (source), trace);
+  for (uint32_t j = 0; j < sinkNode->GetNApplications (); j++)
+    {
+      Ptr<PacketSink> sink = DynamicCast<PacketSink> (sinkNode->GetApplication (j));
+      if (sink)
+        {
+          sink->TraceConnectWithoutContext ("Rx", MakeBoundCallback (&SinkRxTracer, trace, PeekPointer (sink)));
+        }
+    }
 }
 
+// Assign the /30 network to the two ends of a point-to-point link
 static void
-TraceNextTx (std::string &next_tx_seq_file_name)
+AssignLink (NetDeviceContainer devices, uint32_t network)
 {
-  AsciiTraceHelper ascii;
-  nextTxStream = ascii.CreateFileStream (next_tx_seq_file_name.c_str ());
-  Config::ConnectWithoutContext ("/NodeList/1/$ns3::TcpL4Protocol/SocketList/0/NextTxSequence", MakeCallback (&NextTxTracer));
+  for (uint32_t j = 0; j < devices.GetN (); j++)
+    {
+      Ptr<NetDevice> device = devices.Get (j);
+      Ptr<Ipv4> ipv4 = device->GetNode ()->GetObject<Ipv4> ();
+      int32_t interface = ipv4->AddInterface (device);
+      ipv4->AddAddress (interface, Ipv4InterfaceAddress (Ipv4Address (network + 1 + j), Ipv4Mask (0xfffffffc)));
+      ipv4->SetMetric (interface, 1);
+      ipv4->SetUp (interface);
+    }
 }
 
 static void
-TraceInFlight (std::string &in_flight_file_name)
+DefaultRoute (Ptr<Node> node, uint32_t gateway)
+{
+  Ipv4StaticRoutingHelper staticRouting;
+  Ptr<Ipv4StaticRouting> routing = staticRouting.GetStaticRouting (node->GetObject<Ipv4> ());
+  routing->SetDefaultRoute (Ipv4Address (gateway), 1);
+}
+
+/*
+ * Queue disc monitoring (--queue_monitor) of the bottleneck queue disc of
+ * every flow at the gateway, at a memory cost that does not depend on the
+ * length of the run:
+ *  - the backlog (packets and bytes) is sampled every --queue_interval
+ *    seconds into a buffer of --queue_samples samples; when it is full,
+ *    every other sample is dropped and the interval doubled;
+ *  - every enqueued packet gets a SojournTag with its enqueue time, and its
+ *    sojourn time is counted at dequeue into a histogram of SOJOURN_BINS
+ *    logarithmic bins, SOJOURN_BINS_PER_DECADE per decade from 1 us;
+ *  - drops are counted, and marks as the dequeued packets carrying ECN CE.
+ * At the end, queue disc i is written to <prefix>-queue-<i>-backlog.data
+ * ("time packets bytes" lines) and <prefix>-queue-<i>-sojourn.data ("lower
+ * bin edge in seconds, count" lines), with a summary line on stdout.
+ */
+class SojournTag : public Tag
+{
+public:
+  static TypeId GetTypeId (void);
+  virtual TypeId GetInstanceTypeId (void) const;
+  virtual uint32_t GetSerializedSize (void) const;
+  virtual void Serialize (TagBuffer i) const;
+  virtual void Deserialize (TagBuffer i);
+  virtual void Print (std::ostream &os) const;
+
+  void SetEnqueueTime (Time time);
+  Time GetEnqueueTime (void) const;
+
+private:
+  int64_t m_enqueueTime;
+};
+
+TypeId
+SojournTag::GetTypeId (void)
 {
-  AsciiTraceHelper ascii;
-  inFlightStream = ascii.CreateFileStream (in_flight_file_name.c_str ());
-  Config::ConnectWithoutContext ("/NodeList/1/$ns3::TcpL4Protocol/SocketList/0/BytesInFlight", MakeCallback (&InFlightTracer));
+  static TypeId tid = TypeId ("SojournTag")
+    .SetParent<Tag> ()
+    .AddConstructor<SojournTag> ()
+  ;
+  return tid;
 }
 
+TypeId
+SojournTag::GetInstanceTypeId (void) const
+{
+  return GetTypeId ();
+}
 
-static void
-TraceNextRx (std::string &next_rx_seq_file_name)
+uint32_t
+SojournTag::GetSerializedSize (void) const
+{
+  return 8;
+}
+
+void
+SojournTag::Serialize (TagBuffer i) const
+{
+  i.WriteU64 (m_enqueueTime);
+}
+
+void
+SojournTag::Deserialize (TagBuffer i)
+{
+  m_enqueueTime = i.ReadU64 ();
+}
+
+void
+SojournTag::Print (std::ostream &os) const
+{
+  os << "enqueued=" << TimeStep (m_enqueueTime);
+}
+
+void
+SojournTag::SetEnqueueTime (Time time)
+{
+  m_enqueueTime = time.GetTimeStep ();
+}
+
+Time
+SojournTag::GetEnqueueTime (void) const
+{
+  return TimeStep (m_enqueueTime);
+}
+
+const uint32_t SOJOURN_BINS = 80;
+const uint32_t SOJOURN_BINS_PER_DECADE = 10;
+
+class QueueDiscMonitor : public SimpleRefCount<QueueDiscMonitor>
+{
+public:
+  QueueDiscMonitor (Ptr<QueueDisc> queueDisc, Time interval, uint32_t samples);
+  void Write (std::string prefix, uint32_t index) const;
+
+private:
+  void Sample (void);
+  void Enqueue (Ptr<const QueueItem> item);
+  void Dequeue (Ptr<const QueueItem> item);
+  void Drop (Ptr<const QueueItem> item);
+
+  Ptr<QueueDisc> m_queueDisc;
+  Time m_interval;
+  std::vector<double> m_times;
+  std::vector<uint32_t> m_packets;
+  std::vector<uint32_t> m_bytes;
+  std::size_t m_capacity;
+  std::vector<uint64_t> m_sojourn;
+  uint64_t m_dequeued;
+  double m_sojournSum;
+  double m_sojournMax;
+  uint64_t m_drops;
+  uint64_t m_marks;
+};
+
+QueueDiscMonitor::QueueDiscMonitor (Ptr<QueueDisc> queueDisc, Time interval, uint32_t samples)
+  : m_queueDisc (queueDisc),
+    m_interval (interval),
+    m_capacity (std::max (samples, 2u) & ~1u),
+    m_sojourn (SOJOURN_BINS, 0),
+    m_dequeued (0),
+    m_sojournSum (0),
+    m_sojournMax (0),
+    m_drops (0),
+    m_marks (0)
+{
+  m_times.reserve (m_capacity);
+  m_packets.reserve (m_capacity);
+  m_bytes.reserve (m_capacity);
+  queueDisc->TraceConnectWithoutContext ("Enqueue", MakeCallback (&QueueDiscMonitor::Enqueue, this));
+  queueDisc->TraceConnectWithoutContext ("Dequeue", MakeCallback (&QueueDiscMonitor::Dequeue, this));
+  queueDisc->TraceConnectWithoutContext ("Drop", MakeCallback (&QueueDiscMonitor::Drop, this));
+  Simulator::ScheduleNow (&QueueDiscMonitor::Sample, this);
+}
+
+void
+QueueDiscMonitor::Sample (void)
+{
+  m_times.push_back (Simulator::Now ().GetSeconds ());
+  m_packets.push_back (m_queueDisc->GetNPackets ());
+  m_bytes.push_back (m_queueDisc->GetNBytes ());
+  Time next = m_interval;
+  if (m_times.size () == m_capacity)
+    {
+      // Keep the samples at even multiples of the interval, and double it
+      // from the next sample on, which is the next even multiple
+      for (std::size_t j = 0; j < m_capacity / 2; j++)
+        {
+          m_times[j] = m_times[2 * j];
+          m_packets[j] = m_packets[2 * j];
+          m_bytes[j] = m_bytes[2 * j];
+        }
+      m_times.resize (m_capacity / 2);
+      m_packets.resize (m_capacity / 2);
+      m_bytes.resize (m_capacity / 2);
+      m_interval = m_interval * 2;
+    }
+  Simulator::Schedule (next, &QueueDiscMonitor::Sample, this);
+}
+
+void
+QueueDiscMonitor::Enqueue (Ptr<const QueueItem> item)
 {
-  AsciiTraceHelper ascii;
-  nextRxStream = ascii.CreateFileStream (next_rx_seq_file_name.c_str ());
-  Config::ConnectWithoutContext ("/NodeList/2/$ns3::TcpL4Protocol/SocketList/1/RxBuffer/NextRxSequence", MakeCallback (&NextRxTracer));
+  SojournTag tag;
+  item->GetPacket ()->RemovePacketTag (tag);
+  tag.SetEnqueueTime (Simulator::Now ());
+  item->GetPacket ()->AddPacketTag (tag);
+}
+
+void
+QueueDiscMonitor::Dequeue (Ptr<const QueueItem> item)
+{
+  SojournTag tag;
+  if (item->GetPacket ()->RemovePacketTag (tag))
+    {
+      double sojourn = (Simulator::Now () - tag.GetEnqueueTime ()).GetSeconds ();
+      int32_t bin = 0;
+      if (sojourn > 1e-6)
+        {
+          bin = std::min<int32_t> (SOJOURN_BINS - 1, std::floor (std::log10 (sojourn / 1e-6) * SOJOURN_BINS_PER_DECADE));
+        }
+      m_sojourn[bin]++;
+      m_dequeued++;
+      m_sojournSum += sojourn;
+      m_sojournMax = std::max (m_sojournMax, sojourn);
+    }
+  Ptr<const Ipv4QueueDiscItem> ipv4Item = DynamicCast<const Ipv4QueueDiscItem> (item);
+  if (ipv4Item && ipv4Item->GetHeader ().GetEcn () == Ipv4Header::ECN_CE)
+    {
+      m_marks++;
+    }
+}
+
+void
+QueueDiscMonitor::Drop (Ptr<const QueueItem> item)
+{
+  m_drops++;
+}
+
+void
+QueueDiscMonitor::Write (std::string prefix, uint32_t index) const
+{
+  std::ostringstream name;
+  name << prefix << "-queue-" << index;
+  std::ofstream backlog ((name.str () + "-backlog.data").c_str ());
+  for (std::size_t j = 0; j < m_times.size (); j++)
+    {
+      backlog << m_times[j] << " " << m_packets[j] << " " << m_bytes[j] << "\n";
+    }
+  std::ofstream sojourn ((name.str () + "-sojourn.data").c_str ());
+  for (uint32_t bin = 0; bin < SOJOURN_BINS; bin++)
+    {
+      sojourn << 1e-6 * std::pow (10.0, double (bin) / SOJOURN_BINS_PER_DECADE) << " " << m_sojourn[bin] << "\n";
+    }
+  std::cout << "Queue " << index << ": " << m_drops << " drops, " << m_marks << " marks, "
+            << m_dequeued << " dequeued, mean sojourn "
+            << (m_dequeued ? m_sojournSum / m_dequeued : 0.0) << " s, max sojourn "
+            << m_sojournMax << " s" << std::endl;
 }
 
 int main (int argc, char *argv[])
@@ -219,6 +603,13 @@ int main (int argc, char *argv[])
   bool flow_monitor = false;
   bool pcap = false;
   std::string queue_disc_type = "ns3::PfifoFastQueueDisc";
+  uint32_t trace_buffer = 1 << 16;
+  std::string routing = "global";
+  bool timing = false;
+  bool build_only = false;
+  bool queue_monitor = false;
+  double queue_interval = 0.01;
+  uint32_t queue_samples = 4096;
 
 
   CommandLine cmd;
@@ -240,8 +631,18 @@ int main (int argc, char *argv[])
   cmd.AddValue ("flow_monitor", "Enable flow monitor", flow_monitor);
   cmd.AddValue ("pcap_tracing", "Enable or disable PCAP tracing", pcap);
   cmd.AddValue ("queue_disc_type", "Queue disc type for gateway (e.g. ns3::CoDelQueueDisc)", queue_disc_type);
+  cmd.AddValue ("trace_buffer", "Number of trace records buffered before writing them", trace_buffer);
+  cmd.AddValue ("routing", "Routing: global or static (linear setup for many flows)", routing);
+  cmd.AddValue ("timing", "Print the setup and run times", timing);
+  cmd.AddValue ("build_only", "Build the topology and applications without running", build_only);
+  cmd.AddValue ("queue_monitor", "Monitor backlog, sojourn time, drops and marks of the bottleneck queue discs", queue_monitor);
+  cmd.AddValue ("queue_interval", "Backlog sampling interval of the queue monitor in seconds", queue_interval);
+  cmd.AddValue ("queue_samples", "Number of backlog samples kept per queue disc", queue_samples);
   cmd.Parse (argc, argv);
 
+  SystemWallClockMs clock;
+  clock.Start ();
+
   transport_prot = std::string ("ns3::") + transport_prot;
 
   SeedManager::SetSeed (1);
@@ -273,6 +674,16 @@ int main (int argc, char *argv[])
   Config::SetDefault ("ns3::TcpSocket::SndBufSize", UintegerValue (1 << 21));
 
   // Select TCP variant
+  bool known_prot = false;
+  for (uint32_t i = 0; i < sizeof (tcpVariants) / sizeof (tcpVariants[0]); i++)
+    {
+      known_prot = known_prot || transport_prot.compare (tcpVariants[i]) == 0;
+    }
+  if (!known_prot)
+    {
+      NS_LOG_DEBUG ("Invalid transport protocol " << transport_prot << " specified");
+      exit (1);
+    }
   if (transport_prot.compare ("ns3::TcpWestwoodPlus") == 0)
     { 
       // TcpWestwoodPlus is not an actual TypeId name; we need TcpWestwood here
@@ -328,8 +739,6 @@ int main (int argc, char *argv[])
   LocalLink.SetDeviceAttribute ("DataRate", StringValue (access_bandwidth));
   LocalLink.SetChannelAttribute ("Delay", StringValue (access_delay));
 
-  Ipv4InterfaceContainer sink_interfaces;
-
   DataRate access_b (access_bandwidth);
   DataRate bottle_b (bandwidth);
   Time access_d (access_delay);
@@ -343,76 +752,89 @@ int main (int argc, char *argv[])
   Config::SetDefault ("ns3::PfifoFastQueueDisc::Limit", UintegerValue (size / mtu_bytes));
   Config::SetDefault ("ns3::CoDelQueueDisc::MaxBytes", UintegerValue (size));
 
-  for (int i = 0; i < num_flows; i++)
+  TrafficControlHelper *tchBottleneck = 0;
+  if (queue_disc_type.compare ("ns3::PfifoFastQueueDisc") == 0)
+    {
+      tchBottleneck = &tchPfifo;
+    }
+  else if (queue_disc_type.compare ("ns3::CoDelQueueDisc") == 0)
+    {
+      tchBottleneck = &tchCoDel;
+    }
+  else
+    {
+      NS_FATAL_ERROR ("Queue not recognized. Allowed values are ns3::CoDelQueueDisc or ns3::PfifoFastQueueDisc");
+    }
+  if (routing.compare ("global") != 0 && routing.compare ("static") != 0)
     {
-      NetDeviceContainer devices;
-      devices = LocalLink.Install (sources.Get (i), gateways.Get (0));
-      tchPfifo.Install (devices);
-      address.NewNetwork ();
-      Ipv4InterfaceContainer interfaces = address.Assign (devices);
+      NS_FATAL_ERROR ("Routing not recognized. Allowed values are global or static");
+    }
 
-      devices = UnReLink.Install (gateways.Get (0), sinks.Get (i));
-      if (queue_disc_type.compare ("ns3::PfifoFastQueueDisc") == 0)
+  // Global routing: one /24 per link and routes computed for the whole
+  // topology.  Static routing: one /30 per link, 10.0.0.0/8 upwards, assigned
+  // directly, and a default route to the gateway on every source and sink
+  // (the gateway reaches them all directly), so that building the topology
+  // takes linear time and memory in the number of flows.
+  std::vector<Ptr<QueueDiscMonitor> > queueMonitors;
+  std::vector<Ipv4Address> sink_addresses;
+  sink_addresses.reserve (num_flows);
+  for (int i = 0; i < num_flows; i++)
+    {
+      NetDeviceContainer access = LocalLink.Install (sources.Get (i), gateways.Get (0));
+      tchPfifo.Install (access);
+      NetDeviceContainer bottleneck = UnReLink.Install (gateways.Get (0), sinks.Get (i));
+      QueueDiscContainer queueDiscs = tchBottleneck->Install (bottleneck);
+      if (queue_monitor)
         {
-          tchPfifo.Install (devices);
+          queueMonitors.push_back (Create<QueueDiscMonitor> (queueDiscs.Get (0), Seconds (queue_interval), queue_samples));
         }
-      else if (queue_disc_type.compare ("ns3::CoDelQueueDisc") == 0)
+
+      if (routing.compare ("static") == 0)
         {
-          tchCoDel.Install (devices);
+          uint32_t network = Ipv4Address ("10.0.0.0").Get () + 8 * i;
+          AssignLink (access, network);
+          AssignLink (bottleneck, network + 4);
+          DefaultRoute (sources.Get (i), network + 2);
+          DefaultRoute (sinks.Get (i), network + 5);
+          sink_addresses.push_back (Ipv4Address (network + 6));
         }
       else
         {
-          NS_FATAL_ERROR ("Queue not recognized. Allowed values are ns3::CoDelQueueDisc or ns3::PfifoFastQueueDisc");
+          address.NewNetwork ();
+          address.Assign (access);
+          address.NewNetwork ();
+          Ipv4InterfaceContainer interfaces = address.Assign (bottleneck);
+          sink_addresses.push_back (interfaces.GetAddress (1));
         }
-      address.NewNetwork ();
-      interfaces = address.Assign (devices);
-      sink_interfaces.Add (interfaces.Get (1));
     }
 
-  NS_LOG_INFO ("Initialize Global Routing.");
-  Ipv4GlobalRoutingHelper::PopulateRoutingTables ();
+  if (routing.compare ("global") == 0)
+    {
+      NS_LOG_INFO ("Initialize Global Routing.");
+      Ipv4GlobalRoutingHelper::PopulateRoutingTables ();
+    }
 
   uint16_t port = 50000;
   Address sinkLocalAddress (InetSocketAddress (Ipv4Address::GetAny (), port));
   PacketSinkHelper sinkHelper ("ns3::TcpSocketFactory", sinkLocalAddress);
+  sinkHelper.SetAttribute ("Protocol", TypeIdValue (TcpSocketFactory::GetTypeId ()));
+  Config::SetDefault ("ns3::TcpSocket::SegmentSize", UintegerValue (tcp_adu_size));
+  BulkSendHelper ftp ("ns3::TcpSocketFactory", Address ());
+  ftp.SetAttribute ("SendSize", UintegerValue (tcp_adu_size));
+  ftp.SetAttribute ("MaxBytes", UintegerValue (int(data_mbytes * 1000000)));
+  ApplicationContainer sourceApps;
 
-  for (uint16_t i = 0; i < sources.GetN (); i++)
-    {
-      AddressValue remoteAddress (InetSocketAddress (sink_interfaces.GetAddress (i, 0), port));
-
-      if (transport_prot.compare ("ns3::TcpNewReno") == 0
-          || transport_prot.compare ("ns3::TcpWestwood") == 0
-          || transport_prot.compare ("ns3::TcpWestwoodPlus") == 0
-          || transport_prot.compare ("ns3::TcpHybla") == 0
-          || transport_prot.compare ("ns3::TcpHighSpeed") == 0
-          || transport_prot.compare ("ns3::TcpHtcp") == 0
-          || transport_prot.compare ("ns3::TcpVegas") == 0
-          || transport_prot.compare ("ns3::TcpVeno") == 0
-          || transport_prot.compare ("ns3::TcpBic") == 0
-          || transport_prot.compare ("ns3::TcpScalable") == 0
-          || transport_prot.compare ("ns3::TcpYeah") == 0
-          || transport_prot.compare ("ns3::TcpIllinois") == 0)
-        {
-          Config::SetDefault ("ns3::TcpSocket::SegmentSize", UintegerValue (tcp_adu_size));
-          BulkSendHelper ftp ("ns3::TcpSocketFactory", Address ());
-          ftp.SetAttribute ("Remote", remoteAddress);
-          ftp.SetAttribute ("SendSize", UintegerValue (tcp_adu_size));
-          ftp.SetAttribute ("MaxBytes", UintegerValue (int(data_mbytes * 1000000)));
-
-          ApplicationContainer sourceApp = ftp.Install (sources.Get (i));
-          sourceApp.Start (Seconds (start_time * i));
-          sourceApp.Stop (Seconds (stop_time - 3));
-
-          sinkHelper.SetAttribute ("Protocol", TypeIdValue (TcpSocketFactory::GetTypeId ()));
-          ApplicationContainer sinkApp = sinkHelper.Install (sinks);
-          sinkApp.Start (Seconds (start_time * i));
-          sinkApp.Stop (Seconds (stop_time));
-        }
-      else
-        {
-          NS_LOG_DEBUG ("Invalid transport protocol " << transport_prot << " specified");
-          exit (1);
-        }
+  for (int i = 0; i < num_flows; i++)
+    {
+      ftp.SetAttribute ("Remote", AddressValue (InetSocketAddress (sink_addresses[i], port)));
+      ApplicationContainer sourceApp = ftp.Install (sources.Get (i));
+      sourceApp.Start (Seconds (start_time * i));
+      sourceApp.Stop (Seconds (stop_time - 3));
+      sourceApps.Add (sourceApp);
+
+      ApplicationContainer sinkApp = sinkHelper.Install (sinks.Get (i));
+      sinkApp.Start (Seconds (start_time * i));
+      sinkApp.Stop (Seconds (stop_time));
     }
 
   // Set up tracing if enabled
@@ -425,13 +847,14 @@ int main (int argc, char *argv[])
                                             std::ios::out);
       stack.EnableAsciiIpv4All (ascii_wrap);
 
-      Simulator::Schedule (Seconds (0.00001), &TraceCwnd, prefix_file_name + "-cwnd.data");
-      Simulator::Schedule (Seconds (0.00001), &TraceSsThresh, prefix_file_name + "-ssth.data");
-      Simulator::Schedule (Seconds (0.00001), &TraceRtt, prefix_file_name + "-rtt.data");
-      Simulator::Schedule (Seconds (0.00001), &TraceRto, prefix_file_name + "-rto.data");
-      Simulator::Schedule (Seconds (0.00001), &TraceNextTx, prefix_file_name + "-next-tx.data");
-      Simulator::Schedule (Seconds (0.00001), &TraceInFlight, prefix_file_name + "-inflight.data");
-      Simulator::Schedule (Seconds (0.1), &TraceNextRx, prefix_file_name + "-next-rx.data");
+      traceWriter.Open (prefix_file_name + "-trace.bin", trace_buffer);
+      FlowTrace initial = { 0, true, true, true, true, false, 0, 0 };
+      flowTraces.assign (num_flows, initial);
+      for (int i = 0; i < num_flows; i++)
+        {
+          flowTraces[i].flow = i;
+          TraceFlow (&flowTraces[i], sourceApps.Get (i), sinks.Get (i));
+        }
     }
 
   if (pcap)
@@ -447,14 +870,36 @@ int main (int argc, char *argv[])
       flowHelper.InstallAll ();
     }
 
+  if (timing)
+    {
+      std::cout << "Setup time: " << clock.End () / 1000.0 << " s (" << num_flows << " flows)" << std::endl;
+    }
+  if (build_only)
+    {
+      traceWriter.Close ();
+      Simulator::Destroy ();
+      return 0;
+    }
+
+  clock.Start ();
   Simulator::Stop (Seconds (stop_time));
   Simulator::Run ();
+  if (timing)
+    {
+      std::cout << "Run time: " << clock.End () / 1000.0 << " s" << std::endl;
+    }
 
   if (flow_monitor)
     {
       flowHelper.SerializeToXmlFile (prefix_file_name + ".flowmonitor", true, true);
     }
 
+  for (uint32_t i = 0; i < queueMonitors.size (); i++)
+    {
+      queueMonitors[i]->Write (prefix_file_name, i);
+    }
+
+  traceWriter.Close ();
   Simulator::Destroy ();
   return 0;
 }
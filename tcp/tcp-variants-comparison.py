@@ -0,0 +1,346 @@
+# -*-  Mode: Python; -*-
+# /*
+#  * Copyright (c) 2016
+#  *
+#  * This program is free software; you can redistribute it and/or modify
+#  * it under the terms of the GNU General Public License version 2 as
+#  * published by the Free Software Foundation;
+#  *
+#  * This program is distributed in the hope that it will be useful,
+#  * but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  * GNU General Public License for more details.
+#  *
+#  * You should have received a copy of the GNU General Public License
+#  * along with this program; if not, write to the Free Software
+#  * Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#  *
+#  * Python port of tcp-variants-comparison.cc.
+#  *
+#  * Network topology: num_flows sources, each on its own access link to one
+#  * gateway, and num_flows sinks, each behind its own bottleneck link from the
+#  * gateway, which carries the RateErrorModel (error_p) and the queue disc
+#  * (queue_disc_type); PfifoFast and CoDel queues are sized from the
+#  * bandwidth-delay product of the path.
+#  *
+#  *   source i --- access link --- gateway --- bottleneck link --- sink i
+#  *
+#  * Source i runs a BulkSend application from 0.1 * i s to duration - 2.9 s
+#  * to a PacketSink on sink i.  The goodput of every flow is printed; with
+#  * --flow_monitor=True the FlowMonitor statistics are also written to
+#  * <prefix_name>.flowmonitor, and with --output=FILE the goodput and
+#  * FlowMonitor statistics of every flow go to FILE (JSON lines, CSV or the
+#  * columnar format of results_sink.py, chosen by --format or the extension).
+#  *
+#  * --matrix=True runs every combination of --transport_prots, --error_ps,
+#  * --queue_disc_types and --bdps (bandwidth/delay pairs of the bottleneck)
+#  * over --jobs worker processes, prints the total goodput of each and writes
+#  * the records of all of them, tagged with their configuration, to --output.
+#  */
+
+import array
+import os
+import sys
+
+# The helper modules are shared with the wireless examples
+sys.path.insert (0, os.path.join (os.path.dirname (os.path.abspath (__file__)), os.pardir, "wireless"))
+
+from ns_lazy import ns
+from results_sink import TableSink, MultiSink, open_sink
+from wifi_sweep import run_points
+import flow_export
+
+TCP_VARIANTS = ["TcpNewReno", "TcpWestwood", "TcpWestwoodPlus", "TcpHybla", "TcpHighSpeed", "TcpHtcp",
+                "TcpVegas", "TcpVeno", "TcpBic", "TcpScalable", "TcpYeah", "TcpIllinois"]
+QUEUE_DISCS = ["ns3::PfifoFastQueueDisc", "ns3::CoDelQueueDisc"]
+
+#Port of the PacketSinks
+PORT = 50000
+
+# Simulate one configuration.  Returns the goodput of every flow in Mbit/s
+# (received bytes over the time from the start of its source to the end of
+# the simulation) and, if the point asks for it, the FlowMonitor columns of
+# the data direction of every flow (see flow_export.py) with the goodput added.
+def run_point (point):
+  transport_prot = "ns3::" + point["transport_prot"]
+  mtu_bytes = point["mtu"]
+  num_flows = point["num_flows"]
+  ns.core.RngSeedManager.SetSeed (1)
+  ns.core.RngSeedManager.SetRun (point["rngRun"])
+
+  #Calculate the ADU size
+  ip_header = ns.internet.Ipv4Header ().GetSerializedSize ()
+  tcp_header = ns.internet.TcpHeader ().GetSerializedSize ()
+  tcp_adu_size = mtu_bytes - 20 - (ip_header + tcp_header)
+
+  #Set the simulation start and stop time
+  start_time = 0.1
+  stop_time = start_time + point["duration"]
+
+  #4 MB of TCP buffer
+  ns.core.Config.SetDefault ("ns3::TcpSocket::RcvBufSize", ns.core.UintegerValue (1 << 21))
+  ns.core.Config.SetDefault ("ns3::TcpSocket::SndBufSize", ns.core.UintegerValue (1 << 21))
+  ns.core.Config.SetDefault ("ns3::TcpSocket::SegmentSize", ns.core.UintegerValue (tcp_adu_size))
+
+  #Select TCP variant
+  if transport_prot == "ns3::TcpWestwoodPlus":
+    # TcpWestwoodPlus is not an actual TypeId name; we need TcpWestwood here
+    ns.core.Config.SetDefault ("ns3::TcpL4Protocol::SocketType", ns.core.TypeIdValue (ns.internet.TcpWestwood.GetTypeId ()))
+    # the default protocol type in ns3::TcpWestwood is WESTWOOD
+    ns.core.Config.SetDefault ("ns3::TcpWestwood::ProtocolType", ns.core.EnumValue (ns.internet.TcpWestwood.WESTWOODPLUS))
+  else:
+    ns.core.Config.SetDefault ("ns3::TcpL4Protocol::SocketType", ns.core.TypeIdValue (ns.core.TypeId.LookupByName (transport_prot)))
+    if transport_prot == "ns3::TcpWestwood":
+      # a previous point run in this process may have switched it to WESTWOODPLUS
+      ns.core.Config.SetDefault ("ns3::TcpWestwood::ProtocolType", ns.core.EnumValue (ns.internet.TcpWestwood.WESTWOOD))
+
+  #Create gateways, sources, and sinks
+  gateways = ns.network.NodeContainer ()
+  gateways.Create (1)
+  sources = ns.network.NodeContainer ()
+  sources.Create (num_flows)
+  sinks = ns.network.NodeContainer ()
+  sinks.Create (num_flows)
+
+  #Configure the error model
+  #Here we use RateErrorModel with packet error rate
+  uv = ns.core.UniformRandomVariable ()
+  uv.SetStream (50)
+  error_model = ns.network.RateErrorModel ()
+  error_model.SetRandomVariable (uv)
+  error_model.SetUnit (ns.network.RateErrorModel.ERROR_UNIT_PACKET)
+  error_model.SetRate (point["error_p"])
+
+  UnReLink = ns.point_to_point.PointToPointHelper ()
+  UnReLink.SetDeviceAttribute ("DataRate", ns.core.StringValue (point["bandwidth"]))
+  UnReLink.SetChannelAttribute ("Delay", ns.core.StringValue (point["delay"]))
+  UnReLink.SetDeviceAttribute ("ReceiveErrorModel", ns.core.PointerValue (error_model))
+
+  stack = ns.internet.InternetStackHelper ()
+  stack.InstallAll ()
+
+  tchPfifo = ns.traffic_control.TrafficControlHelper ()
+  tchPfifo.SetRootQueueDisc ("ns3::PfifoFastQueueDisc")
+  tchCoDel = ns.traffic_control.TrafficControlHelper ()
+  tchCoDel.SetRootQueueDisc ("ns3::CoDelQueueDisc")
+  tchBottleneck = tchPfifo if point["queue_disc_type"] == "ns3::PfifoFastQueueDisc" else tchCoDel
+
+  address = ns.internet.Ipv4AddressHelper ()
+  address.SetBase (ns.network.Ipv4Address ("10.0.0.0"), ns.network.Ipv4Mask ("255.255.255.0"))
+
+  #Configure the sources and sinks net devices
+  #and the channels between the sources/sinks and the gateways
+  LocalLink = ns.point_to_point.PointToPointHelper ()
+  LocalLink.SetDeviceAttribute ("DataRate", ns.core.StringValue (point["access_bandwidth"]))
+  LocalLink.SetChannelAttribute ("Delay", ns.core.StringValue (point["access_delay"]))
+
+  #Queues sized from the bandwidth-delay product
+  access_b = ns.network.DataRate (point["access_bandwidth"])
+  bottle_b = ns.network.DataRate (point["bandwidth"])
+  access_d = ns.core.Time (point["access_delay"])
+  bottle_d = ns.core.Time (point["delay"])
+  ns.core.Config.SetDefault ("ns3::CoDelQueueDisc::Mode", ns.core.EnumValue (ns.network.Queue.QUEUE_MODE_BYTES))
+  size = int ((min (access_b.GetBitRate (), bottle_b.GetBitRate ()) // 8) *
+              (access_d.GetSeconds () + bottle_d.GetSeconds ()) * 2)
+  ns.core.Config.SetDefault ("ns3::PfifoFastQueueDisc::Limit", ns.core.UintegerValue (size // mtu_bytes))
+  ns.core.Config.SetDefault ("ns3::CoDelQueueDisc::MaxBytes", ns.core.UintegerValue (size))
+
+  sink_addresses = []
+  for i in range (num_flows):
+    devices = LocalLink.Install (sources.Get (i), gateways.Get (0))
+    tchPfifo.Install (devices)
+    address.NewNetwork ()
+    address.Assign (devices)
+
+    devices = UnReLink.Install (gateways.Get (0), sinks.Get (i))
+    tchBottleneck.Install (devices)
+    address.NewNetwork ()
+    interfaces = address.Assign (devices)
+    sink_addresses.append (interfaces.GetAddress (1))
+
+  ns.internet.Ipv4GlobalRoutingHelper.PopulateRoutingTables ()
+
+  sinkHelper = ns.applications.PacketSinkHelper ("ns3::TcpSocketFactory", ns.network.InetSocketAddress (ns.network.Ipv4Address.GetAny (), PORT))
+  ftp = ns.applications.BulkSendHelper ("ns3::TcpSocketFactory", ns.network.Address ())
+  ftp.SetAttribute ("SendSize", ns.core.UintegerValue (tcp_adu_size))
+  ftp.SetAttribute ("MaxBytes", ns.core.UintegerValue (int (point["data"] * 1000000)))
+
+  sinkApps = []
+  for i in range (num_flows):
+    ftp.SetAttribute ("Remote", ns.network.AddressValue (ns.network.InetSocketAddress (sink_addresses[i], PORT)))
+    sourceApp = ftp.Install (sources.Get (i))
+    sourceApp.Start (ns.core.Seconds (start_time * i))
+    sourceApp.Stop (ns.core.Seconds (stop_time - 3))
+
+    sinkApp = sinkHelper.Install (sinks.Get (i))
+    sinkApp.Start (ns.core.Seconds (start_time * i))
+    sinkApp.Stop (ns.core.Seconds (stop_time))
+    sinkApps.append (ns.applications.PacketSink (sinkApp.Get (0)))
+
+  if point["pcap"]:
+    UnReLink.EnablePcapAll (point["prefix"], True)
+    LocalLink.EnablePcapAll (point["prefix"], True)
+
+  #Flow monitor
+  flowHelper = None
+  monitor = None
+  if point["flowMonitor"]:
+    flowHelper = ns.flow_monitor.FlowMonitorHelper ()
+    monitor = flowHelper.InstallAll ()
+
+  ns.core.Simulator.Stop (ns.core.Seconds (stop_time))
+  ns.core.Simulator.Run ()
+
+  goodput = array.array ("d", [sinkApps[i].GetTotalRx () * 8.0 / ((stop_time - start_time * i) * 1e6)
+                               for i in range (num_flows)])
+  result = {"goodput": goodput, "flows": None}
+  if monitor is not None:
+    if point["prefix"]:
+      flowHelper.SerializeToXmlFile (point["prefix"] + ".flowmonitor", True, True)
+    columns = flow_export.columns (monitor)
+    columns = flow_export.select (columns, [port == PORT for port in columns["dstPort"]])
+    byDst = dict ((a.Get (), g) for a, g in zip (sink_addresses, goodput))
+    columns["goodput"] = array.array ("d", [byDst.get (dst, float ("nan")) for dst in columns["dst"]])
+    result["flows"] = columns
+  ns.core.Simulator.Destroy ()
+  return result
+
+# Run the whole matrix over worker processes.  Each point gets its own seed,
+# run + the index of its (error_p, queue_disc_type, bdp) cell: the TCP
+# variants of a cell share it, so they are compared on the same random numbers.
+def run_matrix (cmd, base):
+  transport_prots = TCP_VARIANTS if cmd.transport_prots == "all" else cmd.transport_prots.split (",")
+  error_ps = [float (p) for p in str (cmd.error_ps or cmd.error_p).split (",")]
+  queue_disc_types = QUEUE_DISCS if cmd.queue_disc_types == "all" else cmd.queue_disc_types.split (",")
+  bdps = [bdp.split ("/") for bdp in (cmd.bdps or "%s/%s" % (cmd.bandwidth, cmd.delay)).split (",")]
+  for transport_prot in transport_prots:
+    if transport_prot not in TCP_VARIANTS:
+      print "Wrong transport_prots value!"
+      return 1
+  for queue_disc_type in queue_disc_types:
+    if queue_disc_type not in QUEUE_DISCS:
+      print "Wrong queue_disc_types value!"
+      return 1
+  if any (len (bdp) != 2 for bdp in bdps):
+    print "Wrong bdps value!"
+    return 1
+
+  points = []
+  for transport_prot in transport_prots:
+    cell = 0
+    for error_p in error_ps:
+      for queue_disc_type in queue_disc_types:
+        for bandwidth, delay in bdps:
+          points.append (dict (base, transport_prot=transport_prot, error_p=error_p,
+                               queue_disc_type=queue_disc_type, bandwidth=bandwidth, delay=delay,
+                               rngRun=base["rngRun"] + cell, flowMonitor=True, prefix="", pcap=False))
+          cell += 1
+
+  table = TableSink ("%(transport_prot)s \t%(error_p)s \t%(queue_disc_type)s \t%(bandwidth)s/%(delay)s \t%(goodput)s Mbit/s",
+                     "TCP variant \tError rate \tQueue disc \tBottleneck \tTotal goodput")
+  output = MultiSink ([])
+  if cmd.output:
+    output = open_sink (cmd.output, cmd.format)
+
+  # One consolidated result set: a record per flow of every point
+  keys = ("transport_prot", "error_p", "queue_disc_type", "bandwidth", "delay", "rngRun")
+  for point, result in run_points (run_point, points, int (cmd.jobs)):
+    record = dict ((key, point[key]) for key in keys)
+    table.write (dict (record, goodput=sum (result["goodput"])))
+    flow_export.write (output, result["flows"], **record)
+  table.close ()
+  output.close ()
+  return 0
+
+def main (argv):
+  cmd = ns.core.CommandLine ()
+  cmd.transport_prot = "TcpWestwood"
+  cmd.error_p = 0.0
+  cmd.bandwidth = "2Mbps"
+  cmd.delay = "0.01ms"
+  cmd.access_bandwidth = "10Mbps"
+  cmd.access_delay = "45ms"
+  cmd.prefix_name = "TcpVariantsComparison"
+  cmd.data = 0
+  cmd.mtu = 400
+  cmd.num_flows = 1
+  cmd.duration = 100
+  cmd.run = 0
+  cmd.flow_monitor = "False"
+  cmd.pcap_tracing = "False"
+  cmd.queue_disc_type = "ns3::PfifoFastQueueDisc"
+  #Output file of the per-flow results and its format.
+  cmd.output = ""
+  cmd.format = ""
+  #Matrix mode: every combination of the comma separated lists below.
+  cmd.matrix = "False"
+  cmd.transport_prots = "all"
+  cmd.error_ps = ""
+  cmd.queue_disc_types = "all"
+  cmd.bdps = ""
+  cmd.jobs = 0
+
+  cmd.AddValue ("transport_prot", "Transport protocol to use: TcpNewReno, "
+                "TcpHybla, TcpHighSpeed, TcpHtcp, TcpVegas, TcpScalable, TcpVeno, "
+                "TcpBic, TcpYeah, TcpIllinois, TcpWestwood, TcpWestwoodPlus ")
+  cmd.AddValue ("error_p", "Packet error rate")
+  cmd.AddValue ("bandwidth", "Bottleneck bandwidth")
+  cmd.AddValue ("delay", "Bottleneck delay")
+  cmd.AddValue ("access_bandwidth", "Access link bandwidth")
+  cmd.AddValue ("access_delay", "Access link delay")
+  cmd.AddValue ("prefix_name", "Prefix of output trace file")
+  cmd.AddValue ("data", "Number of Megabytes of data to transmit")
+  cmd.AddValue ("mtu", "Size of IP packets to send in bytes")
+  cmd.AddValue ("num_flows", "Number of flows")
+  cmd.AddValue ("duration", "Time to allow flows to run in seconds")
+  cmd.AddValue ("run", "Run index (for setting repeatable seeds)")
+  cmd.AddValue ("flow_monitor", "Enable flow monitor")
+  cmd.AddValue ("pcap_tracing", "Enable or disable PCAP tracing")
+  cmd.AddValue ("queue_disc_type", "Queue disc type for gateway (e.g. ns3::CoDelQueueDisc)")
+  cmd.AddValue ("output", "File the per-flow goodput and FlowMonitor statistics are written to")
+  cmd.AddValue ("format", "Format of the output file: jsonl, csv or col (default: from the file extension)")
+  cmd.AddValue ("matrix", "Run every combination of transport_prots, error_ps, queue_disc_types and bdps")
+  cmd.AddValue ("transport_prots", "Comma separated TCP variants of the matrix (all: every variant)")
+  cmd.AddValue ("error_ps", "Comma separated packet error rates of the matrix (default: error_p)")
+  cmd.AddValue ("queue_disc_types", "Comma separated queue discs of the matrix (all: PfifoFast and CoDel)")
+  cmd.AddValue ("bdps", "Comma separated bandwidth/delay bottlenecks of the matrix (default: bandwidth/delay)")
+  cmd.AddValue ("jobs", "Number of worker processes running the matrix (0: one per CPU)")
+  cmd.Parse (argv)
+
+  num_flows = int (cmd.num_flows)
+  if num_flows < 1:
+    print "Wrong num_flows value!"
+    return 1
+
+  base = {"access_bandwidth": cmd.access_bandwidth, "access_delay": cmd.access_delay,
+          "data": float (cmd.data), "mtu": int (cmd.mtu), "num_flows": num_flows,
+          "duration": float (cmd.duration), "rngRun": int (cmd.run)}
+
+  if cmd.matrix == "True":
+    return run_matrix (cmd, base)
+
+  if cmd.transport_prot not in TCP_VARIANTS:
+    print "Invalid transport protocol " + cmd.transport_prot + " specified"
+    return 1
+  if cmd.queue_disc_type not in QUEUE_DISCS:
+    print "Queue not recognized. Allowed values are ns3::CoDelQueueDisc or ns3::PfifoFastQueueDisc"
+    return 1
+
+  point = dict (base, transport_prot=cmd.transport_prot, error_p=float (cmd.error_p),
+                queue_disc_type=cmd.queue_disc_type, bandwidth=cmd.bandwidth, delay=cmd.delay,
+                flowMonitor=cmd.flow_monitor == "True" or bool (cmd.output),
+                prefix=cmd.prefix_name if cmd.flow_monitor == "True" or cmd.pcap_tracing == "True" else "",
+                pcap=cmd.pcap_tracing == "True")
+  result = run_point (point)
+  for i, goodput in enumerate (result["goodput"]):
+    print "Flow " + str (i) + " goodput: " + str (goodput) + " Mbit/s"
+  if cmd.output:
+    output = open_sink (cmd.output, cmd.format)
+    flow_export.write (output, result["flows"], transport_prot=cmd.transport_prot, error_p=point["error_p"],
+                       queue_disc_type=cmd.queue_disc_type, bandwidth=cmd.bandwidth, delay=cmd.delay,
+                       rngRun=point["rngRun"])
+    output.close ()
+  return 0
+
+if __name__ == '__main__':
+  sys.exit (main (sys.argv))
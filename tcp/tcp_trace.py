@@ -0,0 +1,141 @@
+# -*-  Mode: Python; -*-
+# /*
+#  * Copyright (c) 2016
+#  *
+#  * This program is free software; you can redistribute it and/or modify
+#  * it under the terms of the GNU General Public License version 2 as
+#  * published by the Free Software Foundation;
+#  *
+#  * This program is distributed in the hope that it will be useful,
+#  * but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  * GNU General Public License for more details.
+#  *
+#  * You should have received a copy of the GNU General Public License
+#  * along with this program; if not, write to the Free Software
+#  * Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#  */
+
+# Reader of the binary traces of tcp-variants-comparison --tracing.
+#
+# The trace is one stream of fixed-size records (RECORD, 24 bytes, in the byte
+# order of the host that wrote it): time, flow, metric, flags and value, in the
+# order the values changed.  Flag FLAG_INITIAL marks the value a metric had
+# before its first change, reported at time 0.
+#
+# load (path, metric) gives the times and values of one metric as arrays,
+# NumPy arrays when NumPy is installed (the trace is memory-mapped) and
+# array.array otherwise.  text_lines () gives the lines of the .data text
+# files the example used to write.
+
+import array
+import struct
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+MAGIC = b"NSTCPTR1"
+HEADER_SIZE = 16
+FLAG_INITIAL = 1
+
+# Metric ids, in the order of TraceWriter::Metric, and the suffix of the text
+# file each one used to be written to
+METRICS = ["cwnd", "ssth", "rtt", "rto", "next-tx", "inflight", "next-rx"]
+# Metrics that hold times in seconds; the others are counts of bytes
+TIME_METRICS = ("rtt", "rto")
+
+# time, flow, metric, flags, value
+RECORD_FORMAT = "dIHHd"
+RECORD_FIELDS = [("time", "f8"), ("flow", "u4"), ("metric", "u2"), ("flags", "u2"), ("value", "f8")]
+
+
+def metric_id (metric):
+    """The id of metric, given by name (see METRICS) or id."""
+    if isinstance (metric, int):
+        return metric
+    return METRICS.index (metric)
+
+
+class TcpTrace (object):
+    """A binary trace of tcp-variants-comparison."""
+
+    def __init__ (self, path):
+        self.path = path
+        with open (path, "rb") as f:
+            header = f.read (HEADER_SIZE)
+            if len (header) < HEADER_SIZE or header[:len (MAGIC)] != MAGIC:
+                raise ValueError ("%s is not a tcp-variants-comparison trace" % path)
+            f.seek (0, 2)
+            size = f.tell ()
+        for order in "<>":
+            if struct.unpack_from (order + "I", header, len (MAGIC))[0] == 0x01020304:
+                break
+        else:
+            raise ValueError ("%s: unknown byte order" % path)
+        self.order = order
+        self.record = struct.Struct (order + RECORD_FORMAT)
+        if struct.unpack_from (order + "I", header, len (MAGIC) + 4)[0] != self.record.size:
+            raise ValueError ("%s: unexpected record size" % path)
+        self.count = (size - HEADER_SIZE) // self.record.size
+        self.data = None
+        if numpy is not None:
+            dtype = numpy.dtype ([(name, order + code) for name, code in RECORD_FIELDS])
+            if self.count:
+                self.data = numpy.memmap (path, dtype=dtype, mode="r", offset=HEADER_SIZE, shape=(self.count,))
+            else:
+                self.data = numpy.zeros (0, dtype=dtype)
+
+    def __len__ (self):
+        return self.count
+
+    def records (self, blockRecords=65536):
+        """Every record as a (time, flow, metric, flags, value) tuple."""
+        with open (self.path, "rb") as f:
+            f.seek (HEADER_SIZE)
+            remaining = self.count
+            while remaining:
+                n = min (blockRecords, remaining)
+                block = f.read (n * self.record.size)
+                for offset in range (0, len (block), self.record.size):
+                    yield self.record.unpack_from (block, offset)
+                remaining -= n
+
+    def load (self, metric, flow=None):
+        """(times, values) of metric, of one flow or of all of them."""
+        metric = metric_id (metric)
+        if self.data is not None:
+            mask = self.data["metric"] == metric
+            if flow is not None:
+                mask &= self.data["flow"] == flow
+            selected = self.data[mask]
+            return numpy.array (selected["time"]), numpy.array (selected["value"])
+        times = array.array ("d")
+        values = array.array ("d")
+        for time, f, m, flags, value in self.records ():
+            if m == metric and (flow is None or f == flow):
+                times.append (time)
+                values.append (value)
+        return times, values
+
+    def flows (self):
+        """Ids of the flows that have records."""
+        if self.data is not None:
+            return [int (f) for f in numpy.unique (self.data["flow"])]
+        return sorted (set (r[1] for r in self.records ()))
+
+
+def load (path, metric, flow=None):
+    """(times, values) of metric in the trace at path; see TcpTrace.load ()."""
+    return TcpTrace (path).load (metric, flow)
+
+
+def text_line (record):
+    """The line a record was written as in the .data text files."""
+    time, flow, metric, flags, value = record
+    name = METRICS[metric]
+    text = "%g" % value if name in TIME_METRICS else "%d" % value
+    if flags & FLAG_INITIAL:
+        return "0.0 " + text
+    return "%g %s" % (time, text)
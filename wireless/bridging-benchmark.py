@@ -0,0 +1,118 @@
+# -*-  Mode: Python; -*-
+# /*
+#  * Copyright (c) 2016
+#  *
+#  * This program is free software; you can redistribute it and/or modify
+#  * it under the terms of the GNU General Public License version 2 as
+#  * published by the Free Software Foundation;
+#  *
+#  * This program is distributed in the hope that it will be useful,
+#  * but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  * GNU General Public License for more details.
+#  *
+#  * You should have received a copy of the GNU General Public License
+#  * along with this program; if not, write to the Free Software
+#  * Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#  */
+
+# Setup time of wifi-wired-bridging.py against the size of the topology.
+#
+# For every nWifis x nStas of the grid the script is run --repeat times with
+# --timing=True --buildOnly=True and the median setup time it prints is
+# reported, with the time per node; --run also runs the simulations and reports
+# their run time.  --save writes the curve as JSON lines, one record per size.
+#
+#   ./waf shell
+#   python examples/wireless/bridging-benchmark.py --nWifis 2,10,50,100,500 --nStas 2,10,50
+#
+# --ranks=1,2,4,8 measures the distributed mode instead: for every size the
+# run time of --backbone=p2p in one process is the reference, and the run time
+# of --distributed=True under "--mpirun -np N" the speedup is computed from.
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+
+_SETUP = re.compile (r"Setup time: ([0-9.]+) s")
+_RUN = re.compile (r"Run time: ([0-9.]+) s")
+
+
+def _median (values):
+    values = sorted (values)
+    n = len (values)
+    if n % 2:
+        return values[n // 2]
+    return (values[n // 2 - 1] + values[n // 2]) / 2.0
+
+
+def measure (nWifis, nStas, repeat, run, options=None, launcher=None):
+    """Median (setup time, run time or None) of wifi-wired-bridging.py in seconds,
+    with more options and run under the launcher command if given."""
+    directory = os.path.dirname (os.path.abspath (__file__))
+    args = (launcher or []) + [sys.executable, os.path.join (directory, "wifi-wired-bridging.py"),
+                               "--nWifis=%d" % nWifis, "--nStas=%d" % nStas, "--timing=True",
+                               "--buildOnly=%s" % (not run)] + (options or [])
+    setups = []
+    runs = []
+    for i in range (repeat):
+        child = subprocess.Popen (args, cwd=directory, stdout=subprocess.PIPE)
+        output = child.communicate ()[0].decode ("utf-8", "replace")
+        setup = _SETUP.search (output)
+        if child.returncode != 0 or setup is None:
+            raise RuntimeError ("%s exited with status %d" % (" ".join (args), child.returncode))
+        setups.append (float (setup.group (1)))
+        if run:
+            runs.append (float (_RUN.search (output).group (1)))
+    return _median (setups), _median (runs) if runs else None
+
+
+def main (argv):
+    parser = argparse.ArgumentParser (description="Setup time of wifi-wired-bridging.py")
+    parser.add_argument ("--nWifis", default="2,10,50,100", help="comma separated numbers of BSSs")
+    parser.add_argument ("--nStas", default="2,10,50", help="comma separated numbers of stations per BSS")
+    parser.add_argument ("--repeat", type=int, default=3)
+    parser.add_argument ("--run", action="store_true", help="also run the simulations")
+    parser.add_argument ("--save", help="write the results to this JSON lines file")
+    parser.add_argument ("--ranks", help="comma separated MPI rank counts: measure the distributed speedup")
+    parser.add_argument ("--mpirun", default="mpirun", help="MPI launcher")
+    args = parser.parse_args (argv[1:])
+
+    out = open (args.save, "w") if args.save else None
+    if args.ranks:
+        print ("%-8s %-8s %6s %10s %10s" % ("nWifis", "nStas", "ranks", "run (s)", "speedup"))
+        for nWifis in [int (n) for n in args.nWifis.split (",")]:
+            for nStas in [int (n) for n in args.nStas.split (",")]:
+                reference = measure (nWifis, nStas, args.repeat, True, ["--backbone=p2p"])[1]
+                print ("%-8d %-8d %6s %10.3f %10s" % (nWifis, nStas, "-", reference, "1.00"))
+                for ranks in [int (n) for n in args.ranks.split (",")]:
+                    run = measure (nWifis, nStas, args.repeat, True, ["--distributed=True"],
+                                   [args.mpirun, "-np", str (ranks)])[1]
+                    print ("%-8d %-8d %6d %10.3f %10.2f" % (nWifis, nStas, ranks, run, reference / run))
+                    if out is not None:
+                        out.write (json.dumps ({"nWifis": nWifis, "nStas": nStas, "ranks": ranks, "run": run,
+                                                "reference": reference, "speedup": reference / run},
+                                               sort_keys=True) + "\n")
+        if out is not None:
+            out.close ()
+        return 0
+
+    print ("%-8s %-8s %10s %12s %14s %10s" % ("nWifis", "nStas", "nodes", "setup (s)", "us per node", "run (s)"))
+    for nWifis in [int (n) for n in args.nWifis.split (",")]:
+        for nStas in [int (n) for n in args.nStas.split (",")]:
+            setup, run = measure (nWifis, nStas, args.repeat, args.run)
+            nodes = nWifis * (nStas + 1)
+            print ("%-8d %-8d %10d %12.3f %14.1f %10s" % (nWifis, nStas, nodes, setup, setup / nodes * 1e6,
+                                                          "%.3f" % run if run is not None else "-"))
+            if out is not None:
+                out.write (json.dumps ({"nWifis": nWifis, "nStas": nStas, "nodes": nodes, "setup": setup,
+                                        "run": run}, sort_keys=True) + "\n")
+    if out is not None:
+        out.close ()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit (main (sys.argv))
@@ -0,0 +1,105 @@
+# -*-  Mode: Python; -*-
+# /*
+#  * Copyright (c) 2016
+#  *
+#  * This program is free software; you can redistribute it and/or modify
+#  * it under the terms of the GNU General Public License version 2 as
+#  * published by the Free Software Foundation;
+#  *
+#  * This program is distributed in the hope that it will be useful,
+#  * but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  * GNU General Public License for more details.
+#  *
+#  * You should have received a copy of the GNU General Public License
+#  * along with this program; if not, write to the Free Software
+#  * Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#  */
+
+# Adaptive stop for throughput runs.
+#
+# A ConvergenceMonitor reads the received byte counter of a run every interval
+# seconds through a scheduled event.  Each interval gives one throughput sample;
+# once the 95% confidence interval of the mean sample is narrower than tolerance
+# times the mean, the monitor calls Simulator::Stop.  The fixed stop time set by
+# the example stays in place as an upper bound.
+
+import math
+
+from ns_lazy import ns
+
+# Two-sided 95% Student t quantiles by degrees of freedom; 1.96 beyond the table
+_T95 = [0, 12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+        2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+        2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042]
+
+
+def t95 (dof):
+    if dof < len (_T95):
+        return _T95[dof]
+    return 1.96
+
+
+class ConvergenceMonitor (object):
+    """Stop the simulation once the throughput of a run has settled.
+
+    rxBytes is a callable returning the total bytes received so far and start
+    the time (in seconds) traffic starts.  Samples taken during the first warmup
+    seconds after start are left out of the statistics.
+    """
+
+    def __init__ (self, rxBytes, start, tolerance, interval=0.1, warmup=0.5, minSamples=10):
+        self.rxBytes = rxBytes
+        self.start = start
+        self.tolerance = tolerance
+        self.interval = interval
+        self.warmup = warmup
+        self.minSamples = minSamples
+        self.converged = False
+        self.stopTime = None
+        self.lastBytes = 0
+        self.bytes = 0
+        # Welford's running mean and variance of the samples (Mbit/s)
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def install (self):
+        ns.core.Simulator.Schedule (ns.core.Seconds (self.start + self.interval), self._sample)
+
+    def halfWidth (self):
+        if self.n < 2:
+            return float ("inf")
+        return t95 (self.n - 1) * math.sqrt (self.m2 / (self.n - 1) / self.n)
+
+    def _sample (self):
+        now = ns.core.Simulator.Now ().GetSeconds ()
+        self.bytes = self.rxBytes ()
+        sample = (self.bytes - self.lastBytes) * 8 / (self.interval * 1000000.0)
+        self.lastBytes = self.bytes
+        self.stopTime = now
+
+        if now - self.start > self.warmup:
+            self.n += 1
+            delta = sample - self.mean
+            self.mean += delta / self.n
+            self.m2 += delta * (sample - self.mean)
+
+        if self.n >= self.minSamples and self.halfWidth () <= self.tolerance * abs (self.mean):
+            # A dead link (every sample zero) also ends up here
+            self.converged = True
+            ns.core.Simulator.Stop ()
+            return
+        ns.core.Simulator.Schedule (ns.core.Seconds (self.interval), self._sample)
+
+    def elapsed (self):
+        """Simulated time since start at the last sample, in seconds."""
+        if self.stopTime is None:
+            return 0.0
+        return self.stopTime - self.start
+
+    def throughput (self):
+        """Average throughput (Mbit/s) from start up to the last sample."""
+        if not self.elapsed ():
+            return 0.0
+        return self.bytes * 8 / (self.elapsed () * 1000000.0)
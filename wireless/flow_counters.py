@@ -0,0 +1,177 @@
+# -*-  Mode: Python; -*-
+# /*
+#  * Copyright (c) 2016
+#  *
+#  * This program is free software; you can redistribute it and/or modify
+#  * it under the terms of the GNU General Public License version 2 as
+#  * published by the Free Software Foundation;
+#  *
+#  * This program is distributed in the hope that it will be useful,
+#  * but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  * GNU General Public License for more details.
+#  *
+#  * You should have received a copy of the GNU General Public License
+#  * along with this program; if not, write to the Free Software
+#  * Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#  */
+
+# Counters-only flow statistics, a light alternative to FlowMonitorHelper.InstallAll.
+#
+# FlowMonitor hooks every IP send, forward and receive of every node and keeps
+# delay and jitter histograms per flow.  For UdpClient -> UdpServer flows the
+# applications already count what is needed: the server counts the packets it
+# received and, from the sequence numbers UdpClient puts in every packet, the
+# ones lost on the way.  FlowCounters reads these counters once, after the run,
+# into flat arrays; nothing is done per packet.
+#
+# UdpClient keeps its count of sent packets to itself (no getter, no Tx trace
+# in this ns-3), so the sent packets are counted from the client side at
+# export: UdpClient sends one packet at its start time and then one every
+# Interval until MaxPackets or its stop (or the end of the simulation), and
+# over IPv4 a UDP send only fails without a route.  This includes the
+# packets still in flight or lost after the last one received, which
+# received + lost does not.
+#
+# DelaySampler adds delay measurements for a sampled fraction of the senders
+# only, with a FlowMonitor installed on those senders and their receivers:
+# packets of the other senders carry no FlowMonitor tag and are ignored.
+#
+# export () gives every flow at once as columns (array.array, which
+# numpy.frombuffer () wraps without copying), or as_numpy () as one NumPy
+# structured array.
+
+import array
+import math
+import random
+
+from ns_lazy import ns
+
+# Column names and array.array type codes of export ()
+COLUMNS = [("flow", "L"), ("src", "L"), ("dst", "L"), ("port", "L"), ("txPackets", "L"),
+           ("txBytes", "d"), ("rxPackets", "L"), ("lostPackets", "L"), ("rxBytes", "d"),
+           ("throughput", "d"), ("delay", "d")]
+
+
+def _client_window (client, end):
+    """Start of the application client and its stop time or end (an ns-3
+    Time), whichever comes first, as ns-3 Times."""
+    start = ns.core.TimeValue ()
+    stop = ns.core.TimeValue ()
+    client.GetAttribute ("StartTime", start)
+    client.GetAttribute ("StopTime", stop)
+    last = end
+    if 0 < stop.Get ().GetTimeStep () < end.GetTimeStep ():
+        last = stop.Get ()
+    return start.Get (), last
+
+
+def _client_sent (client, end):
+    """Packets the UdpClient application client has sent by the time end (an
+    ns-3 Time): one at its start time, then one per Interval, before its stop
+    time and end, at most MaxPackets."""
+    interval = ns.core.TimeValue ()
+    maxPackets = ns.core.UintegerValue ()
+    client.GetAttribute ("Interval", interval)
+    client.GetAttribute ("MaxPackets", maxPackets)
+    start, stop = _client_window (client, end)
+    first = start.GetTimeStep ()
+    last = stop.GetTimeStep ()
+    if last <= first:
+        return 0
+    # Sends at exactly end (or the stop time) come after the Stop event
+    sent = (last - 1 - first) // interval.Get ().GetTimeStep () + 1
+    return min (sent, maxPackets.Get ())
+
+
+class FlowCounters (object):
+    """Flows registered with add (), read from their UdpServer at export ()."""
+
+    def __init__ (self):
+        self.clients = []
+        self.src = array.array ("L")
+        self.dst = array.array ("L")
+        self.port = array.array ("L")
+        self.packetSize = array.array ("L")
+        self.servers = []
+
+    def add (self, src, dst, port, client, server, packetSize):
+        """Register the flow from Ipv4Address src to dst:port, sent by the
+        UdpClient application client and received by the UdpServer
+        application server, of packetSize byte packets."""
+        self.clients.append (client)
+        self.src.append (src.Get ())
+        self.dst.append (dst.Get ())
+        self.port.append (port)
+        self.packetSize.append (packetSize)
+        self.servers.append (server)
+
+    def __len__ (self):
+        return len (self.servers)
+
+    def export (self, delays=None):
+        """All flows as {column: array.array}, to be called at the end of the
+        run, before Simulator.Destroy (); throughput is in Mbit/s over the time
+        the client of each flow ran (from its start time to its stop time or
+        now), delay the mean delay in seconds of the sampled flows (see
+        DelaySampler.delays ()) and nan for the others."""
+        n = len (self.servers)
+        end = ns.core.Simulator.Now ()
+        tx = array.array ("L", [_client_sent (c, end) for c in self.clients])
+        durations = []
+        for c in self.clients:
+            start, stop = _client_window (c, end)
+            durations.append (max (stop.GetSeconds () - start.GetSeconds (), 0.0))
+        rx = array.array ("L", [s.GetReceived () for s in self.servers])
+        lost = array.array ("L", [s.GetLost () for s in self.servers])
+        rxBytes = array.array ("d", [r * size for r, size in zip (rx, self.packetSize)])
+        delays = delays or {}
+        return {"flow": array.array ("L", range (1, n + 1)),
+                "src": self.src, "dst": self.dst, "port": self.port,
+                "txPackets": tx,
+                "txBytes": array.array ("d", [t * size for t, size in zip (tx, self.packetSize)]),
+                "rxPackets": rx, "lostPackets": lost, "rxBytes": rxBytes,
+                "throughput": array.array ("d", [b * 8.0 / d / 1e6 if d > 0 else 0.0
+                                                 for b, d in zip (rxBytes, durations)]),
+                "delay": array.array ("d", [delays.get (key, float ("nan"))
+                                            for key in zip (self.src, self.dst, self.port)])}
+
+
+def as_numpy (columns, names=None):
+    """The array.array columns of export () (or of names, in that order) as
+    one NumPy structured array."""
+    import numpy
+    names = names or [name for name, code in COLUMNS]
+    dtype = [(name, "u8" if columns[name].typecode == "L" else "f8") for name in names]
+    result = numpy.empty (len (columns[names[0]]), dtype=dtype)
+    for name in names:
+        values = columns[name]
+        result[name] = numpy.frombuffer (values, dtype=numpy.dtype (values.typecode)) if len (values) else []
+    return result
+
+
+class DelaySampler (object):
+    """FlowMonitor on a random fraction of the senders of pairs ((sender,
+    receiver) node indices into nodes) and on their receivers."""
+
+    def __init__ (self, nodes, pairs, fraction, seed=1):
+        senders = sorted (set (sender for sender, receiver in pairs))
+        count = int (math.ceil (fraction * len (senders)))
+        chosen = set (random.Random (seed).sample (senders, count))
+        monitored = ns.network.NodeContainer ()
+        for i in sorted (chosen | set (receiver for sender, receiver in pairs if sender in chosen)):
+            monitored.Add (nodes.Get (i))
+        self.helper = ns.flow_monitor.FlowMonitorHelper ()
+        self.monitor = self.helper.Install (monitored)
+        self.senders = chosen
+
+    def delays (self):
+        """{(src, dst, port): mean delay in seconds} of the sampled flows."""
+        classifier = self.helper.GetClassifier ()
+        result = {}
+        for flowId, stats in self.monitor.GetFlowStats ():
+            if stats.rxPackets:
+                t = classifier.FindFlow (flowId)
+                key = (t.sourceAddress.Get (), t.destinationAddress.Get (), t.destinationPort)
+                result[key] = stats.delaySum.GetSeconds () / stats.rxPackets
+        return result
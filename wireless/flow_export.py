@@ -0,0 +1,155 @@
+# -*-  Mode: Python; -*-
+# /*
+#  * Copyright (c) 2016
+#  *
+#  * This program is free software; you can redistribute it and/or modify
+#  * it under the terms of the GNU General Public License version 2 as
+#  * published by the Free Software Foundation;
+#  *
+#  * This program is distributed in the hope that it will be useful,
+#  * but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  * GNU General Public License for more details.
+#  *
+#  * You should have received a copy of the GNU General Public License
+#  * along with this program; if not, write to the Free Software
+#  * Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#  */
+
+# Export of all FlowMonitor statistics at once, as columns.
+#
+# Walking monitor.GetFlowStats () and calling classifier.FindFlow () for every
+# flow crosses the Python bindings several times per flow.  columns () instead
+# makes a single call, FlowMonitor::SerializeToXmlString, which writes the
+# statistics and the 5-tuples of every flow in C++, and parses the XML
+# incrementally into flat array.array columns (see COLUMNS), indexed by flow.
+#
+# throughput and offered are computed per flow over its own activity window,
+# first transmitted to last received packet (resp. last transmitted packet),
+# instead of a fixed duration.  select () keeps the flows of a mask, write ()
+# hands the columns to a results_sink.py sink in one block and as_numpy ()
+# makes them one NumPy structured array.
+
+import array
+import re
+import socket
+import struct
+from io import BytesIO
+
+try:
+    import xml.etree.cElementTree as ElementTree
+except ImportError:
+    import xml.etree.ElementTree as ElementTree
+
+from flow_counters import as_numpy as _as_numpy
+
+# Column names and array.array type codes of columns (); addresses are uint32
+COLUMNS = [("flow", "L"), ("src", "L"), ("dst", "L"), ("protocol", "L"), ("srcPort", "L"), ("dstPort", "L"),
+           ("txPackets", "L"), ("rxPackets", "L"), ("lostPackets", "L"), ("txBytes", "d"), ("rxBytes", "d"),
+           ("timeFirstTx", "d"), ("timeLastTx", "d"), ("timeFirstRx", "d"), ("timeLastRx", "d"),
+           ("delay", "d"), ("jitter", "d"), ("offered", "d"), ("throughput", "d")]
+
+_UNITS = {"d": 86400.0, "h": 3600.0, "min": 60.0, "s": 1.0, "ms": 1e-3, "us": 1e-6, "ns": 1e-9,
+          "ps": 1e-12, "fs": 1e-15}
+_TIME = re.compile (r"^([-+]?[0-9.]+(?:[eE][-+]?[0-9]+)?)([a-z]*)$")
+
+
+def _seconds (value):
+    """Seconds of an ns-3 Time as printed in the XML ("+1.5e+09ns")."""
+    number, unit = _TIME.match (value).groups ()
+    return float (number) * _UNITS.get (unit or "s", 1.0)
+
+
+def _address (value):
+    return struct.unpack ("!I", socket.inet_aton (value))[0]
+
+
+def _rate (nBytes, begin, end):
+    return nBytes * 8.0 / (end - begin) / 1e6 if end > begin else 0.0
+
+
+def parse (source):
+    """Columns of the FlowMonitor XML in the file object source."""
+    columns = dict ((name, array.array (code)) for name, code in COLUMNS)
+    tuples = {}
+    inClassifier = False
+    for event, element in ElementTree.iterparse (source, events=("start", "end")):
+        tag = element.tag
+        if event == "end":
+            if tag.endswith ("FlowClassifier"):
+                inClassifier = False
+            if tag != "FlowMonitor":
+                element.clear ()
+            continue
+        if tag.endswith ("FlowClassifier"):
+            inClassifier = True
+        elif tag == "Flow" and inClassifier:
+            a = element.attrib
+            tuples[int (a["flowId"])] = (_address (a["sourceAddress"]), _address (a["destinationAddress"]),
+                                          int (a["protocol"]), int (a["sourcePort"]), int (a["destinationPort"]))
+        elif tag == "Flow":
+            a = element.attrib
+            columns["flow"].append (int (a["flowId"]))
+            rxPackets = int (a["rxPackets"])
+            columns["txPackets"].append (int (a["txPackets"]))
+            columns["rxPackets"].append (rxPackets)
+            columns["lostPackets"].append (int (a["lostPackets"]))
+            columns["txBytes"].append (float (a["txBytes"]))
+            columns["rxBytes"].append (float (a["rxBytes"]))
+            for name, attribute in (("timeFirstTx", "timeFirstTxPacket"), ("timeLastTx", "timeLastTxPacket"),
+                                    ("timeFirstRx", "timeFirstRxPacket"), ("timeLastRx", "timeLastRxPacket")):
+                columns[name].append (_seconds (a[attribute]))
+            columns["delay"].append (_seconds (a["delaySum"]) / rxPackets if rxPackets else float ("nan"))
+            columns["jitter"].append (_seconds (a["jitterSum"]) / (rxPackets - 1) if rxPackets > 1 else float ("nan"))
+
+    # Flows and classifier entries may come in any order
+    for flowId in columns["flow"]:
+        src, dst, protocol, srcPort, dstPort = tuples.get (flowId, (0, 0, 0, 0, 0))
+        columns["src"].append (src)
+        columns["dst"].append (dst)
+        columns["protocol"].append (protocol)
+        columns["srcPort"].append (srcPort)
+        columns["dstPort"].append (dstPort)
+    columns["offered"].extend ([_rate (b, first, last) for b, first, last in
+                                zip (columns["txBytes"], columns["timeFirstTx"], columns["timeLastTx"])])
+    columns["throughput"].extend ([_rate (b, first, last) for b, first, last in
+                                   zip (columns["rxBytes"], columns["timeFirstTx"], columns["timeLastRx"])])
+    return columns
+
+
+def columns (monitor):
+    """Statistics and 5-tuples of every flow of monitor (a FlowMonitor whose
+    classifiers are the ones of its helper) as {column: array.array}."""
+    monitor.CheckForLostPackets ()
+    xml = monitor.SerializeToXmlString (0, False, False)
+    if not isinstance (xml, bytes):
+        xml = xml.encode ("utf-8")
+    return parse (BytesIO (xml))
+
+
+def select (columns, mask):
+    """The rows of columns where the sequence mask is true."""
+    keep = [i for i, m in enumerate (mask) if m]
+    return dict ((name, array.array (values.typecode, [values[i] for i in keep])) for name, values in columns.items ())
+
+
+def write (sink, columns, **constants):
+    """Write columns to a results_sink.py sink, with a column for each of
+    constants repeating its value; one block for a ColumnarSink."""
+    rows = len (columns["flow"])
+    known = [name for name, code in COLUMNS if name in columns]
+    names = known + sorted (set (columns) - set (known)) + sorted (constants)
+    block = dict (columns)
+    for name, value in constants.items ():
+        block[name] = [value] * rows
+    if hasattr (sink, "write_columns"):
+        sink.flush ()
+        sink.write_columns (block, names)
+        return
+    for i in range (rows):
+        sink.write (dict ((name, block[name][i]) for name in names))
+
+
+def as_numpy (columns):
+    """The columns of columns () as one NumPy structured array."""
+    return _as_numpy (columns, [name for name, code in COLUMNS])
@@ -0,0 +1,89 @@
+# -*-  Mode: Python; -*-
+# /*
+#  * Copyright (c) 2016
+#  *
+#  * This program is free software; you can redistribute it and/or modify
+#  * it under the terms of the GNU General Public License version 2 as
+#  * published by the Free Software Foundation;
+#  *
+#  * This program is distributed in the hope that it will be useful,
+#  * but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  * GNU General Public License for more details.
+#  *
+#  * You should have received a copy of the GNU General Public License
+#  * along with this program; if not, write to the Free Software
+#  * Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#  */
+
+# Cost of the flow statistics of wifi-hidden-terminal.py: FlowMonitor on every
+# node (--flowStats=monitor) against the UdpServer counters of flow_counters.py
+# (--flowStats=counters), alone and with the delay of a fraction of the flows
+# (--delaySample), for growing numbers of nodes.
+#
+# The median wall time and peak resident memory of --repeat runs are reported;
+# the memory is the ru_maxrss of the child process, so this needs Linux.
+#
+#   ./waf shell
+#   python examples/wireless/flowstats-benchmark.py --nNodes 3,11,51,201
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+MODES = [
+    ("monitor", ["--flowStats=monitor"]),
+    ("counters", ["--flowStats=counters"]),
+    ("counters+delay", ["--flowStats=counters"]),
+]
+
+
+def _median (values):
+    values = sorted (values)
+    n = len (values)
+    if n % 2:
+        return values[n // 2]
+    return (values[n // 2 - 1] + values[n // 2]) / 2.0
+
+
+def measure (args, repeat):
+    """Median (wall time in s, peak RSS in MB) of wifi-hidden-terminal.py run with args."""
+    directory = os.path.dirname (os.path.abspath (__file__))
+    walls = []
+    memory = []
+    for i in range (repeat):
+        t = time.time ()
+        with open (os.devnull, "w") as devnull:
+            child = subprocess.Popen ([sys.executable, os.path.join (directory, "wifi-hidden-terminal.py")] + args,
+                                      cwd=directory, stdout=devnull)
+            pid, status, usage = os.wait4 (child.pid, 0)
+        walls.append (time.time () - t)
+        memory.append (usage.ru_maxrss / 1024.0)
+        if status != 0:
+            raise RuntimeError ("wifi-hidden-terminal.py %s exited with status %d" % (" ".join (args), status))
+    return _median (walls), _median (memory)
+
+
+def main (argv):
+    parser = argparse.ArgumentParser (description="Flow statistics cost in wifi-hidden-terminal.py")
+    parser.add_argument ("--nNodes", default="3,11,51",
+                         help="comma separated numbers of nodes")
+    parser.add_argument ("--delaySample", type=float, default=0.1,
+                         help="fraction of the flows whose delay is measured in the counters+delay mode")
+    parser.add_argument ("--repeat", type=int, default=3)
+    args = parser.parse_args (argv[1:])
+
+    print ("%-8s %-16s %10s %10s" % ("nodes", "mode", "wall (s)", "RSS (MB)"))
+    for nNodes in [int (n) for n in args.nNodes.split (",")]:
+        for name, options in MODES:
+            options = options + ["--nNodes=%d" % nNodes]
+            if name == "counters+delay":
+                options.append ("--delaySample=%s" % args.delaySample)
+            wall, rss = measure (options, args.repeat)
+            print ("%-8d %-16s %10.3f %10.1f" % (nNodes, name, wall, rss))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit (main (sys.argv))
@@ -0,0 +1,112 @@
+# -*-  Mode: Python; -*-
+# /*
+#  * Copyright (c) 2016
+#  *
+#  * This program is free software; you can redistribute it and/or modify
+#  * it under the terms of the GNU General Public License version 2 as
+#  * published by the Free Software Foundation;
+#  *
+#  * This program is distributed in the hope that it will be useful,
+#  * but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  * GNU General Public License for more details.
+#  *
+#  * You should have received a copy of the GNU General Public License
+#  * along with this program; if not, write to the Free Software
+#  * Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#  */
+
+# Cost of loading the propagation loss matrix of wifi-hidden-terminal.py
+# against the number of nodes.
+#
+# For every --nNodes count a matrix is written to a temporary .npz file, as a
+# chain (N - 1 links) or with every pair of nodes linked (--topology=full,
+# N (N - 1) / 2 links), and wifi-hidden-terminal.py --timing=True is run on it
+# --repeat times.  The median time of LossMatrix.apply () (one SetLoss call
+# per link), per link and as a share of the whole setup is reported, with the
+# setup and run times of the first (RTS/CTS disabled) experiment.  A constant
+# time per link means loading is linear in the number of links.
+#
+#   ./waf shell
+#   python examples/wireless/loss-matrix-benchmark.py --nNodes 3,11,51,201 --topology full
+
+import argparse
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+
+import loss_matrix
+
+_TIMING = re.compile (r"Loss matrix: (\d+) links in ([0-9.]+) s; setup time: ([0-9.]+) s; run time: ([0-9.]+) s")
+
+
+def _median (values):
+    values = sorted (values)
+    n = len (values)
+    if n % 2:
+        return values[n // 2]
+    return (values[n // 2 - 1] + values[n // 2]) / 2.0
+
+
+def full (nNodes, loss=50.0):
+    """Every pair of nodes linked."""
+    pairs = [(i, j) for i in range (nNodes) for j in range (i + 1, nNodes)]
+    return loss_matrix.LossMatrix (nNodes, [i for i, j in pairs], [j for i, j in pairs], [loss] * len (pairs))
+
+
+def measure (path, repeat):
+    """Median (links, load time, setup time, run time) of wifi-hidden-terminal.py on the matrix at path."""
+    directory = os.path.dirname (os.path.abspath (__file__))
+    args = [sys.executable, os.path.join (directory, "wifi-hidden-terminal.py"), "--lossMatrix=%s" % path,
+            "--timing=True", "--flowStats=counters"]
+    loads = []
+    setups = []
+    runs = []
+    for i in range (repeat):
+        child = subprocess.Popen (args, cwd=directory, stdout=subprocess.PIPE)
+        output = child.communicate ()[0].decode ("utf-8", "replace")
+        timing = _TIMING.search (output)
+        if child.returncode != 0 or timing is None:
+            raise RuntimeError ("%s exited with status %d" % (" ".join (args), child.returncode))
+        links = int (timing.group (1))
+        loads.append (float (timing.group (2)))
+        setups.append (float (timing.group (3)))
+        runs.append (float (timing.group (4)))
+    return links, _median (loads), _median (setups), _median (runs)
+
+
+def main (argv):
+    parser = argparse.ArgumentParser (description="Loss matrix loading time of wifi-hidden-terminal.py")
+    parser.add_argument ("--nNodes", default="3,11,51,201", help="comma separated numbers of nodes")
+    parser.add_argument ("--topology", default="full", choices=["chain", "full"])
+    parser.add_argument ("--repeat", type=int, default=3)
+    parser.add_argument ("--save", help="write the results to this JSON lines file")
+    args = parser.parse_args (argv[1:])
+
+    out = open (args.save, "w") if args.save else None
+    tmp = tempfile.mkdtemp ()
+    try:
+        print ("%-8s %8s %10s %12s %8s %10s %10s" % ("nNodes", "links", "load (s)", "us per link", "share",
+                                                   "setup (s)", "run (s)"))
+        for nNodes in [int (n) for n in args.nNodes.split (",")]:
+            matrix = full (nNodes) if args.topology == "full" else loss_matrix.chain (nNodes)
+            path = os.path.join (tmp, "%s-%d.npz" % (args.topology, nNodes))
+            loss_matrix.save (matrix, path)
+            links, load, setup, run = measure (path, args.repeat)
+            print ("%-8d %8d %10.4f %12.2f %7.1f%% %10.3f %10.3f" % (nNodes, links, load, load / max (links, 1) * 1e6,
+                                                                    100.0 * load / setup, setup, run))
+            if out is not None:
+                out.write (json.dumps ({"nNodes": nNodes, "topology": args.topology, "links": links,
+                                        "load": load, "setup": setup, "run": run}, sort_keys=True) + "\n")
+    finally:
+        shutil.rmtree (tmp)
+        if out is not None:
+            out.close ()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit (main (sys.argv))
@@ -0,0 +1,160 @@
+# -*-  Mode: Python; -*-
+# /*
+#  * Copyright (c) 2016
+#  *
+#  * This program is free software; you can redistribute it and/or modify
+#  * it under the terms of the GNU General Public License version 2 as
+#  * published by the Free Software Foundation;
+#  *
+#  * This program is distributed in the hope that it will be useful,
+#  * but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  * GNU General Public License for more details.
+#  *
+#  * You should have received a copy of the GNU General Public License
+#  * along with this program; if not, write to the Free Software
+#  * Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#  */
+
+# Sparse propagation loss matrices for MatrixPropagationLossModel.
+#
+# A LossMatrix is the list of the links that exist, (i, j, loss in dB), either
+# symmetric (one entry per node pair) or directed (one entry per direction);
+# every other pair keeps the default loss of the model, i.e. no link.  apply ()
+# loads the links one by one, one SetLoss call per link (there is no bulk
+# setter on MatrixPropagationLossModel), with the mobility model of every node
+# resolved once beforehand instead of two GetObject lookups per call, so
+# loading a topology costs time linear in its number of links.  See
+# loss-matrix-benchmark.py.
+#
+# Matrices come from
+#
+#   chain (n, loss)        the classic hidden terminal chain 0 - 1 - ... - n-1
+#   from_array (a)         a dense NumPy array (missing links: nan, inf or >= noLink)
+#   load (path)            a file: .npy (dense), .npz (sparse, as written by save ())
+#                          or text, one "i j loss" line per link after a
+#                          "# nodes N symmetric|directed" header line
+#
+# NumPy is only needed for arrays and .npy/.npz files.
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class LossMatrix (object):
+    """Links of a loss matrix between nNodes nodes."""
+
+    def __init__ (self, nNodes, rows, cols, losses, symmetric=True):
+        self.nNodes = nNodes
+        self.rows = [int (i) for i in rows]
+        self.cols = [int (j) for j in cols]
+        self.losses = [float (loss) for loss in losses]
+        self.symmetric = symmetric
+        for i, j in zip (self.rows, self.cols):
+            if not (0 <= i < nNodes and 0 <= j < nNodes):
+                raise ValueError ("link %d-%d outside of the %d nodes" % (i, j, nNodes))
+
+    def __len__ (self):
+        return len (self.rows)
+
+    def neighbours (self):
+        """{node: [(neighbour, loss), ...]} over the links leaving each node."""
+        result = dict ((i, []) for i in range (self.nNodes))
+        for i, j, loss in zip (self.rows, self.cols, self.losses):
+            result[i].append ((j, loss))
+            if self.symmetric:
+                result[j].append ((i, loss))
+        return result
+
+    def apply (self, lossModel, nodes):
+        """Set the loss of every link on lossModel (a MatrixPropagationLossModel)
+        between the mobility models of nodes: one SetLoss call per link, the
+        mobility models being looked up once per node."""
+        from ns_lazy import ns
+        if nodes.GetN () < self.nNodes:
+            raise ValueError ("the loss matrix has %d nodes, the topology only %d" % (self.nNodes, nodes.GetN ()))
+        typeId = ns.mobility.MobilityModel.GetTypeId ()
+        mobility = [nodes.Get (i).GetObject (typeId) for i in range (self.nNodes)]
+        setLoss = lossModel.SetLoss
+        symmetric = self.symmetric
+        for i, j, loss in zip (self.rows, self.cols, self.losses):
+            setLoss (mobility[i], mobility[j], loss, symmetric)
+
+
+def chain (nNodes, loss=50.0):
+    """Nodes in a line, each only reaching its neighbours."""
+    return LossMatrix (nNodes, range (nNodes - 1), range (1, nNodes), [loss] * (nNodes - 1))
+
+
+def _require_numpy ():
+    if numpy is None:
+        raise ImportError ("loss matrices from arrays need NumPy")
+
+
+def from_array (array, noLink=None, symmetric=None):
+    """LossMatrix of a dense square array; entries that are nan, inf, or at
+    least noLink, and the diagonal, are not links.  symmetric defaults to
+    whether the array equals its transpose."""
+    _require_numpy ()
+    a = numpy.asarray (array, dtype=float)
+    if a.ndim != 2 or a.shape[0] != a.shape[1]:
+        raise ValueError ("a loss matrix must be square, not %s" % (a.shape,))
+    present = numpy.isfinite (a)
+    if noLink is not None:
+        present &= a < noLink
+    numpy.fill_diagonal (present, False)
+    if symmetric is None:
+        symmetric = bool ((present == present.T).all () and (a[present] == a.T[present]).all ())
+    if symmetric:
+        present = numpy.triu (present)
+    rows, cols = numpy.nonzero (present)
+    return LossMatrix (a.shape[0], rows.tolist (), cols.tolist (), a[rows, cols].tolist (), symmetric)
+
+
+def load (path, noLink=None):
+    """LossMatrix of a .npy, .npz or text file."""
+    if path.endswith (".npy"):
+        _require_numpy ()
+        return from_array (numpy.load (path, mmap_mode="r"), noLink)
+    if path.endswith (".npz"):
+        _require_numpy ()
+        data = numpy.load (path)
+        return LossMatrix (int (data["nNodes"]), data["rows"].tolist (), data["cols"].tolist (),
+                           data["losses"].tolist (), bool (data["symmetric"]))
+    nNodes = None
+    symmetric = True
+    rows = []
+    cols = []
+    losses = []
+    with open (path) as f:
+        for line in f:
+            fields = line.split ()
+            if not fields:
+                continue
+            if fields[0] == "#":
+                if len (fields) >= 3 and fields[1] == "nodes":
+                    nNodes = int (fields[2])
+                    symmetric = len (fields) < 4 or fields[3] != "directed"
+                continue
+            rows.append (int (fields[0]))
+            cols.append (int (fields[1]))
+            losses.append (float (fields[2]))
+    if nNodes is None:
+        nNodes = max (rows + cols) + 1 if rows else 0
+    return LossMatrix (nNodes, rows, cols, losses, symmetric)
+
+
+def save (matrix, path):
+    """Write matrix as .npz or, for any other extension, as text."""
+    if path.endswith (".npz"):
+        _require_numpy ()
+        numpy.savez_compressed (path, nNodes=matrix.nNodes, rows=numpy.array (matrix.rows, dtype=numpy.int32),
+                                cols=numpy.array (matrix.cols, dtype=numpy.int32),
+                                losses=numpy.array (matrix.losses), symmetric=matrix.symmetric)
+        return
+    with open (path, "w") as f:
+        f.write ("# nodes %d %s\n" % (matrix.nNodes, "symmetric" if matrix.symmetric else "directed"))
+        for i, j, loss in zip (matrix.rows, matrix.cols, matrix.losses):
+            f.write ("%d %d %g\n" % (i, j, loss))
@@ -0,0 +1,188 @@
+# -*-  Mode: Python; -*-
+# /*
+#  * Copyright (c) 2016
+#  *
+#  * This program is free software; you can redistribute it and/or modify
+#  * it under the terms of the GNU General Public License version 2 as
+#  * published by the Free Software Foundation;
+#  *
+#  * This program is distributed in the hope that it will be useful,
+#  * but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  * GNU General Public License for more details.
+#  *
+#  * You should have received a copy of the GNU General Public License
+#  * along with this program; if not, write to the Free Software
+#  * Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#  */
+
+# Compact binary mobility traces.
+#
+# MobilityRecorder writes one fixed-width record per course change instead of
+# a line of text: time, node id, position and velocity (RECORD, 64 bytes,
+# little-endian).  The CourseChange trace of each recorded node is connected
+# with its node id bound, and records are packed into a preallocated buffer
+# written bufferRecords at a time, so nothing is formatted as text or parsed
+# back.  With interval > 0, a course change is dropped as it happens unless
+# the last one kept for its node is at least interval seconds old.
+#
+# close () writes an index next to the trace (<path>.idx): for every node the
+# number of its records and where their record numbers start in the list of
+# record numbers that follows, so the trajectory of a node is read without
+# scanning the trace.
+#
+# Trace file:  the magic "NSMOB1\n\0", then the records.
+# Index file:  the magic "NSMOBI\n\0", uint32 nodes, uint64 records, then per
+#              node uint64 start and uint64 count, then uint64 record numbers.
+#
+# MobilityTrace memory-maps both with NumPy (only needed for reading):
+# records () is the whole trace as a structured array and trajectory (node)
+# the records of one node, in time order.
+
+import array
+import struct
+
+from ns_lazy import ns
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+MAGIC = b"NSMOB1\n\0"
+INDEX_MAGIC = b"NSMOBI\n\0"
+
+# time, node, reserved, x, y, z, vx, vy, vz
+RECORD = struct.Struct ("<dII6d")
+RECORD_FIELDS = [("time", "<f8"), ("node", "<u4"), ("reserved", "<u4"), ("x", "<f8"), ("y", "<f8"),
+                 ("z", "<f8"), ("vx", "<f8"), ("vy", "<f8"), ("vz", "<f8")]
+
+
+class MobilityRecorder (object):
+    """Writes the course changes of nodes to path."""
+
+    def __init__ (self, path, interval=0.0, bufferRecords=4096):
+        self.path = path
+        self.interval = interval
+        self.f = open (path, "wb")
+        self.f.write (MAGIC)
+        self.buffer = bytearray (RECORD.size * bufferRecords)
+        self.capacity = bufferRecords
+        self.pending = 0
+        self.records = 0
+        self.lastKept = []
+        self.nodeRecords = {}
+
+    def install (self, nodes=None):
+        """Record the course changes of nodes (a NodeContainer), or of all nodes."""
+        if nodes is None:
+            nodes = ns.network.NodeContainer.GetGlobal ()
+        self.lastKept = [None] * ns.network.NodeList.GetNNodes ()
+        for i in range (nodes.GetN ()):
+            node = nodes.Get (i).GetId ()
+            ns.core.Config.Connect ("/NodeList/%d/$ns3::MobilityModel/CourseChange" % node,
+                                    self._course_change_of (node))
+
+    def _course_change_of (self, node):
+        def course_change (context, model):
+            self._course_change (node, model)
+        return course_change
+
+    def _course_change (self, node, model):
+        now = ns.core.Simulator.Now ().GetSeconds ()
+        if self.interval > 0:
+            last = self.lastKept[node]
+            if last is not None and now - last < self.interval:
+                return
+            self.lastKept[node] = now
+        position = model.GetPosition ()
+        velocity = model.GetVelocity ()
+        self.add (now, node, position.x, position.y, position.z, velocity.x, velocity.y, velocity.z)
+
+    def add (self, time, node, x, y, z, vx, vy, vz):
+        """Write one record."""
+        RECORD.pack_into (self.buffer, self.pending * RECORD.size, time, node, 0, x, y, z, vx, vy, vz)
+        numbers = self.nodeRecords.get (node)
+        if numbers is None:
+            numbers = self.nodeRecords[node] = array.array ("L")
+        numbers.append (self.records)
+        self.records += 1
+        self.pending += 1
+        if self.pending == self.capacity:
+            self.flush ()
+
+    def flush (self):
+        if self.pending:
+            self.f.write (memoryview (self.buffer)[:self.pending * RECORD.size])
+            self.pending = 0
+
+    def close (self):
+        """Write the buffered records and the index."""
+        self.flush ()
+        self.f.close ()
+        nNodes = max (self.nodeRecords) + 1 if self.nodeRecords else 0
+        with open (self.path + ".idx", "wb") as f:
+            f.write (INDEX_MAGIC + struct.pack ("<IQ", nNodes, self.records))
+            starts = []
+            start = 0
+            for node in range (nNodes):
+                count = len (self.nodeRecords.get (node, ()))
+                starts.append (struct.pack ("<QQ", start, count))
+                start += count
+            f.write (b"".join (starts))
+            for node in range (nNodes):
+                numbers = self.nodeRecords.get (node)
+                if numbers:
+                    f.write (struct.pack ("<%dQ" % len (numbers), *numbers))
+
+
+class MobilityTrace (object):
+    """Read access to a trace written by MobilityRecorder."""
+
+    def __init__ (self, path):
+        if numpy is None:
+            raise ImportError ("reading mobility traces needs NumPy")
+        with open (path, "rb") as f:
+            if f.read (len (MAGIC)) != MAGIC:
+                raise ValueError ("%s is not a binary mobility trace" % path)
+            f.seek (0, 2)
+            empty = f.tell () < len (MAGIC) + RECORD.size
+        dtype = numpy.dtype (RECORD_FIELDS)
+        if empty:
+            self.data = numpy.zeros (0, dtype=dtype)
+        else:
+            self.data = numpy.memmap (path, dtype=dtype, mode="r", offset=len (MAGIC))
+        self.index = None
+        try:
+            with open (path + ".idx", "rb") as f:
+                header = f.read (len (INDEX_MAGIC) + 12)
+        except IOError:
+            return
+        if not header.startswith (INDEX_MAGIC):
+            raise ValueError ("%s.idx is not a mobility trace index" % path)
+        nNodes, records = struct.unpack_from ("<IQ", header, len (INDEX_MAGIC))
+        offset = len (INDEX_MAGIC) + 12
+        table = numpy.memmap (path + ".idx", dtype="<u8", mode="r", offset=offset, shape=(nNodes, 2))
+        numbers = numpy.memmap (path + ".idx", dtype="<u8", mode="r", offset=offset + 16 * nNodes,
+                                shape=(records,)) if records else numpy.zeros (0, dtype="<u8")
+        self.index = (table, numbers)
+
+    def records (self):
+        """Every record, in the order written (time order)."""
+        return self.data
+
+    def nodes (self):
+        """Ids of the nodes that have records."""
+        if self.index is not None:
+            return numpy.flatnonzero (self.index[0][:, 1])
+        return numpy.unique (self.data["node"])
+
+    def trajectory (self, node):
+        """The records of node, in time order."""
+        if self.index is None:
+            return self.data[self.data["node"] == node]
+        table, numbers = self.index
+        if node >= len (table):
+            return self.data[:0]
+        start, count = table[node]
+        return self.data[numbers[start:start + count]]
@@ -0,0 +1,93 @@
+# -*-  Mode: Python; -*-
+# /*
+#  * Copyright (c) 2016
+#  *
+#  * This program is free software; you can redistribute it and/or modify
+#  * it under the terms of the GNU General Public License version 2 as
+#  * published by the Free Software Foundation;
+#  *
+#  * This program is distributed in the hope that it will be useful,
+#  * but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  * GNU General Public License for more details.
+#  *
+#  * You should have received a copy of the GNU General Public License
+#  * along with this program; if not, write to the Free Software
+#  * Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#  */
+
+# On-demand loading of the ns-3 binding modules.
+#
+# The examples use
+#
+#   from ns_lazy import ns
+#
+# instead of a list of "import ns.xxx" statements.  ns.core, ns.wifi, ... are then
+# imported the first time the script touches them, so a script only pays for the
+# bindings it uses in the mode it runs in.  Modules with heavy side dependencies
+# (ns.visualizer pulls in GTK) should be requested explicitly with load ().
+#
+# If the environment variable NS_LAZY_PROFILE names a file, the import time of
+# every module is recorded and, as soon as the first Simulator::Run executes its
+# first event, written to that file as JSON and the process exits.  This is what
+# startup-benchmark.py uses to measure start-up cost.  ns.core.Simulator is then
+# a wrapper whose Run () schedules that probe first: nothing is scheduled before
+# the script runs, so it can still choose the simulator implementation (e.g.
+# SimulatorImplementationType for a distributed run).
+
+import importlib
+import json
+import os
+import sys
+import time
+
+_start = time.time ()
+_profile = os.environ.get ("NS_LAZY_PROFILE")
+
+# (module name, seconds spent importing it) in load order
+timings = []
+
+
+class _LazyNs (object):
+    def __getattr__ (self, name):
+        if name.startswith ("__"):
+            raise AttributeError (name)
+        return load (name)
+
+ns = _LazyNs ()
+
+
+def load (name):
+    """Import ns.<name> now (if not already done) and return it."""
+    module = ns.__dict__.get (name)
+    if module is not None:
+        return module
+    t = time.time ()
+    module = importlib.import_module ("ns." + name)
+    timings.append ((name, time.time () - t))
+    ns.__dict__[name] = module
+    if _profile and name == "core":
+        module.Simulator = _ProfiledSimulator (module.Simulator)
+    return module
+
+
+class _ProfiledSimulator (object):
+    """ns.core.Simulator, with the profile probe scheduled by Run ()."""
+
+    def __init__ (self, simulator):
+        self._simulator = simulator
+
+    def __getattr__ (self, name):
+        return getattr (self._simulator, name)
+
+    def Run (self):
+        self._simulator.ScheduleNow (_first_event)
+        self._simulator.Run ()
+
+
+def _first_event ():
+    with open (_profile, "w") as f:
+        json.dump ({"imports": timings,
+                    "firstRun": time.time () - _start}, f)
+    sys.stdout.flush ()
+    os._exit (0)
@@ -0,0 +1,97 @@
+# -*-  Mode: Python; -*-
+# /*
+#  * Copyright (c) 2016
+#  *
+#  * This program is free software; you can redistribute it and/or modify
+#  * it under the terms of the GNU General Public License version 2 as
+#  * published by the Free Software Foundation;
+#  *
+#  * This program is distributed in the hope that it will be useful,
+#  * but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  * GNU General Public License for more details.
+#  *
+#  * You should have received a copy of the GNU General Public License
+#  * along with this program; if not, write to the Free Software
+#  * Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#  */
+
+# Wi-Fi metrics of the pcap traces written by the examples with
+# SetPcapDataLinkType (DLT_IEEE802_11_RADIO), e.g.
+#
+#   python simple-ht-hidden-stations.py --pcap=True --nMpdus=32
+#   python pcap-analyzer.py SimpleHtHiddenStations_py_Ap-0-0.pcap
+#
+# For every capture it reports, per IPv4 flow, the goodput (transport payload of
+# the frames without the retry bit over the time the flow was seen), frame and
+# retry counts, and for the whole capture the A-MPDU size histogram (from the
+# radiotap A-MPDU status reference numbers), the RTS, CTS, BlockAckReq and
+# BlockAck counts, the BlockAck delay (the time from the start of the last data
+# frame to the start of the BlockAck answering it), the airtime by frame kind,
+# and per transmitter the data MPDUs, retries and airtime.
+#
+# The file is memory-mapped and decoded --batchSize records at a time with NumPy
+# (see pcap_stats.py), so memory does not grow with the size of the capture.
+# Truncated captures (trace_output.py --snaplen) are fine as long as the headers
+# are kept.
+#
+# Needs NumPy.  --output writes the per-flow records through results_sink.py.
+
+import argparse
+import sys
+
+from pcap_stats import numpy, analyze, flow_records, station_records, ampdu_summary, AIRTIME_KINDS
+from results_sink import open_sink
+
+
+def report (path, stats, out=sys.stdout):
+    out.write ("%s: %d frames\n" % (path, stats.frames))
+    out.write ("  %-36s %10s %8s %8s %14s\n" % ("flow", "frames", "retries", "retry %", "goodput Mbit/s"))
+    for r in flow_records (path, stats):
+        name = "%s:%d > %s:%d/%d" % (r["src"], r["srcPort"], r["dst"], r["dstPort"], r["proto"])
+        out.write ("  %-36s %10d %8d %8.2f %14.3f\n" % (name, r["frames"], r["retries"],
+                                                         100.0 * r["retries"] / r["frames"], r["throughput"]))
+    c = stats.counts
+    out.write ("  data frames %d, retries %d (%.2f%%)\n" % (c["data"], c["retries"],
+                                                            100.0 * c["retries"] / c["data"] if c["data"] else 0.0))
+    out.write ("  RTS %d, CTS %d, BlockAckReq %d, BlockAck %d\n" % (c["rts"], c["cts"], c["blockackreq"], c["blockack"]))
+    nAmpdu, meanSize = ampdu_summary (stats)
+    if nAmpdu:
+        out.write ("  A-MPDUs %d, mean %.2f MPDUs, histogram (MPDUs: count) %s\n" % (
+            nAmpdu, meanSize, " ".join ("%d:%d" % (s, stats.ampdu[s]) for s in numpy.flatnonzero (stats.ampdu))))
+    nDelays = int (stats.delays.sum ())
+    if nDelays:
+        out.write ("  BlockAck delay: mean %.1f us, min %.1f us, max %.1f us over %d BlockAcks\n" % (
+            stats.delaySum / nDelays * 1e6, stats.delayMin * 1e6, stats.delayMax * 1e6, nDelays))
+    out.write ("  airtime (ms): %s\n" % ", ".join ("%s %.3f" % (name, stats.airtime[name] * 1e3)
+                                                    for name in AIRTIME_KINDS if stats.airtime[name]))
+    for r in station_records (path, stats):
+        out.write ("  station %s: %d data MPDUs, %d retries, airtime %.3f ms (RTS %.3f ms)\n" % (
+            r["station"], r["mpdus"], r["retries"], r["airtime"] * 1e3, r["rtsAirtime"] * 1e3))
+
+
+def main (argv):
+    parser = argparse.ArgumentParser (description="Per-flow Wi-Fi metrics of radiotap pcap traces")
+    parser.add_argument ("captures", nargs="+")
+    parser.add_argument ("--batchSize", type=int, default=1 << 18, help="records decoded at a time")
+    parser.add_argument ("--output", help="write the per-flow records to this file")
+    parser.add_argument ("--format", help="format of the output file: jsonl, csv or col (default: from the extension)")
+    args = parser.parse_args (argv[1:])
+
+    if numpy is None:
+        print ("The pcap analyzer needs NumPy!")
+        return 1
+
+    sink = open_sink (args.output, args.format) if args.output else None
+    for path in args.captures:
+        stats = analyze (path, args.batchSize)
+        report (path, stats)
+        if sink is not None:
+            for record in flow_records (path, stats):
+                sink.write (record)
+    if sink is not None:
+        sink.close ()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit (main (sys.argv))
@@ -0,0 +1,412 @@
+# -*-  Mode: Python; -*-
+# /*
+#  * Copyright (c) 2016
+#  *
+#  * This program is free software; you can redistribute it and/or modify
+#  * it under the terms of the GNU General Public License version 2 as
+#  * published by the Free Software Foundation;
+#  *
+#  * This program is distributed in the hope that it will be useful,
+#  * but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  * GNU General Public License for more details.
+#  *
+#  * You should have received a copy of the GNU General Public License
+#  * along with this program; if not, write to the Free Software
+#  * Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#  */
+
+# Batch decoding of the radiotap pcap traces, used by pcap-analyzer.py and by
+# the examples that report MAC statistics from their own captures.
+#
+# analyze () memory-maps a capture and reads it batchSize records at a time.
+# Records are located one by one, then decoded with NumPy for the whole batch:
+# the radiotap headers are grouped by their present bitmap, which fixes the
+# layout of the fields, and the 802.11, LLC, IPv4 and UDP/TCP fields are
+# gathered at computed offsets.  Only counters and fixed-size histograms are
+# kept between batches (CaptureStats), so memory does not grow with the size of
+# the capture.  Truncated captures (trace_output.py --snaplen) are fine as long
+# as the headers are kept: frame lengths come from the original lengths of the
+# records.
+#
+# CaptureStats holds per IPv4 flow goodput, frame and retry counts; the A-MPDU
+# size histogram; RTS, CTS, BlockAckReq and BlockAck counts; the BlockAck delay
+# histogram; airtime by frame kind; and per transmitter the data MPDUs, retries
+# and airtime.  Airtime is computed from the frame length and the radiotap rate
+# or HT MCS field.
+#
+# Needs NumPy.
+
+import mmap
+import os
+import socket
+import struct
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from phy_estimate import DATA_SUBCARRIERS, BITS_PER_SUBCARRIER
+
+DLT_IEEE802_11 = 105
+DLT_IEEE802_11_RADIO = 127
+
+# Radiotap fields by present bit: (alignment, size)
+RADIOTAP_FIELDS = [(8, 8), (1, 1), (1, 1), (2, 4), (1, 2), (1, 1), (1, 1), (2, 2), (2, 2), (2, 2),
+                   (1, 1), (1, 1), (1, 1), (1, 1), (2, 2), (2, 2), (1, 1), (1, 1), (4, 8), (1, 3),
+                   (4, 8), (2, 12)]
+RADIOTAP_RATE = 2
+RADIOTAP_MCS = 19
+RADIOTAP_AMPDU_STATUS = 20
+AMPDU_LAST_KNOWN = 0x0004
+AMPDU_LAST = 0x0008
+
+# BlockAck delay histogram: 10 us bins up to 1 ms, the last bin counts the rest
+DELAY_BIN = 10e-6
+DELAY_BINS = 101
+# A-MPDU size histogram: MPDUs per A-MPDU, the last bin counts the rest
+AMPDU_BINS = 257
+
+# Airtime is accounted to these frame kinds
+AIRTIME_KINDS = ["data", "mgmt", "rts", "cts", "ack", "blockackreq", "blockack", "other"]
+# Control subtypes with a transmitter address
+_CONTROL_SUBTYPES = {"blockackreq": 8, "blockack": 9, "rts": 11, "cts": 12, "ack": 13}
+
+
+def radiotap_layout (header):
+    """Offsets of the radiotap fields present in header (bytes up to and
+    including the present words), as {bit: offset}."""
+    words = []
+    pos = 4
+    while True:
+        word, = struct.unpack_from ("<I", header, pos)
+        words.append (word)
+        pos += 4
+        if not word & 0x80000000:
+            break
+    offsets = {}
+    for bit, (align, size) in enumerate (RADIOTAP_FIELDS):
+        if words[0] & (1 << bit):
+            pos = (pos + align - 1) // align * align
+            offsets[bit] = pos
+            pos += size
+    # Fields after the ones known here cannot be located, but are not needed
+    return offsets
+
+
+def _records (mm, start, batchSize, nano):
+    """Locate up to batchSize records from start: (offsets, times, lengths,
+    original lengths, next start)."""
+    offsets = []
+    times = []
+    lengths = []
+    originals = []
+    size = len (mm)
+    pos = start
+    unpack = struct.Struct ("<IIII").unpack_from
+    scale = 1e-9 if nano else 1e-6
+    while pos + 16 <= size and len (offsets) < batchSize:
+        seconds, fraction, length, original = unpack (mm, pos)
+        if pos + 16 + length > size:
+            break # incomplete last record
+        offsets.append (pos + 16)
+        times.append (seconds + fraction * scale)
+        lengths.append (length)
+        originals.append (original)
+        pos += 16 + length
+    return (numpy.array (offsets, dtype=numpy.int64), numpy.array (times), numpy.array (lengths, dtype=numpy.int64),
+            numpy.array (originals, dtype=numpy.int64), pos)
+
+
+class CaptureStats (object):
+    """Counters of one capture, updated a batch at a time."""
+
+    def __init__ (self):
+        self.frames = 0
+        self.flows = {}
+        self.counts = dict ((name, 0) for name in ("data", "retries", "rts", "cts", "blockackreq", "blockack"))
+        self.ampdu = numpy.zeros (AMPDU_BINS, dtype=numpy.int64)
+        self.openRef = None
+        self.openCount = 0
+        self.lastData = None
+        self.delays = numpy.zeros (DELAY_BINS, dtype=numpy.int64)
+        self.delaySum = 0.0
+        self.delayMin = None
+        self.delayMax = None
+        self.airtime = dict ((name, 0.0) for name in AIRTIME_KINDS)
+        self.stations = {}
+
+    def add_batch (self, buf, offsets, times, lengths, linkType, originals=None):
+        n = len (offsets)
+        if originals is None:
+            originals = lengths
+        self.frames += n
+        last = len (buf) - 1
+
+        def u8 (index):
+            return buf[numpy.minimum (index, last)].astype (numpy.int64)
+
+        def le16 (index):
+            return u8 (index) | (u8 (index + 1) << 8)
+
+        def be16 (index):
+            return (u8 (index) << 8) | u8 (index + 1)
+
+        def le32 (index):
+            return le16 (index) | (le16 (index + 2) << 16)
+
+        def be32 (index):
+            return (be16 (index) << 16) | be16 (index + 2)
+
+        ends = offsets + lengths
+        # Radiotap: length, A-MPDU status and PHY rate (Mbit/s), by layout
+        rtLen = numpy.zeros (n, dtype=numpy.int64)
+        ampduRef = numpy.full (n, -1, dtype=numpy.int64)
+        ampduFlags = numpy.zeros (n, dtype=numpy.int64)
+        rate = numpy.zeros (n)
+        preamble = numpy.zeros (n) # microseconds
+        serviceBits = numpy.zeros (n)
+        if linkType == DLT_IEEE802_11_RADIO:
+            rtLen = le16 (offsets + 2)
+            present = le32 (offsets + 4)
+            for value in numpy.unique (present):
+                group = numpy.flatnonzero (present == value)
+                first = offsets[group[0]]
+                layout = radiotap_layout (bytearray (buf[first:first + rtLen[group[0]]]))
+                if RADIOTAP_AMPDU_STATUS in layout:
+                    at = offsets[group] + layout[RADIOTAP_AMPDU_STATUS]
+                    ampduRef[group] = le32 (at)
+                    ampduFlags[group] = le16 (at + 4)
+                if RADIOTAP_MCS in layout:
+                    # HT mixed format: legacy and HT preambles, one HT-LTF per stream (4 for 3)
+                    at = offsets[group] + layout[RADIOTAP_MCS]
+                    flags = u8 (at + 1)
+                    index = u8 (at + 2)
+                    streams = index // 8 + 1
+                    subcarriers = numpy.where ((flags & 3) == 1, DATA_SUBCARRIERS[40], DATA_SUBCARRIERS[20])
+                    symbol = numpy.where ((flags & 4) != 0, 3.6, 4.0)
+                    rate[group] = subcarriers * numpy.asarray (BITS_PER_SUBCARRIER)[index % 8] * streams / symbol
+                    preamble[group] = 32.0 + 4 * numpy.where (streams == 3, 4, streams)
+                    serviceBits[group] = 22
+                elif RADIOTAP_RATE in layout:
+                    legacy = u8 (offsets[group] + layout[RADIOTAP_RATE]) * 0.5
+                    dsss = (legacy == 1) | (legacy == 2) | (legacy == 5.5) | (legacy == 11)
+                    rate[group] = legacy
+                    preamble[group] = numpy.where (dsss, 192.0, 20.0)
+                    serviceBits[group] = numpy.where (dsss, 0, 22)
+
+        # 802.11 frame control
+        mac = offsets + rtLen
+        valid = mac + 2 <= ends
+        fc0 = u8 (mac)
+        fc1 = u8 (mac + 1)
+        kind = (fc0 >> 2) & 3
+        sub = fc0 >> 4
+        retry = valid & ((fc1 & 0x08) != 0)
+        isData = valid & (kind == 2)
+        ctrl = valid & (kind == 1)
+        self.counts["data"] += int (numpy.count_nonzero (isData))
+        self.counts["retries"] += int (numpy.count_nonzero (isData & retry))
+        for name, subtype in (("rts", 11), ("cts", 12), ("blockackreq", 8), ("blockack", 9)):
+            self.counts[name] += int (numpy.count_nonzero (ctrl & (sub == subtype)))
+
+        self._ampdu (ampduRef[isData])
+        self._blockack (times[isData], times[ctrl & (sub == 9)])
+        self._airtime (buf, mac, ends, originals - rtLen, valid, kind, sub, retry, ampduRef, ampduFlags, rate,
+                       preamble, serviceBits, u8)
+
+        # LLC/SNAP and IPv4 of the unprotected data frames (not A-MSDUs)
+        qos = (sub & 8) != 0
+        header = 24 + 6 * ((fc1 & 3) == 3) + 2 * qos + 4 * (qos & ((fc1 & 0x80) != 0))
+        amsdu = qos & ((u8 (mac + header - 2) & 0x80) != 0)
+        llc = mac + header
+        ip = llc + 8
+        isIp = (isData & ((fc1 & 0x40) == 0) & ~amsdu & (ip + 20 <= ends) &
+                (be16 (llc) == 0xaaaa) & (be16 (llc + 6) == 0x0800) & ((u8 (ip) >> 4) == 4))
+        index = numpy.flatnonzero (isIp)
+        if not len (index):
+            return
+        ip = ip[index]
+        ihl = (u8 (ip) & 0x0f) * 4
+        total = be16 (ip + 2)
+        proto = u8 (ip + 9)
+        src = be32 (ip + 12)
+        dst = be32 (ip + 16)
+        l4 = ip + ihl
+        hasPorts = ((proto == 6) | (proto == 17)) & (l4 + 4 <= ends[index])
+        sport = numpy.where (hasPorts, be16 (l4), 0)
+        dport = numpy.where (hasPorts, be16 (l4 + 2), 0)
+        l4Header = numpy.where (proto == 17, 8, numpy.where (proto == 6, (u8 (l4 + 12) >> 4) * 4, 0))
+        payload = numpy.maximum (total - ihl - l4Header, 0)
+        fresh = ~retry[index]
+        t = times[index]
+
+        keys, inverse = numpy.unique (numpy.stack ([src, dst, proto, sport, dport], axis=1),
+                                      axis=0, return_inverse=True)
+        inverse = inverse.reshape (-1)
+        count = len (keys)
+        nFrames = numpy.bincount (inverse, minlength=count)
+        nRetries = numpy.bincount (inverse, weights=(~fresh).astype (float), minlength=count)
+        nBytes = numpy.bincount (inverse, weights=payload * fresh, minlength=count)
+        first = numpy.full (count, numpy.inf)
+        numpy.minimum.at (first, inverse, t)
+        lastSeen = numpy.full (count, -numpy.inf)
+        numpy.maximum.at (lastSeen, inverse, t)
+        for k in range (count):
+            key = tuple (int (v) for v in keys[k])
+            flow = self.flows.setdefault (key, {"frames": 0, "retries": 0, "bytes": 0,
+                                                "first": first[k], "last": lastSeen[k]})
+            flow["frames"] += int (nFrames[k])
+            flow["retries"] += int (nRetries[k])
+            flow["bytes"] += int (nBytes[k])
+            flow["first"] = min (flow["first"], float (first[k]))
+            flow["last"] = max (flow["last"], float (lastSeen[k]))
+
+    def _airtime (self, buf, mac, ends, onAir, valid, kind, sub, retry, ampduRef, ampduFlags, rate,
+                  preamble, serviceBits, u8):
+        """Airtime of the frames by kind and by transmitter.  An MPDU of an
+        A-MPDU takes its delimiter and padding; the preamble and service bits
+        go with the last one (with every one if the last is not marked).
+        Rounding to whole OFDM symbols is left out."""
+        ampdu = ampduRef >= 0
+        subframe = numpy.where (ampdu, (onAir + 4 + 3) // 4 * 4, onAir)
+        whole = ~ampdu | ((ampduFlags & AMPDU_LAST) != 0) | ((ampduFlags & AMPDU_LAST_KNOWN) == 0)
+        known = valid & (rate > 0)
+        airtime = numpy.where (known, (8 * subframe + serviceBits * whole) / numpy.maximum (rate, 1e-9) +
+                               preamble * whole, 0.0) * 1e-6
+        isData = valid & (kind == 2)
+        ctrl = valid & (kind == 1)
+        masks = {"data": isData, "mgmt": valid & (kind == 0)}
+        for name, subtype in _CONTROL_SUBTYPES.items ():
+            masks[name] = ctrl & (sub == subtype)
+        other = numpy.ones (len (mac), dtype=bool)
+        for name, mask in masks.items ():
+            self.airtime[name] += float (airtime[mask].sum ())
+            other &= ~mask
+        self.airtime["other"] += float (airtime[other].sum ())
+
+        # Per transmitter address: CTS and ACK have none
+        hasTa = (valid & (mac + 16 <= ends) & ~masks["cts"] & ~masks["ack"] &
+                 ((kind == 0) | (kind == 2) | ctrl))
+        index = numpy.flatnonzero (hasTa)
+        if not len (index):
+            return
+        ta = numpy.zeros (len (index), dtype=numpy.int64)
+        for i in range (6):
+            ta = (ta << 8) | u8 (mac[index] + 10 + i)
+        keys, inverse = numpy.unique (ta, return_inverse=True)
+        inverse = inverse.reshape (-1)
+        count = len (keys)
+        sums = {"airtime": numpy.bincount (inverse, weights=airtime[index], minlength=count),
+                "rtsAirtime": numpy.bincount (inverse, weights=airtime[index] * masks["rts"][index], minlength=count),
+                "mpdus": numpy.bincount (inverse, weights=isData[index].astype (float), minlength=count),
+                "retries": numpy.bincount (inverse, weights=(isData & retry)[index].astype (float), minlength=count)}
+        for k in range (count):
+            station = self.stations.setdefault (int (keys[k]), {"airtime": 0.0, "rtsAirtime": 0.0, "mpdus": 0,
+                                                                "retries": 0})
+            for name, values in sums.items ():
+                station[name] += type (station[name]) (values[k])
+
+    def _ampdu (self, refs):
+        """Count the MPDUs of each A-MPDU: runs of one reference number."""
+        refs = refs[refs >= 0]
+        if not len (refs):
+            return
+        starts = numpy.flatnonzero (numpy.diff (refs)) + 1
+        bounds = numpy.concatenate (([0], starts, [len (refs)]))
+        sizes = numpy.diff (bounds)
+        if self.openRef is not None:
+            if refs[0] == self.openRef:
+                sizes[0] += self.openCount
+            else:
+                self.ampdu[min (self.openCount, AMPDU_BINS - 1)] += 1
+        # The last run may go on in the next batch
+        self.openRef = int (refs[-1])
+        self.openCount = int (sizes[-1])
+        numpy.add.at (self.ampdu, numpy.minimum (sizes[:-1], AMPDU_BINS - 1), 1)
+
+    def _blockack (self, dataTimes, baTimes):
+        if len (baTimes):
+            previous = numpy.searchsorted (dataTimes, baTimes, side="right") - 1
+            base = dataTimes[numpy.maximum (previous, 0)] if len (dataTimes) else numpy.zeros (len (baTimes))
+            if self.lastData is not None:
+                base = numpy.where (previous < 0, self.lastData, base)
+                known = numpy.ones (len (baTimes), dtype=bool)
+            else:
+                known = previous >= 0
+            delay = (baTimes - base)[known]
+            if len (delay):
+                numpy.add.at (self.delays, numpy.minimum ((delay / DELAY_BIN).astype (numpy.int64), DELAY_BINS - 1), 1)
+                self.delaySum += float (delay.sum ())
+                self.delayMin = min (float (delay.min ()), self.delayMin if self.delayMin is not None else numpy.inf)
+                self.delayMax = max (float (delay.max ()), self.delayMax if self.delayMax is not None else 0.0)
+        if len (dataTimes):
+            self.lastData = float (dataTimes[-1])
+
+    def finish (self):
+        if self.openRef is not None:
+            self.ampdu[min (self.openCount, AMPDU_BINS - 1)] += 1
+            self.openRef = None
+
+
+def analyze (path, batchSize=1 << 18):
+    """CaptureStats of the pcap file path."""
+    if numpy is None:
+        raise ImportError ("the pcap analyzer needs NumPy")
+    stats = CaptureStats ()
+    with open (path, "rb") as f:
+        if os.fstat (f.fileno ()).st_size <= 24:
+            return stats
+        mm = mmap.mmap (f.fileno (), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, = struct.unpack_from ("<I", mm, 0)
+            if magic not in (0xa1b2c3d4, 0xa1b23c4d):
+                raise ValueError ("%s is not a little-endian pcap file" % path)
+            linkType, = struct.unpack_from ("<I", mm, 20)
+            if linkType not in (DLT_IEEE802_11_RADIO, DLT_IEEE802_11):
+                raise ValueError ("%s is not an 802.11 capture (link type %d)" % (path, linkType))
+            buf = numpy.frombuffer (mm, dtype=numpy.uint8)
+            pos = 24
+            while True:
+                offsets, times, lengths, originals, pos = _records (mm, pos, batchSize, magic == 0xa1b23c4d)
+                if not len (offsets):
+                    break
+                stats.add_batch (buf, offsets, times, lengths, linkType, originals)
+            del buf
+        finally:
+            mm.close ()
+    stats.finish ()
+    return stats
+
+
+def _ip (value):
+    return socket.inet_ntoa (struct.pack (">I", value))
+
+
+def flow_records (path, stats):
+    for (src, dst, proto, sport, dport), flow in sorted (stats.flows.items ()):
+        duration = flow["last"] - flow["first"]
+        yield {"capture": path, "src": _ip (src), "dst": _ip (dst), "proto": proto, "srcPort": sport,
+               "dstPort": dport, "frames": flow["frames"], "retries": flow["retries"], "bytes": flow["bytes"],
+               "duration": duration,
+               "throughput": flow["bytes"] * 8 / (duration * 1e6) if duration > 0 else 0.0}
+
+
+def mac_address (value):
+    return ":".join ("%02x" % ((value >> (8 * i)) & 0xff) for i in range (5, -1, -1))
+
+
+def station_records (path, stats):
+    """Per transmitter: data MPDUs seen, those with the retry bit, and airtime
+    (s) of all its frames and of its RTS."""
+    for address, station in sorted (stats.stations.items ()):
+        yield dict (station, capture=path, station=mac_address (address))
+
+
+def ampdu_summary (stats):
+    """(number of A-MPDUs, mean MPDUs per A-MPDU) of the histogram."""
+    nAmpdu = int (stats.ampdu.sum ())
+    if not nAmpdu:
+        return 0, 0.0
+    return nAmpdu, float ((numpy.arange (AMPDU_BINS) * stats.ampdu).sum ()) / nAmpdu
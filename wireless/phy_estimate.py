@@ -0,0 +1,142 @@
+# -*-  Mode: Python; -*-
+# /*
+#  * Copyright (c) 2016
+#  *
+#  * This program is free software; you can redistribute it and/or modify
+#  * it under the terms of the GNU General Public License version 2 as
+#  * published by the Free Software Foundation;
+#  *
+#  * This program is distributed in the hope that it will be useful,
+#  * but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  * GNU General Public License for more details.
+#  *
+#  * You should have received a copy of the GNU General Public License
+#  * along with this program; if not, write to the Free Software
+#  * Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#  */
+
+# Analytical estimate of the HT/VHT sweep points, computed for a whole grid at
+# once with NumPy before anything is simulated.
+#
+# For every point it gives the nominal PHY rate (data subcarriers x coded bits
+# per subcarrier / OFDM symbol duration) and the received SNR over the channel
+# YansWifiChannelHelper::Default builds (log-distance loss, exponent 3, 1 m
+# reference distance) with the YansWifiPhy defaults (16.0206 dBm transmit power,
+# 7 dB noise figure, -96 dBm energy detection threshold).  A point is predicted
+# to deliver nothing if the frame is below the energy detection threshold, or if
+# the SNR is more than margin dB under what its MCS needs to be decoded.
+#
+# run_prefiltered () uses the estimate in front of wifi_sweep.run_points ():
+#
+#   mark   simulate every point, annotating each result with its estimate
+#   order  as mark, handing the points with the highest PHY rate (the longest
+#          simulations) to the workers first
+#   skip   as order, but points predicted to deliver nothing are not simulated
+#          and get a zero throughput, except a random verifyFraction of them
+#
+# NumPy is only needed by the examples when this estimate is asked for.
+
+from wifi_sweep import run_points
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Data subcarriers per channel width (MHz)
+DATA_SUBCARRIERS = {20: 52, 40: 108, 80: 234, 160: 468}
+
+# Coded bits per subcarrier and OFDM symbol (modulation order x coding rate),
+# by MCS: BPSK 1/2, QPSK 1/2, QPSK 3/4, 16-QAM 1/2, 16-QAM 3/4, 64-QAM 2/3,
+# 64-QAM 3/4, 64-QAM 5/6, 256-QAM 3/4, 256-QAM 5/6
+BITS_PER_SUBCARRIER = [0.5, 1.0, 1.5, 2.0, 3.0, 4.0, 4.5, 5.0, 6.0, 20.0 / 3]
+
+# Approximate SNR (dB) needed to decode each MCS at a low packet error rate
+MIN_SNR = [2.0, 5.0, 9.0, 11.0, 15.0, 18.0, 20.0, 25.0, 29.0, 31.0]
+
+# LogDistancePropagationLossModel::ReferenceLoss used by the examples, by band (GHz)
+REFERENCE_LOSS = {5.0: 46.6777, 2.4: 40.046}
+
+
+def _require_numpy ():
+    if numpy is None:
+        raise ImportError ("the analytical pre-filter needs NumPy")
+
+
+def estimate (mcs, channelWidth, sgi, distance, frequency=5.0, margin=0.0,
+              txPower=16.0206, noiseFigure=7.0, edThreshold=-96.0, exponent=3.0):
+    """Estimate a grid of points given as equal length arrays (or scalars).
+
+    Returns a dict of arrays: phyRate (Mbit/s), rxPower (dBm), snr and minSnr
+    (dB) and predictedZero (bool).
+    """
+    _require_numpy ()
+    mcs = numpy.asarray (mcs, dtype=int)
+    channelWidth = numpy.asarray (channelWidth, dtype=int)
+    sgi = numpy.asarray (sgi, dtype=bool)
+    distance = numpy.maximum (numpy.asarray (distance, dtype=float), 1.0)
+    referenceLoss = numpy.vectorize (REFERENCE_LOSS.get) (numpy.asarray (frequency, dtype=float))
+
+    subcarriers = numpy.vectorize (DATA_SUBCARRIERS.get) (channelWidth)
+    bits = numpy.asarray (BITS_PER_SUBCARRIER)[mcs]
+    symbol = numpy.where (sgi, 3.6, 4.0) # microseconds
+    phyRate = subcarriers * bits / symbol
+
+    rxPower = txPower - (referenceLoss + 10 * exponent * numpy.log10 (distance))
+    noise = -174.0 + 10 * numpy.log10 (channelWidth * 1e6) + noiseFigure
+    snr = rxPower - noise
+    minSnr = numpy.asarray (MIN_SNR)[mcs]
+    predictedZero = (rxPower < edThreshold) | (snr < minSnr - margin)
+    return {"phyRate": phyRate, "rxPower": rxPower, "snr": snr, "minSnr": minSnr,
+            "predictedZero": predictedZero}
+
+
+def estimate_points (points, margin=0.0):
+    """estimate () for a list of sweep points (dicts as built by the sweep scripts)."""
+    return estimate ([p["mcs"] for p in points],
+                     [p["channelWidth"] for p in points],
+                     [p["sgi"] for p in points],
+                     [p["distance"] for p in points],
+                     [p.get ("frequency", 5.0) for p in points],
+                     margin)
+
+
+def verification_sample (predictedZero, fraction, seed):
+    """Indices of a random fraction of the predicted-zero points to simulate anyway."""
+    _require_numpy ()
+    pruned = numpy.flatnonzero (predictedZero)
+    count = int (numpy.ceil (fraction * len (pruned))) if fraction > 0 else 0
+    rng = numpy.random.RandomState (seed)
+    return set (int (i) for i in rng.choice (pruned, count, replace=False)) if count else set ()
+
+
+def run_prefiltered (func, points, mode, jobs=1, cache=None, margin=0.0, verifyFraction=0.0, seed=1):
+    """Like run_points (), with the pre-filter mode mark, order or skip.
+
+    Every result gets the keys predictedRate (PHY rate, Mbit/s), snr (dB),
+    predictedZero and simulated; a point skipped without simulation has a
+    throughput and simulationTimeUsed of 0.
+    """
+    points = list (points)
+    est = estimate_points (points, margin)
+    predictedZero = [bool (z) for z in est["predictedZero"]]
+    verify = set ()
+    if mode == "skip":
+        verify = verification_sample (predictedZero, verifyFraction, seed)
+    simulated = [i for i in range (len (points)) if not predictedZero[i] or mode != "skip" or i in verify]
+    order = None
+    if mode != "mark":
+        order = sorted (range (len (simulated)), key=lambda n: -est["phyRate"][simulated[n]])
+
+    results = run_points (func, [points[i] for i in simulated], jobs, cache, order)
+    wanted = set (simulated)
+    for i, point in enumerate (points):
+        if i in wanted:
+            point, result = next (results)
+            result = dict (result, simulated=True)
+        else:
+            result = {"throughput": 0, "simulationTimeUsed": 0, "simulated": False}
+        result.update ({"predictedRate": float (est["phyRate"][i]), "snr": float (est["snr"][i]),
+                        "predictedZero": predictedZero[i]})
+        yield point, result
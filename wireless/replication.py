@@ -0,0 +1,87 @@
+# -*-  Mode: Python; -*-
+# /*
+#  * Copyright (c) 2016
+#  *
+#  * This program is free software; you can redistribute it and/or modify
+#  * it under the terms of the GNU General Public License version 2 as
+#  * published by the Free Software Foundation;
+#  *
+#  * This program is distributed in the hope that it will be useful,
+#  * but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  * GNU General Public License for more details.
+#  *
+#  * You should have received a copy of the GNU General Public License
+#  * along with this program; if not, write to the Free Software
+#  * Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#  */
+
+# Seed replications of an experiment, compared across configurations.
+#
+# replicate () runs every configuration with RngRun baseRun, baseRun + 1, ...
+# Replication r uses the same RngRun for all configurations (common random
+# numbers), so a difference between configurations is measured on paired runs,
+# which is usually much less noisy than comparing independent runs.  Rounds of
+# replications run through wifi_sweep.run_points () until the 95% confidence
+# interval of every difference to the first configuration is narrow enough,
+# or maxRuns replications have been made.
+
+import math
+
+from convergence import t95
+from wifi_sweep import run_points
+
+
+def interval (values):
+    """(mean, half width of its 95% confidence interval) of values."""
+    n = len (values)
+    mean = sum (values) / float (n)
+    if n < 2:
+        return mean, float ("inf")
+    variance = sum ((v - mean) ** 2 for v in values) / (n - 1)
+    return mean, t95 (n - 1) * math.sqrt (variance / n)
+
+
+def _tight (mean, halfWidth, precision, relPrecision):
+    return halfWidth <= max (precision, relPrecision * abs (mean))
+
+
+def summarize (configs, values):
+    """Mean and confidence interval of every configuration, and of the paired
+    difference of every configuration to the first one."""
+    summary = {"runs": len (values[0]), "configs": [], "differences": []}
+    for config, v in zip (configs, values):
+        mean, halfWidth = interval (v)
+        summary["configs"].append ({"config": config, "mean": mean, "halfWidth": halfWidth})
+    for config, v in zip (configs[1:], values[1:]):
+        mean, halfWidth = interval ([a - b for a, b in zip (v, values[0])])
+        summary["differences"].append ({"config": config, "mean": mean, "halfWidth": halfWidth})
+    return summary
+
+
+def replicate (func, configs, metric, jobs=1, minRuns=5, maxRuns=50, precision=0.0, relPrecision=0.1, baseRun=1):
+    """Replicate func over configs until the differences are known well enough.
+
+    func (point) gets a configuration dict with rngRun added and returns a dict
+    holding metric; it must be a module-level function (see run_points ()).  A
+    confidence interval is narrow enough when its half width is at most
+    precision, or relPrecision times the absolute mean.  Returns summarize ().
+    """
+    from multiprocessing import cpu_count
+    workers = jobs if jobs > 0 else cpu_count ()
+    values = [[] for config in configs]
+    runs = 0
+    while runs < maxRuns:
+        # First round: minRuns; then enough new replications to keep the workers busy
+        batch = minRuns if runs == 0 else max (1, -(-workers // len (configs)))
+        batch = min (batch, maxRuns - runs)
+        points = [dict (config, rngRun=baseRun + runs + r) for r in range (batch) for config in configs]
+        for i, (point, result) in enumerate (run_points (func, points, jobs)):
+            values[i % len (configs)].append (result[metric])
+        runs += batch
+
+        summary = summarize (configs, values)
+        checked = summary["differences"] or summary["configs"]
+        if all (_tight (c["mean"], c["halfWidth"], precision, relPrecision) for c in checked):
+            break
+    return summarize (configs, values)
@@ -0,0 +1,146 @@
+# -*-  Mode: Python; -*-
+# /*
+#  * Copyright (c) 2016
+#  *
+#  * This program is free software; you can redistribute it and/or modify
+#  * it under the terms of the GNU General Public License version 2 as
+#  * published by the Free Software Foundation;
+#  *
+#  * This program is distributed in the hope that it will be useful,
+#  * but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  * GNU General Public License for more details.
+#  *
+#  * You should have received a copy of the GNU General Public License
+#  * along with this program; if not, write to the Free Software
+#  * Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#  */
+
+# On-disk cache of sweep point results.
+#
+# A result is stored under the SHA-1 of its full configuration: the sweep point
+# itself (MCS, channel width, guard interval, transport, payload size, distance,
+# frequency, simulation time, RngRun, ...) plus a context shared by the whole
+# sweep (script name and ns-3 build).  Changing any of these gives a new key, so
+# a stale result is never returned; entries are simply aged out by evict ().
+#
+# Layout: <directory>/<first two hex digits>/<sha1>.json, one small JSON document
+# per point holding both the configuration and the result.
+
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import time
+
+
+def ns3_version ():
+    """Return a string identifying the ns-3 build the bindings come from."""
+    from ns_lazy import ns
+    try:
+        return ns.core.Version.LongVersion ()
+    except AttributeError:
+        pass
+    # Older releases have no version API: identify the build by its bindings.
+    for name in ("ns._core", "ns.core"):
+        module = sys.modules.get (name)
+        path = getattr (module, "__file__", None)
+        if path:
+            path = os.path.realpath (path)
+            st = os.stat (path)
+            return "%s:%d:%d" % (path, st.st_size, int (st.st_mtime))
+    return "unknown"
+
+
+class ResultCache (object):
+    """Content-addressed store of sweep point results.
+
+    context is merged into every key; maxBytes and maxAge (seconds) bound the
+    cache when evict () is called, 0 meaning no limit.  With refresh set, get ()
+    always misses so every point is simulated again and its entry rewritten.
+    """
+
+    def __init__ (self, directory, context=None, maxBytes=0, maxAge=0, refresh=False):
+        self.directory = directory
+        self.context = dict (context or {})
+        self.maxBytes = maxBytes
+        self.maxAge = maxAge
+        self.refresh = refresh
+        self.hits = 0
+        self.misses = 0
+
+    def key (self, config):
+        full = dict (self.context)
+        full.update (config)
+        text = json.dumps (full, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha1 (text.encode ("utf-8")).hexdigest ()
+
+    def _path (self, key):
+        return os.path.join (self.directory, key[:2], key + ".json")
+
+    def get (self, config):
+        """Return the stored result for config, or None."""
+        path = self._path (self.key (config))
+        if self.refresh or not os.path.exists (path):
+            self.misses += 1
+            return None
+        if self.maxAge and time.time () - os.path.getmtime (path) > self.maxAge:
+            self.misses += 1
+            return None
+        try:
+            with open (path) as f:
+                entry = json.load (f)
+        except (IOError, OSError, ValueError):
+            # Truncated or concurrently removed entry: treat as a miss
+            self.misses += 1
+            return None
+        self.hits += 1
+        os.utime (path, None) # keep recently used entries on eviction
+        return entry["result"]
+
+    def put (self, config, result):
+        key = self.key (config)
+        path = self._path (key)
+        subdir = os.path.dirname (path)
+        if not os.path.isdir (subdir):
+            try:
+                os.makedirs (subdir)
+            except OSError:
+                if not os.path.isdir (subdir):
+                    raise
+        full = dict (self.context)
+        full.update (config)
+        # Write to a temporary file first so readers never see a partial entry
+        fd, tmp = tempfile.mkstemp (dir=subdir, suffix=".tmp")
+        with os.fdopen (fd, "w") as f:
+            json.dump ({"config": full, "result": result}, f, sort_keys=True)
+        os.rename (tmp, path)
+
+    def evict (self):
+        """Drop entries older than maxAge, then the least recently used ones
+        until the cache fits in maxBytes.  Returns the number of entries removed."""
+        entries = []
+        for root, dirs, files in os.walk (self.directory):
+            for name in files:
+                if name.endswith (".json"):
+                    path = os.path.join (root, name)
+                    st = os.stat (path)
+                    entries.append ((st.st_mtime, st.st_size, path))
+        entries.sort ()
+
+        removed = 0
+        now = time.time ()
+        total = sum (size for mtime, size, path in entries)
+        for mtime, size, path in entries:
+            expired = self.maxAge and now - mtime > self.maxAge
+            oversize = self.maxBytes and total > self.maxBytes
+            if not expired and not oversize:
+                continue
+            try:
+                os.remove (path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        return removed
@@ -0,0 +1,278 @@
+# -*-  Mode: Python; -*-
+# /*
+#  * Copyright (c) 2016
+#  *
+#  * This program is free software; you can redistribute it and/or modify
+#  * it under the terms of the GNU General Public License version 2 as
+#  * published by the Free Software Foundation;
+#  *
+#  * This program is distributed in the hope that it will be useful,
+#  * but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  * GNU General Public License for more details.
+#  *
+#  * You should have received a copy of the GNU General Public License
+#  * along with this program; if not, write to the Free Software
+#  * Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#  */
+
+# Incremental output of result records (one dict per sweep point or sample).
+#
+# Records are buffered and written batchSize at a time to one of
+#
+#   JsonlSink     one JSON object per line (.jsonl)
+#   CsvSink       comma separated values with a header line (.csv)
+#   ColumnarSink  compact little-endian binary, one column block per batch (.col)
+#
+# TableSink renders the records as the human readable table the examples print,
+# and MultiSink writes the same records to several sinks.
+#
+# Columnar layout: the magic line "NSCOL1\n", then per batch a uint32 header
+# length, a JSON header {"rows": n, "columns": [[name, type, nullable], ...]}
+# and one block per column: "q" int64 and "d" float64 values, or for "s"
+# (strings) n uint32 byte lengths followed by the UTF-8 bytes.  The block of a
+# nullable column (one holding None) starts with n validity bytes, 0 for None,
+# whose values are written as 0, NaN or "".  read_columnar () loads a file
+# back, with None where the records had it.
+
+import csv
+import json
+import struct
+import sys
+
+_MAGIC = b"NSCOL1\n"
+
+try:
+    long
+except NameError:
+    long = int
+
+
+class ResultSink (object):
+    """Base class: buffers records and hands them to _write () in batches."""
+
+    def __init__ (self, batchSize=256):
+        self.batchSize = batchSize
+        self.batch = []
+
+    def write (self, record):
+        self.batch.append (record)
+        if len (self.batch) >= self.batchSize:
+            self.flush ()
+
+    def flush (self):
+        if self.batch:
+            self._write (self.batch)
+            self.batch = []
+
+    def close (self):
+        self.flush ()
+
+    def __enter__ (self):
+        return self
+
+    def __exit__ (self, *exc):
+        self.close ()
+
+    def _write (self, records):
+        raise NotImplementedError
+
+
+class JsonlSink (ResultSink):
+    def __init__ (self, path, batchSize=256):
+        ResultSink.__init__ (self, batchSize)
+        self.f = open (path, "w")
+
+    def _write (self, records):
+        self.f.write ("".join (json.dumps (r, sort_keys=True) + "\n" for r in records))
+        self.f.flush ()
+
+    def close (self):
+        ResultSink.close (self)
+        self.f.close ()
+
+
+class CsvSink (ResultSink):
+    """The columns are fields, or the keys of the first batch, followed by the
+    keys later records add, in sorted order.  A record with a new key widens
+    the header: the rows written so far are read back and the file is written
+    again, with empty cells for the new columns."""
+
+    def __init__ (self, path, fields=None, batchSize=256):
+        ResultSink.__init__ (self, batchSize)
+        self.path = path
+        self.f = open (path, "w")
+        self.fields = fields
+        self.writer = None
+
+    def _write (self, records):
+        keys = set ()
+        for r in records:
+            keys.update (r)
+        if self.writer is None:
+            self.fields = list (self.fields or [])
+            self.fields += sorted (keys - set (self.fields))
+            self._start (self.fields)
+        elif not keys <= set (self.fields):
+            self._widen (sorted (keys - set (self.fields)))
+        self.writer.writerows (records)
+        self.f.flush ()
+
+    def _start (self, fields):
+        self.writer = csv.DictWriter (self.f, fields)
+        self.writer.writerow (dict ((name, name) for name in fields))
+
+    def _widen (self, added):
+        self.f.close ()
+        with open (self.path) as f:
+            rows = list (csv.DictReader (f))
+        self.fields += added
+        self.f = open (self.path, "w")
+        self._start (self.fields)
+        self.writer.writerows (rows)
+
+    def close (self):
+        ResultSink.close (self)
+        self.f.close ()
+
+
+def _column_type (values):
+    kind = "q"
+    for v in values:
+        if isinstance (v, bool) or v is None:
+            continue
+        if isinstance (v, float):
+            kind = "d"
+        elif not isinstance (v, (int, long)):
+            return "s"
+    return kind
+
+
+def _pack_column (kind, values, nullable=False):
+    n = len (values)
+    mask = b""
+    if nullable:
+        mask = struct.pack ("<%dB" % n, *[v is not None for v in values])
+    if kind == "q":
+        return mask + struct.pack ("<%dq" % n, *[0 if v is None else int (v) for v in values])
+    if kind == "d":
+        return mask + struct.pack ("<%dd" % n, *[float ("nan") if v is None else float (v) for v in values])
+    data = [(u"%s" % ("" if v is None else v)).encode ("utf-8") for v in values]
+    return mask + struct.pack ("<%dI" % n, *[len (d) for d in data]) + b"".join (data)
+
+
+class ColumnarSink (ResultSink):
+    def __init__ (self, path, batchSize=4096):
+        ResultSink.__init__ (self, batchSize)
+        self.f = open (path, "wb")
+        self.f.write (_MAGIC)
+
+    def _write (self, records):
+        names = []
+        for r in records:
+            for name in r:
+                if name not in names:
+                    names.append (name)
+        self.write_columns (dict ((name, [r.get (name) for r in records]) for name in names), names)
+
+    def write_columns (self, columns, names=None):
+        """Write a whole block of columns (equal length sequences) at once."""
+        names = names or sorted (columns)
+        rows = len (columns[names[0]]) if names else 0
+        values = [list (columns[name]) for name in names]
+        kinds = [_column_type (v) for v in values]
+        nullable = [any (x is None for x in v) for v in values]
+        header = json.dumps ({"rows": rows, "columns": [[n, k, z] for n, k, z in zip (names, kinds, nullable)]})
+        header = header.encode ("utf-8")
+        chunks = [struct.pack ("<I", len (header)), header]
+        for v, kind, z in zip (values, kinds, nullable):
+            chunks.append (_pack_column (kind, v, z))
+        self.f.write (b"".join (chunks))
+        self.f.flush ()
+
+    def close (self):
+        ResultSink.close (self)
+        self.f.close ()
+
+
+def read_columnar (path):
+    """Return {column name: list of values} for a file written by ColumnarSink.
+    Blocks missing a column get None for it."""
+    with open (path, "rb") as f:
+        data = f.read ()
+    if not data.startswith (_MAGIC):
+        raise ValueError ("%s is not a columnar results file" % path)
+    columns = {}
+    total = 0
+    pos = len (_MAGIC)
+    while pos < len (data):
+        length, = struct.unpack_from ("<I", data, pos)
+        pos += 4
+        header = json.loads (data[pos:pos + length].decode ("utf-8"))
+        pos += length
+        rows = header["rows"]
+        for column in header["columns"]:
+            name, kind = column[:2]
+            valid = None
+            if len (column) > 2 and column[2]:
+                valid = struct.unpack_from ("<%dB" % rows, data, pos)
+                pos += rows
+            if kind in ("q", "d"):
+                values = list (struct.unpack_from ("<%d%s" % (rows, kind), data, pos))
+                pos += 8 * rows
+            else:
+                lengths = struct.unpack_from ("<%dI" % rows, data, pos)
+                pos += 4 * rows
+                values = []
+                for n in lengths:
+                    values.append (data[pos:pos + n].decode ("utf-8"))
+                    pos += n
+            if valid is not None:
+                values = [v if ok else None for v, ok in zip (values, valid)]
+            columns.setdefault (name, [None] * total).extend (values)
+        total += rows
+        for values in columns.values ():
+            values.extend ([None] * (total - len (values)))
+    return columns
+
+
+class TableSink (ResultSink):
+    """Print every record as a line of text: row % record, under header."""
+
+    def __init__ (self, row, header=None, stream=None):
+        ResultSink.__init__ (self, 1)
+        self.row = row
+        self.stream = stream or sys.stdout
+        if header is not None:
+            self.stream.write (header + "\n")
+
+    def _write (self, records):
+        for r in records:
+            self.stream.write (self.row % r + "\n")
+        self.stream.flush ()
+
+
+class MultiSink (ResultSink):
+    def __init__ (self, sinks):
+        ResultSink.__init__ (self, 1)
+        self.sinks = sinks
+
+    def write (self, record):
+        for sink in self.sinks:
+            sink.write (record)
+
+    def close (self):
+        for sink in self.sinks:
+            sink.close ()
+
+
+SINKS = {"jsonl": JsonlSink, "csv": CsvSink, "col": ColumnarSink}
+
+
+def open_sink (path, format=None):
+    """Open the sink for path, the format defaulting to the file extension."""
+    if not format:
+        format = path.rsplit (".", 1)[-1]
+    if format not in SINKS:
+        raise ValueError ("unknown result format %r (use one of %s)" % (format, ", ".join (sorted (SINKS))))
+    return SINKS[format] (path)
@@ -0,0 +1,84 @@
+# -*-  Mode: Python; -*-
+# /*
+#  * Copyright (c) 2016
+#  *
+#  * This program is free software; you can redistribute it and/or modify
+#  * it under the terms of the GNU General Public License version 2 as
+#  * published by the Free Software Foundation;
+#  *
+#  * This program is distributed in the hope that it will be useful,
+#  * but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  * GNU General Public License for more details.
+#  *
+#  * You should have received a copy of the GNU General Public License
+#  * along with this program; if not, write to the Free Software
+#  * Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#  */
+
+# Cost of throughput sampling in wifi-tcp.py: the original per-sample Python
+# callback (--sampler=callback) against the sampler of throughput_sampler.py
+# (--sampler=buffered), where ns-3 records the received bytes and Python only
+# reads them after the run, at several sampling intervals.
+#
+# Both write every sample to the printed table, which goes to /dev/null.  The
+# median wall time of --repeat runs is reported, and the time of a run without
+# any sampling at all (one sample per simulation) as the common baseline.
+#
+#   ./waf shell
+#   python examples/wireless/sampler-benchmark.py --intervals 0.001,0.01,0.1
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+
+def _median (values):
+    values = sorted (values)
+    n = len (values)
+    if n % 2:
+        return values[n // 2]
+    return (values[n // 2 - 1] + values[n // 2]) / 2.0
+
+
+def measure (args, repeat):
+    """Median wall time of wifi-tcp.py run with args."""
+    directory = os.path.dirname (os.path.abspath (__file__))
+    walls = []
+    for i in range (repeat):
+        t = time.time ()
+        with open (os.devnull, "w") as devnull:
+            status = subprocess.call ([sys.executable, os.path.join (directory, "wifi-tcp.py")] + args,
+                                      cwd=directory, stdout=devnull)
+        walls.append (time.time () - t)
+        if status != 0:
+            raise RuntimeError ("wifi-tcp.py %s exited with status %d" % (" ".join (args), status))
+    return _median (walls)
+
+
+def main (argv):
+    parser = argparse.ArgumentParser (description="Throughput sampling cost in wifi-tcp.py")
+    parser.add_argument ("--intervals", default="0.001,0.01,0.1",
+                         help="comma separated sampling intervals in seconds")
+    parser.add_argument ("--simulationTime", type=float, default=10)
+    parser.add_argument ("--repeat", type=int, default=3)
+    args = parser.parse_args (argv[1:])
+
+    common = ["--simulationTime=%s" % args.simulationTime]
+    baseline = measure (common + ["--sampleInterval=%s" % args.simulationTime], args.repeat)
+    print ("baseline (no sampling): %.3f s" % baseline)
+    print ("%-12s %10s %14s %14s %10s" % ("interval (s)", "samples", "callback (s)", "buffered (s)", "speedup"))
+    for interval in [float (i) for i in args.intervals.split (",")]:
+        options = common + ["--sampleInterval=%s" % interval]
+        callback = measure (options + ["--sampler=callback"], args.repeat)
+        buffered = measure (options + ["--sampler=buffered"], args.repeat)
+        # Speedup of the sampling overhead itself, over the baseline run
+        overhead = max (buffered - baseline, 1e-6)
+        print ("%-12s %10d %14.3f %14.3f %9.1fx" % (interval, int (args.simulationTime / interval), callback,
+                                                     buffered, max (callback - baseline, 0) / overhead))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit (main (sys.argv))
@@ -0,0 +1,251 @@
+# -*-  Mode: Python; -*-
+# /*
+#  * Copyright (c) 2016
+#  *
+#  * This program is free software; you can redistribute it and/or modify
+#  * it under the terms of the GNU General Public License version 2 as
+#  * published by the Free Software Foundation;
+#  *
+#  * This program is distributed in the hope that it will be useful,
+#  * but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  * GNU General Public License for more details.
+#  *
+#  * You should have received a copy of the GNU General Public License
+#  * along with this program; if not, write to the Free Software
+#  * Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#  */
+
+# Long-lived worker running the example scenarios without re-importing the ns-3
+# bindings for every run.
+#
+# The daemon listens on a local (AF_UNIX) socket.  Each request is one JSON object
+# per line and gets one JSON line back:
+#
+#   {"scenario": "ht", "params": {"mcs": 7, "channelWidth": 40, "sgi": 1}}
+#   {"scenario": "vht", "params": {"mcs": 9, "channelWidth": 160, "distance": 5}}
+#   {"scenario": "wifi-tcp", "args": ["--tcpVariant=TcpHybla", "--simulationTime=5"]}
+#   {"scenario": "hidden-terminal"}
+#   {"scenario": "blockack"}
+#
+# ht/vht jobs run one sweep point (see run_point () in the sweep scripts) and return
+# its results; the other scenarios run the script's main () and return its exit
+# status and printed output.  Jobs run in a child process which imports the
+# bindings once, cleans the simulator and every Config default after each job,
+# and is replaced by a fresh one every --maxJobs jobs to keep memory bounded.
+#
+# Usage:
+#
+#   python scenario-worker.py serve --socket /tmp/ns3-worker.sock --maxJobs 200 &
+#   python scenario-worker.py submit --socket /tmp/ns3-worker.sock '{"scenario": "ht", "params": {"mcs": 3}}'
+#   cat jobs.jsonl | python scenario-worker.py submit --socket /tmp/ns3-worker.sock
+
+import argparse
+import imp
+import json
+import multiprocessing
+import os
+import socket
+import sys
+import traceback
+
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+DEFAULT_SOCKET = "/tmp/ns3-scenario-worker.sock"
+
+SCRIPTS = {
+    "ht": "ht-wifi-network.py",
+    "vht": "vht-wifi-network.py",
+    "wifi-tcp": "wifi-tcp.py",
+    "hidden-terminal": "wifi-hidden-terminal.py",
+    "blockack": "wifi-blockack.py",
+}
+
+# Sweep point defaults, matching the command line defaults of the sweep scripts
+POINT_DEFAULTS = {
+    "ht": {"mcs": 7, "channelWidth": 20, "sgi": 0, "udp": "True", "payloadSize": 1472,
+           "simulationTime": 10.0, "tolerance": 0.0, "distance": 1.0, "frequency": 5.0},
+    "vht": {"mcs": 9, "channelWidth": 80, "sgi": 0, "udp": "True", "payloadSize": 1472,
+            "simulationTime": 10.0, "tolerance": 0.0, "distance": 1.0},
+}
+
+
+def _load_script (name):
+    path = os.path.join (os.path.dirname (os.path.abspath (__file__)), SCRIPTS[name])
+    return imp.load_source (name.replace ("-", "_"), path)
+
+
+def _run_job (modules, job):
+    name = job["scenario"]
+    if name not in SCRIPTS:
+        raise ValueError ("unknown scenario %r" % name)
+    if name not in modules:
+        modules[name] = _load_script (name)
+    module = modules[name]
+
+    if name in POINT_DEFAULTS:
+        point = dict (POINT_DEFAULTS[name])
+        point.update (job.get ("params", {}))
+        return {"result": module.run_point (point)}
+
+    argv = [SCRIPTS[name]] + [str (arg) for arg in job.get ("args", [])]
+    stdout = sys.stdout
+    sys.stdout = StringIO ()
+    try:
+        try:
+            status = module.main (argv)
+        except SystemExit as e:
+            status = e.code
+        output = sys.stdout.getvalue ()
+    finally:
+        sys.stdout = stdout
+    return {"status": status or 0, "output": output}
+
+
+def _worker (conn, maxJobs):
+    # Import every binding the scenarios need once, up front
+    import ns_lazy
+    for name in ("core", "network", "applications", "wifi", "mobility", "internet",
+                 "propagation", "flow_monitor"):
+        ns_lazy.load (name)
+    ns = ns_lazy.ns
+
+    modules = {}
+    for i in range (maxJobs):
+        try:
+            job = conn.recv ()
+        except EOFError:
+            break
+        try:
+            reply = _run_job (modules, job)
+        except Exception:
+            reply = {"error": traceback.format_exc ()}
+        # Leave nothing behind for the next job
+        ns.core.Simulator.Destroy ()
+        ns.core.Config.Reset ()
+        conn.send (reply)
+    conn.close ()
+
+
+class _WorkerProcess (object):
+    def __init__ (self, maxJobs):
+        self.maxJobs = maxJobs
+        self.process = None
+        self.conn = None
+        self.jobs = 0
+
+    def _start (self):
+        self.conn, child = multiprocessing.Pipe ()
+        self.process = multiprocessing.Process (target=_worker, args=(child, self.maxJobs))
+        self.process.daemon = True
+        self.process.start ()
+        child.close ()
+        self.jobs = 0
+
+    def _stop (self):
+        if self.process is not None:
+            self.conn.close ()
+            self.process.join ()
+            self.process = None
+
+    def run (self, job):
+        if self.process is None or self.jobs >= self.maxJobs:
+            self._stop ()
+            self._start ()
+        self.jobs += 1
+        try:
+            self.conn.send (job)
+            return self.conn.recv ()
+        except (EOFError, IOError):
+            # The child died in the middle of the job (e.g. a fatal ns-3 error)
+            self.process.join ()
+            exitcode = self.process.exitcode
+            self.process = None
+            return {"error": "worker exited with code %s" % exitcode}
+
+    def close (self):
+        self._stop ()
+
+
+def serve (path, maxJobs):
+    if os.path.exists (path):
+        os.unlink (path)
+    server = socket.socket (socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind (path)
+    server.listen (16)
+    worker = _WorkerProcess (maxJobs)
+    try:
+        while True:
+            client, address = server.accept ()
+            stream = client.makefile ("rw")
+            try:
+                while True:
+                    line = stream.readline ()
+                    if not line:
+                        break
+                    line = line.strip ()
+                    if not line:
+                        continue
+                    try:
+                        job = json.loads (line)
+                    except ValueError as e:
+                        reply = {"error": "bad request: %s" % e}
+                    else:
+                        reply = worker.run (job)
+                    stream.write (json.dumps (reply) + "\n")
+                    stream.flush ()
+            except (IOError, socket.error):
+                pass # client went away
+            finally:
+                stream.close ()
+                client.close ()
+    finally:
+        worker.close ()
+        server.close ()
+        os.unlink (path)
+
+
+def submit (path, jobs):
+    """Send jobs (dicts) to the worker at path and yield its replies in order."""
+    client = socket.socket (socket.AF_UNIX, socket.SOCK_STREAM)
+    client.connect (path)
+    stream = client.makefile ("rw")
+    try:
+        for job in jobs:
+            stream.write (json.dumps (job) + "\n")
+            stream.flush ()
+            yield json.loads (stream.readline ())
+    finally:
+        stream.close ()
+        client.close ()
+
+
+def main (argv):
+    parser = argparse.ArgumentParser (description="Warm worker for the ns-3 example scenarios")
+    sub = parser.add_subparsers (dest="command")
+    p = sub.add_parser ("serve", help="run the worker daemon")
+    p.add_argument ("--socket", default=DEFAULT_SOCKET)
+    p.add_argument ("--maxJobs", type=int, default=100, help="jobs run before the worker process is replaced")
+    p = sub.add_parser ("submit", help="send jobs (JSON arguments, or JSON lines on stdin)")
+    p.add_argument ("--socket", default=DEFAULT_SOCKET)
+    p.add_argument ("jobs", nargs="*")
+    args = parser.parse_args (argv[1:])
+
+    if args.command == "serve":
+        serve (args.socket, args.maxJobs)
+        return 0
+
+    lines = args.jobs or sys.stdin
+    jobs = (json.loads (line) for line in lines if line.strip ())
+    status = 0
+    for reply in submit (args.socket, jobs):
+        if "error" in reply:
+            status = 1
+        sys.stdout.write (json.dumps (reply) + "\n")
+    return status
+
+if __name__ == '__main__':
+    sys.exit (main (sys.argv))
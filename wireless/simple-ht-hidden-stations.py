@@ -20,18 +20,32 @@
 #  *                      Mohit P. Tahiliani <tahiliani@nitk.edu.in>
 #  */
 
-import ns.core
-import ns.network
-import ns.applications
-import ns.wifi
-import ns.mobility
-import ns.internet
+from ns_lazy import ns
+
+from convergence import ConvergenceMonitor
+import trace_output
+import pcap_stats
 
 # This example considers two hidden stations in an 802.11n network which supports MPDU aggregation.
 # The user can specify whether RTS/CTS is used and can set the number of aggregated MPDUs.
 #
 # Example: ./waf --pyrun "examples/wireless/simple-ht-hidden-stations.py --enableRts=True --nMpdus=8"
 #
+# With --tolerance=T the run stops as soon as the 95% confidence interval of the throughput is within T of
+# the mean (simulationTime is then only an upper bound) and the simulated time actually used is reported.
+#
+# With --macStats=True the AP and both stations also capture their frames to pcap files and, after the run, the
+# captures are decoded in batches with pcap_stats.py.  Next to the throughput this reports, per station, the A-MPDU
+# size histogram, the MPDUs sent, retransmitted and delivered to the AP, the ones that failed (sent but not
+# delivered, e.g. collided), its airtime and the airtime of its RTS; and the airtime of RTS/CTS overall.  Needs NumPy.
+#
+# The statistics are not collected by native MAC/PHY counters: the Python bindings give no way to aggregate the
+# MAC and PHY traces in C++ without a Python callback per event.  By default ns-3 writes every frame of the three
+# devices natively to the captures, so no Python runs per frame during the simulation, at the price of full-size
+# files that are decoded after the run.  --statsSnaplen=N (e.g. 128, enough for the headers) keeps smaller files
+# by sending the captures through the trace_output.py filter instead, a separate Python process that reads each
+# frame from a FIFO, truncates it and writes it to disk in a Python loop, concurrently with the simulation.
+#
 # Network topology:
 #
 #   Wifi 192.168.1.0
@@ -44,6 +58,26 @@ import ns.internet
 # Packets in this simulation aren't marked with a QosTag so they are considered
 # belonging to BestEffort Access Class (AC_BE).
 
+# Aggregation, losses and airtime of the stations, from the captures of the AP and of the stations
+def print_mac_stats(apCapture, staCaptures, staAddresses):
+	ap = pcap_stats.analyze (apCapture)
+	delivered = dict ((r["station"], r["mpdus"]) for r in pcap_stats.station_records (apCapture, ap))
+	rtsAirtime = ap.airtime["cts"]
+	for i, (capture, address) in enumerate (zip (staCaptures, staAddresses)):
+		sta = pcap_stats.analyze (capture)
+		own = dict ((r["station"], r) for r in pcap_stats.station_records (capture, sta)).get (address)
+		if own is None:
+			own = {"mpdus": 0, "retries": 0, "airtime": 0.0, "rtsAirtime": 0.0}
+		rtsAirtime += own["rtsAirtime"]
+		nAmpdu, meanSize = pcap_stats.ampdu_summary (sta)
+		print "Station %d (%s):" % (i + 1, address)
+		print "  A-MPDUs: ", nAmpdu, " mean size ", meanSize, " MPDUs"
+		print "  A-MPDU size histogram (MPDUs: count): ", " ".join ("%d:%d" % (size, sta.ampdu[size]) for size in pcap_stats.numpy.flatnonzero (sta.ampdu))
+		print "  MPDUs sent: ", own["mpdus"], " retransmitted: ", own["retries"], " delivered: ", delivered.get (address, 0), " failed: ", max (own["mpdus"] - delivered.get (address, 0), 0)
+		print "  Airtime: ", own["airtime"] * 1000, " ms (RTS ", own["rtsAirtime"] * 1000, " ms)"
+	busy = sum (ap.airtime.values ())
+	print "RTS/CTS airtime: ", rtsAirtime * 1000, " ms (", 100.0 * rtsAirtime / busy if busy else 0.0, "% of the airtime seen by the AP)",'\n'
+
 def main(argv):
 	cmd = ns.core.CommandLine ()
 	cmd.payloadSize = 1472 # bytes
@@ -51,11 +85,18 @@ def main(argv):
 	cmd.nMpdus = 1
 	cmd.maxAmpduSize = 0
 	cmd.enableRts = "False"
+	cmd.tolerance = 0
+	cmd.macStats = "False"
+	cmd.statsSnaplen = 0
     	
 	cmd.AddValue ("nMpdus", "Number of aggregated MPDUs")
 	cmd.AddValue ("payloadSize", "Payload size in bytes")
 	cmd.AddValue ("enableRts", "Enable RTS/CTS") # True: RTS/CTS enabled; False: RTS/CTS disabled
 	cmd.AddValue ("simulationTime", "Simulation time in seconds")
+	cmd.AddValue ("tolerance", "Stop once the throughput is known within this relative tolerance (0: fixed simulationTime)")
+	cmd.AddValue ("macStats", "Report A-MPDU sizes, MPDU failures and airtime per station")
+	cmd.AddValue ("statsSnaplen", "Bytes of each frame captured for --macStats (0: whole frames, written natively; N: through the Python filter)")
+	trace_output.add_options (cmd)
 	cmd.Parse (sys.argv)
 
 	payloadSize = int(cmd.payloadSize)
@@ -63,6 +104,14 @@ def main(argv):
 	nMpdus = int(cmd.nMpdus)
 	maxAmpduSize = int(cmd.maxAmpduSize)
 	enableRts = cmd.enableRts
+	tolerance = float(cmd.tolerance)
+	pcap = trace_output.from_command_line (cmd)
+	macStats = None
+	if cmd.macStats == "True":
+		if pcap_stats.numpy is None:
+			print "The MAC statistics need NumPy!"
+			return 1
+		macStats = trace_output.TraceOutput (snaplen=int (cmd.statsSnaplen))
 	
 	if enableRts == "False":
 		ns.core.Config.SetDefault ("ns3::WifiRemoteStationManager::RtsCtsThreshold", ns.core.StringValue ("999999"))	
@@ -150,18 +199,41 @@ def main(argv):
   	clientApp1.Start (ns.core.Seconds (1.0))
   	clientApp1.Stop (ns.core.Seconds (simulationTime + 1))
   
-  	phy.EnablePcap ("SimpleHtHiddenStations_py_Ap", apDevice.Get (0))
-  	phy.EnablePcap ("SimpleHtHiddenStations_py_Sta1", staDevices.Get (0))
-  	phy.EnablePcap ("SimpleHtHiddenStations_py_Sta2", staDevices.Get (1))
+	if pcap is not None:
+		pcap.enable (phy, "SimpleHtHiddenStations_py_Ap", apDevice.Get (0))
+		pcap.enable (phy, "SimpleHtHiddenStations_py_Sta1", staDevices.Get (0))
+		pcap.enable (phy, "SimpleHtHiddenStations_py_Sta2", staDevices.Get (1))
+	if macStats is not None:
+		apCapture = macStats.enable (phy, "SimpleHtHiddenStations_py_Stats", apDevice.Get (0))
+		staCaptures = [macStats.enable (phy, "SimpleHtHiddenStations_py_Stats", staDevices.Get (i)) for i in range (2)]
+		staAddresses = [str (ns.network.Mac48Address.ConvertFrom (staDevices.Get (i).GetAddress ())) for i in range (2)]
       
+	monitor = None
+	if tolerance > 0:
+		monitor = ConvergenceMonitor (lambda: serverApp.Get (0).GetReceived () * payloadSize, 1.0, tolerance)
+		monitor.install ()
+
   	ns.core.Simulator.Stop (ns.core.Seconds (simulationTime + 1))
 
   	ns.core.Simulator.Run ()
   	ns.core.Simulator.Destroy ()
+	if pcap is not None:
+		pcap.close ()
+	if macStats is not None:
+		macStats.close ()
       
+	if monitor is not None and monitor.converged:
+		print "Throughput: ", monitor.throughput ()," Mbit/s"
+		print "Simulated time: ", monitor.elapsed ()," s",'\n'
+		if macStats is not None:
+			print_mac_stats (apCapture, staCaptures, staAddresses)
+		return 0
+
   	totalPacketsThrough = serverApp.Get (0).GetReceived ()
   	throughput = totalPacketsThrough * payloadSize * 8 / (simulationTime * 1000000.0)
   	print "Throughput: ", throughput," Mbit/s",'\n'
+	if macStats is not None:
+		print_mac_stats (apCapture, staCaptures, staAddresses)
     
   	return 0
 
@@ -0,0 +1,125 @@
+# -*-  Mode: Python; -*-
+# /*
+#  * Copyright (c) 2016
+#  *
+#  * This program is free software; you can redistribute it and/or modify
+#  * it under the terms of the GNU General Public License version 2 as
+#  * published by the Free Software Foundation;
+#  *
+#  * This program is distributed in the hope that it will be useful,
+#  * but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  * GNU General Public License for more details.
+#  *
+#  * You should have received a copy of the GNU General Public License
+#  * along with this program; if not, write to the Free Software
+#  * Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#  */
+
+# Start-up cost of every example: time spent importing the ns-3 bindings and
+# wall time until the first Simulator::Run starts executing events.
+#
+# Each script is started --repeat times with NS_LAZY_PROFILE set (see ns_lazy.py),
+# which makes it exit as soon as its first simulation starts; the median of the
+# runs is reported.  --save stores the figures as JSON and --baseline compares
+# against such a file, failing if any script got more than --threshold slower.
+#
+# Run it from an environment where the bindings can be imported, e.g.
+#
+#   ./waf shell
+#   python examples/wireless/startup-benchmark.py --save startup.json
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+SCRIPTS = [
+    "ht-wifi-network.py",
+    "vht-wifi-network.py",
+    "simple-ht-hidden-stations.py",
+    "wifi-tcp.py",
+    "wifi-hidden-terminal.py",
+    "wifi-blockack.py",
+    "wifi-wired-bridging.py",
+]
+
+
+def _median (values):
+    values = sorted (values)
+    n = len (values)
+    if n % 2:
+        return values[n // 2]
+    return (values[n // 2 - 1] + values[n // 2]) / 2.0
+
+
+def measure (script, repeat):
+    """Return the median start-up figures of script over repeat runs."""
+    directory = os.path.dirname (os.path.abspath (__file__))
+    walls = []
+    imports = []
+    firstRuns = []
+    modules = []
+    for i in range (repeat):
+        fd, profile = tempfile.mkstemp (suffix=".json")
+        os.close (fd)
+        env = dict (os.environ)
+        env["NS_LAZY_PROFILE"] = profile
+        t = time.time ()
+        with open (os.devnull, "w") as devnull:
+            status = subprocess.call ([sys.executable, os.path.join (directory, script)],
+                                      cwd=directory, env=env, stdout=devnull)
+        wall = time.time () - t
+        try:
+            with open (profile) as f:
+                data = json.load (f)
+        except ValueError:
+            raise RuntimeError ("%s exited with status %d before its first Simulator::Run" % (script, status))
+        finally:
+            os.remove (profile)
+        walls.append (wall)
+        imports.append (sum (seconds for name, seconds in data["imports"]))
+        firstRuns.append (data["firstRun"])
+        modules = [name for name, seconds in data["imports"]]
+    return {"wall": _median (walls), "imports": _median (imports),
+            "firstRun": _median (firstRuns), "modules": modules}
+
+
+def main (argv):
+    parser = argparse.ArgumentParser (description="Start-up time of the ns-3 Python examples")
+    parser.add_argument ("scripts", nargs="*", default=SCRIPTS)
+    parser.add_argument ("--repeat", type=int, default=5)
+    parser.add_argument ("--save", help="write the results to this JSON file")
+    parser.add_argument ("--baseline", help="compare against results saved with --save")
+    parser.add_argument ("--threshold", type=float, default=0.2,
+                         help="relative slowdown against the baseline counted as a regression")
+    args = parser.parse_args (argv[1:])
+
+    baseline = {}
+    if args.baseline:
+        with open (args.baseline) as f:
+            baseline = json.load (f)
+
+    results = {}
+    regressions = []
+    print ("%-30s %10s %10s %10s  %s" % ("script", "wall (s)", "imports", "first Run", "modules loaded"))
+    for script in args.scripts:
+        r = measure (script, args.repeat)
+        results[script] = r
+        flag = ""
+        if script in baseline and r["wall"] > baseline[script]["wall"] * (1 + args.threshold):
+            flag = "  REGRESSION (baseline %.3f s)" % baseline[script]["wall"]
+            regressions.append (script)
+        print ("%-30s %10.3f %10.3f %10.3f  %s%s" % (script, r["wall"], r["imports"], r["firstRun"],
+                                                     ",".join (r["modules"]), flag))
+
+    if args.save:
+        with open (args.save, "w") as f:
+            json.dump (results, f, indent=2, sort_keys=True)
+    return 1 if regressions else 0
+
+if __name__ == '__main__':
+    sys.exit (main (sys.argv))
@@ -0,0 +1,114 @@
+# -*-  Mode: Python; -*-
+# /*
+#  * Copyright (c) 2016
+#  *
+#  * This program is free software; you can redistribute it and/or modify
+#  * it under the terms of the GNU General Public License version 2 as
+#  * published by the Free Software Foundation;
+#  *
+#  * This program is distributed in the hope that it will be useful,
+#  * but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  * GNU General Public License for more details.
+#  *
+#  * You should have received a copy of the GNU General Public License
+#  * along with this program; if not, write to the Free Software
+#  * Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#  */
+
+# Round trip of records through the sinks of results_sink.py.
+#
+#   python -m unittest test_results_sink
+
+import csv
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from results_sink import CsvSink, JsonlSink, open_sink, read_columnar
+
+
+class ColumnarRoundTrip (unittest.TestCase):
+    def setUp (self):
+        self.directory = tempfile.mkdtemp ()
+
+    def tearDown (self):
+        shutil.rmtree (self.directory)
+
+    def roundtrip (self, records):
+        path = os.path.join (self.directory, "results.col")
+        sink = open_sink (path)
+        for record in records:
+            sink.write (record)
+        sink.close ()
+        return read_columnar (path)
+
+    def test_values (self):
+        columns = self.roundtrip ([{"mcs": 3, "throughput": 12.5, "name": "a"},
+                                   {"mcs": 7, "throughput": 40.0, "name": u"\u00e9"}])
+        self.assertEqual (columns["mcs"], [3, 7])
+        self.assertEqual (columns["throughput"], [12.5, 40.0])
+        self.assertEqual (columns["name"], ["a", u"\u00e9"])
+
+    def test_none (self):
+        records = [{"bestMcs": None, "rate": None, "label": None},
+                   {"bestMcs": 0, "rate": 1.5, "label": ""},
+                   {"bestMcs": 5, "rate": float ("inf"), "label": "x"}]
+        columns = self.roundtrip (records)
+        self.assertEqual (columns["bestMcs"], [None, 0, 5])
+        self.assertEqual (columns["rate"], [None, 1.5, float ("inf")])
+        self.assertEqual (columns["label"], [None, "", "x"])
+
+    def test_none_matches_jsonl (self):
+        records = [{"bestMcs": None}, {"bestMcs": 0}]
+        path = os.path.join (self.directory, "results.jsonl")
+        sink = JsonlSink (path)
+        for record in records:
+            sink.write (record)
+        sink.close ()
+        with open (path) as f:
+            jsonl = [json.loads (line)["bestMcs"] for line in f]
+        self.assertEqual (self.roundtrip (records)["bestMcs"], jsonl)
+
+    def test_missing_column (self):
+        path = os.path.join (self.directory, "results.col")
+        sink = open_sink (path)
+        sink.write ({"a": 1})
+        sink.flush ()
+        sink.write ({"a": 2, "b": 3})
+        sink.close ()
+        columns = read_columnar (path)
+        self.assertEqual (columns["a"], [1, 2])
+        self.assertEqual (columns["b"], [None, 3])
+
+
+class CsvColumns (unittest.TestCase):
+    def setUp (self):
+        self.directory = tempfile.mkdtemp ()
+
+    def tearDown (self):
+        shutil.rmtree (self.directory)
+
+    def rows (self, batches, fields=None):
+        path = os.path.join (self.directory, "results.csv")
+        sink = CsvSink (path, fields)
+        for batch in batches:
+            for record in batch:
+                sink.write (record)
+            sink.flush ()
+        sink.close ()
+        with open (path) as f:
+            return list (csv.reader (f))
+
+    def test_first_batch (self):
+        self.assertEqual (self.rows ([[{"b": 1}, {"a": 2}]]), [["a", "b"], ["", "1"], ["2", ""]])
+
+    def test_later_key (self):
+        rows = self.rows ([[{"a": 1}], [{"a": 2, "c": 3}], [{"b": 4}]], fields=["a"])
+        self.assertEqual (rows, [["a", "c", "b"], ["1", "", ""], ["2", "3", ""], ["", "", "4"]])
+
+
+if __name__ == '__main__':
+    unittest.main ()
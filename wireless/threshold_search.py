@@ -0,0 +1,95 @@
+# -*-  Mode: Python; -*-
+# /*
+#  * Copyright (c) 2016
+#  *
+#  * This program is free software; you can redistribute it and/or modify
+#  * it under the terms of the GNU General Public License version 2 as
+#  * published by the Free Software Foundation;
+#  *
+#  * This program is distributed in the hope that it will be useful,
+#  * but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  * GNU General Public License for more details.
+#  *
+#  * You should have received a copy of the GNU General Public License
+#  * along with this program; if not, write to the Free Software
+#  * Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#  */
+
+# Threshold searches over the single point setup of the HT/VHT sweeps.
+#
+# Instead of simulating a whole range of distances for every grid point, these
+# bisect on the quantity of interest, assuming the goodput never increases with
+# the distance and that an MCS which cannot be decoded at some distance cannot
+# be decoded at any higher MCS either:
+#
+#   max_distance ()  largest distance at which a given MCS/width/GI still
+#                    delivers the target goodput
+#   best_mcs ()      highest MCS delivering the target goodput at a given distance
+#
+# A point "delivers" target Mbit/s when its goodput is at least target and above
+# zero.  Both take run, the run_point () function of the sweep script, and
+# return a dict of results including the number of simulations used.
+
+
+def _delivers (throughput, target):
+    return throughput > 0 and throughput >= target
+
+
+def max_distance (run, point, target, low, high, resolution):
+    """Bisect the distance of point in [low, high] down to resolution meters.
+
+    Returns {"maxDistance": d, "throughput": goodput at d, "simulations": n};
+    maxDistance is None if even low does not deliver target.
+    """
+    results = {}
+
+    def throughput (distance):
+        if distance not in results:
+            p = dict (point)
+            p["distance"] = distance
+            results[distance] = run (p)["throughput"]
+        return results[distance]
+
+    if not _delivers (throughput (low), target):
+        return {"maxDistance": None, "throughput": results[low], "simulations": len (results)}
+    if _delivers (throughput (high), target):
+        return {"maxDistance": high, "throughput": results[high], "simulations": len (results)}
+    # Invariant: low delivers, high does not
+    while high - low > resolution:
+        middle = (low + high) / 2.0
+        if _delivers (throughput (middle), target):
+            low = middle
+        else:
+            high = middle
+    return {"maxDistance": low, "throughput": results[low], "simulations": len (results)}
+
+
+def best_mcs (run, point, target, mcsValues):
+    """Bisect over the sorted mcsValues for the highest MCS delivering target.
+
+    Returns {"bestMcs": mcs, "throughput": goodput with mcs, "simulations": n};
+    bestMcs is None if no MCS delivers target.
+    """
+    results = {}
+
+    def throughput (index):
+        if index not in results:
+            p = dict (point)
+            p["mcs"] = mcsValues[index]
+            results[index] = run (p)["throughput"]
+        return results[index]
+
+    low, high = 0, len (mcsValues) - 1
+    if not _delivers (throughput (low), target):
+        return {"bestMcs": None, "throughput": results[low], "simulations": len (results)}
+    if _delivers (throughput (high), target):
+        return {"bestMcs": mcsValues[high], "throughput": results[high], "simulations": len (results)}
+    # Invariant: low delivers, high does not
+    while high - low > 1:
+        middle = (low + high) // 2
+        if _delivers (throughput (middle), target):
+            low = middle
+        else:
+            high = middle
+    return {"bestMcs": mcsValues[low], "throughput": results[low], "simulations": len (results)}
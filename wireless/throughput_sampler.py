@@ -0,0 +1,121 @@
+# -*-  Mode: Python; -*-
+# /*
+#  * Copyright (c) 2016
+#  *
+#  * This program is free software; you can redistribute it and/or modify
+#  * it under the terms of the GNU General Public License version 2 as
+#  * published by the Free Software Foundation;
+#  *
+#  * This program is distributed in the hope that it will be useful,
+#  * but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  * GNU General Public License for more details.
+#  *
+#  * You should have received a copy of the GNU General Public License
+#  * along with this program; if not, write to the Free Software
+#  * Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#  */
+
+# Sampling of the bytes received by an application at a fixed interval, with
+# no Python running while the simulation does.
+#
+# ns-3 collects the data itself: an ApplicationPacketProbe on the Rx trace of
+# the application feeds the size of every received packet, with its time, to
+# a FileHelper, which writes it to a file in a temporary directory.  After the
+# run, finish () reads that file once, sums the bytes into the preallocated
+# array.array of doubles of the sampling interval they fall in (a sample at
+# time t counts what was received up to t) and hands the time series over, as
+# a whole or every chunkSize samples to onChunk, as array.array buffers which
+# numpy.frombuffer () takes without copying.
+
+import array
+import glob
+import math
+import os
+import shutil
+import tempfile
+
+from ns_lazy import ns
+
+
+class ThroughputSampler (object):
+    """Sample the bytes received on rxPath, the Rx trace source of an
+    application (e.g. /NodeList/0/ApplicationList/0/$ns3::PacketSink/Rx),
+    every interval seconds from start until stop.
+
+    onChunk (first, times, throughput), if given, receives the samples from
+    index first on every chunkSize samples at finish ().
+    """
+
+    def __init__ (self, rxPath, interval, start, stop, chunkSize=0, onChunk=None):
+        self.rxPath = rxPath
+        self.interval = interval
+        self.start = start
+        self.capacity = max (0, int (math.ceil ((stop - start) / interval - 1e-9)))
+        self.counters = array.array ("d", [0.0]) * self.capacity
+        self.count = 0
+        self.delivered = 0
+        self.chunkSize = chunkSize
+        self.onChunk = onChunk
+        self.directory = None
+        self.helper = None
+
+    def install (self):
+        self.directory = tempfile.mkdtemp (prefix="throughput-")
+        self.helper = ns.stats.FileHelper ()
+        self.helper.ConfigureFile (os.path.join (self.directory, "rx"), ns.stats.FileAggregator.FORMATTED)
+        self.helper.Set2dFormat ("%.9f %.0f")
+        self.helper.WriteProbe ("ns3::ApplicationPacketProbe", self.rxPath, "OutputBytes")
+
+    def _read (self):
+        received = self.counters
+        last = self.capacity - 1
+        for name in glob.glob (os.path.join (self.directory, "rx*.txt")):
+            with open (name) as f:
+                for line in f:
+                    fields = line.split ()
+                    if len (fields) != 2:
+                        continue
+                    i = int (math.ceil ((float (fields[0]) - self.start) / self.interval - 1e-9))
+                    if i <= last:
+                        received[max (i, 0)] += float (fields[1])
+        total = 0.0
+        for i in range (self.capacity):
+            total += received[i]
+            received[i] = total
+        self.count = self.capacity
+
+    def _deliver (self, end):
+        if self.onChunk is not None and end > self.delivered:
+            self.onChunk (self.delivered, self.times (self.delivered, end),
+                          self.throughput (self.delivered, end))
+        self.delivered = end
+
+    def finish (self):
+        """Read the samples ns-3 wrote, once Simulator::Destroy has run, and
+        hand them to onChunk."""
+        if self.helper is None:
+            return
+        # Closes the file of the aggregator
+        self.helper = None
+        try:
+            self._read ()
+        finally:
+            shutil.rmtree (self.directory, ignore_errors=True)
+        step = self.chunkSize or self.count
+        while self.delivered < self.count:
+            self._deliver (min (self.delivered + step, self.count))
+
+    def times (self, begin=0, end=None):
+        """Simulation time of the samples, in seconds."""
+        if end is None:
+            end = self.count
+        return array.array ("d", [round (self.start + i * self.interval, 9) for i in range (begin, end)])
+
+    def throughput (self, begin=0, end=None):
+        """Mbit/s received during the interval ending at each sample."""
+        if end is None:
+            end = self.count
+        c = self.counters
+        scale = 8 / (self.interval * 1e6)
+        return array.array ("d", [(c[i] - (c[i - 1] if i else 0.0)) * scale for i in range (begin, end)])
@@ -0,0 +1,298 @@
+# -*-  Mode: Python; -*-
+# /*
+#  * Copyright (c) 2016
+#  *
+#  * This program is free software; you can redistribute it and/or modify
+#  * it under the terms of the GNU General Public License version 2 as
+#  * published by the Free Software Foundation;
+#  *
+#  * This program is distributed in the hope that it will be useful,
+#  * but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  * GNU General Public License for more details.
+#  *
+#  * You should have received a copy of the GNU General Public License
+#  * along with this program; if not, write to the Free Software
+#  * Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#  */
+
+# Volume control for the pcap traces of the examples.
+#
+# Captures are off unless --pcap=True.  Without any of the options below a
+# capture is the plain EnablePcap () file.  With them, ns-3 writes the capture
+# into a FIFO instead, read by a separate process (this module run as a script)
+# which keeps only what was asked for and writes it to <prefix>-<node>-<device>.pcap:
+#
+#   --snaplen=N         keep the first N bytes of each frame (e.g. 128 for the
+#                       radiotap, 802.11, IP and transport headers)
+#   --pcapFrames=LIST   keep only these frame types (mgmt, ctrl, data) or
+#                       subtypes (beacon, probe-req, assoc-req, action, rts, cts,
+#                       ack, blockack, blockackreq, qos-data, null, ...)
+#   --pcapFlows=LIST    keep only the data frames of these IPv4 flows, each
+#                       SRC>DST:PORT with any part left out as a wildcard (the
+#                       port matches either end); other frame types are kept
+#   --pcapMaxSize=MB    start a new file (<name>.1.pcap, <name>.2.pcap, ...)
+#                       every MB megabytes
+#   --pcapCompress=N    gzip the files on the fly at level N (1-9)
+#
+# Radiotap (DLT 127), plain 802.11 (DLT 105) and Ethernet (DLT 1) captures are
+# understood; frames of other link types are only truncated.
+
+import gzip
+import json
+import os
+import shutil
+import socket
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+
+DLT_EN10MB = 1
+DLT_IEEE802_11 = 105
+DLT_IEEE802_11_RADIO = 127
+
+TYPES = {0: "mgmt", 1: "ctrl", 2: "data"}
+SUBTYPES = {
+    (0, 0): "assoc-req", (0, 1): "assoc-resp", (0, 2): "reassoc-req", (0, 3): "reassoc-resp",
+    (0, 4): "probe-req", (0, 5): "probe-resp", (0, 8): "beacon", (0, 10): "disassoc",
+    (0, 11): "auth", (0, 12): "deauth", (0, 13): "action",
+    (1, 8): "blockackreq", (1, 9): "blockack", (1, 10): "ps-poll", (1, 11): "rts",
+    (1, 12): "cts", (1, 13): "ack", (1, 14): "cf-end",
+    (2, 0): "data", (2, 4): "null", (2, 8): "qos-data", (2, 12): "qos-null",
+}
+
+
+def options (cmd):
+    """The trace options set on an ns.core.CommandLine by add_options (), as a
+    dict of TraceOutput arguments, or None if captures are off."""
+    if str (cmd.pcap) != "True":
+        return None
+    return {"snaplen": int (cmd.snaplen),
+            "frames": [f for f in str (cmd.pcapFrames).split (",") if f],
+            "flows": [f for f in str (cmd.pcapFlows).split (",") if f],
+            "maxBytes": int (float (cmd.pcapMaxSize) * 1024 * 1024),
+            "compress": int (cmd.pcapCompress)}
+
+
+def add_options (cmd):
+    cmd.pcap = "False"
+    cmd.snaplen = 0
+    cmd.pcapFrames = ""
+    cmd.pcapFlows = ""
+    cmd.pcapMaxSize = 0 # MB
+    cmd.pcapCompress = 0
+    cmd.AddValue ("pcap", "Enable/disable PCAP tracing")
+    cmd.AddValue ("snaplen", "Bytes of each frame kept in the PCAP traces (0: whole frames)")
+    cmd.AddValue ("pcapFrames", "Comma separated frame types or subtypes kept in the PCAP traces (empty: all)")
+    cmd.AddValue ("pcapFlows", "Comma separated SRC>DST:PORT IPv4 flows whose data frames are kept (empty: all)")
+    cmd.AddValue ("pcapMaxSize", "Size in MB after which a new PCAP file is started (0: one file)")
+    cmd.AddValue ("pcapCompress", "gzip level of the PCAP traces (0: uncompressed)")
+
+
+def from_command_line (cmd):
+    """TraceOutput for the options of cmd, or None if captures are off."""
+    opts = options (cmd)
+    return TraceOutput (**opts) if opts is not None else None
+
+
+class TraceOutput (object):
+    """Enables the pcap captures of devices through the capture filter."""
+
+    def __init__ (self, snaplen=0, frames=None, flows=None, maxBytes=0, compress=0):
+        self.options = {"snaplen": snaplen, "frames": list (frames or []), "flows": list (flows or []),
+                        "maxBytes": maxBytes, "compress": compress}
+        self.filtered = bool (snaplen or frames or flows or maxBytes or compress)
+        self.readers = []
+        self.fifoDir = None
+
+    def enable (self, helper, prefix, device, promiscuous=False):
+        """helper.EnablePcap (prefix, device, promiscuous) through the filter.
+        Returns the name of the (first) capture file."""
+        name = "%s-%d-%d" % (prefix, device.GetNode ().GetId (), device.GetIfIndex ())
+        if not self.filtered:
+            helper.EnablePcap (name + ".pcap", device, promiscuous, True)
+            return name + ".pcap"
+        if self.fifoDir is None:
+            self.fifoDir = tempfile.mkdtemp (prefix="ns3-pcap-")
+        fifo = os.path.join (self.fifoDir, name + ".fifo")
+        os.mkfifo (fifo)
+        script = os.path.splitext (os.path.abspath (__file__))[0] + ".py"
+        self.readers.append (subprocess.Popen ([sys.executable, script, fifo, name, json.dumps (self.options)]))
+        # Opening the FIFO blocks until the reader has opened its end
+        helper.EnablePcap (fifo, device, promiscuous, True)
+        return name + ".pcap" + (".gz" if self.options["compress"] else "")
+
+    def enable_all (self, helper, prefix, devices, promiscuous=False):
+        for i in range (devices.GetN ()):
+            self.enable (helper, prefix, devices.Get (i), promiscuous)
+
+    def close (self, timeout=30.0):
+        """Wait for the readers once the simulator is destroyed (which closes
+        the captures).  Readers still running after timeout finish on their own
+        when this process exits."""
+        deadline = time.time () + timeout
+        while any (r.poll () is None for r in self.readers) and time.time () < deadline:
+            time.sleep (0.05)
+        if self.fifoDir is not None:
+            shutil.rmtree (self.fifoDir, ignore_errors=True)
+
+
+def _ipv4 (data, offset):
+    """(src, dst, srcPort, dstPort) of the IPv4 packet at offset, or None."""
+    if len (data) < offset + 20 or data[offset] >> 4 != 4:
+        return None
+    ihl = (data[offset] & 0x0f) * 4
+    src = socket.inet_ntoa (bytes (data[offset + 12:offset + 16]))
+    dst = socket.inet_ntoa (bytes (data[offset + 16:offset + 20]))
+    ports = (None, None)
+    if data[offset + 9] in (6, 17) and len (data) >= offset + ihl + 4:
+        ports = struct.unpack_from (">HH", data, offset + ihl)
+    return src, dst, ports[0], ports[1]
+
+
+def classify (linkType, data):
+    """(type, subtype, flow) of a captured frame (a bytearray); flow is the
+    (src, dst, srcPort, dstPort) of an IPv4 data frame, otherwise None."""
+    if linkType == DLT_EN10MB:
+        if len (data) >= 14 and data[12:14] == b"\x08\x00":
+            return "data", "data", _ipv4 (data, 14)
+        return "data", "data", None
+    offset = 0
+    if linkType == DLT_IEEE802_11_RADIO:
+        if len (data) < 4:
+            return None, None, None
+        offset = struct.unpack_from ("<H", data, 2)[0]
+    elif linkType != DLT_IEEE802_11:
+        return None, None, None
+    if len (data) < offset + 2:
+        return None, None, None
+    fc, flags = data[offset], data[offset + 1]
+    kind, sub = (fc >> 2) & 3, fc >> 4
+    flow = None
+    if kind == 2 and not flags & 0x40: # unprotected data
+        header = 24
+        if flags & 3 == 3:
+            header += 6 # four addresses
+        if sub & 8:
+            header += 2 # QoS control
+            amsdu = len (data) > offset + header - 2 and data[offset + header - 2] & 0x80
+            if flags & 0x80:
+                header += 4 # HT control
+        else:
+            amsdu = False
+        llc = offset + header
+        if not amsdu and data[llc:llc + 3] == b"\xaa\xaa\x03" and data[llc + 6:llc + 8] == b"\x08\x00":
+            flow = _ipv4 (data, llc + 8)
+    return TYPES.get (kind), SUBTYPES.get ((kind, sub)), flow
+
+
+def _parse_flow (spec):
+    src, _, rest = spec.partition (">")
+    dst, _, port = rest.partition (":")
+    return (src if src not in ("", "*") else None, dst if dst not in ("", "*") else None,
+            int (port) if port not in ("", "*") else None)
+
+
+def _flow_matches (flow, flows):
+    if flow is None:
+        return False
+    src, dst, srcPort, dstPort = flow
+    for s, d, p in flows:
+        if (s is None or s == src) and (d is None or d == dst) and (p is None or p in (srcPort, dstPort)):
+            return True
+    return False
+
+
+class _Writer (object):
+    """Writes the kept records to name.pcap, name.1.pcap, ... (gzipped if asked)."""
+
+    def __init__ (self, name, header, maxBytes, compress):
+        self.name = name
+        self.header = header
+        self.maxBytes = maxBytes
+        self.compress = compress
+        self.index = 0
+        self.f = None
+        self.size = 0
+        self._open ()
+
+    def _open (self):
+        path = self.name + (".%d" % self.index if self.index else "") + ".pcap"
+        if self.compress:
+            self.f = gzip.open (path + ".gz", "wb", self.compress)
+        else:
+            self.f = open (path, "wb")
+        self.f.write (self.header)
+        self.size = len (self.header)
+
+    def write (self, record):
+        if self.maxBytes and self.size + len (record) > self.maxBytes and self.size > len (self.header):
+            self.f.close ()
+            self.index += 1
+            self._open ()
+        self.f.write (record)
+        self.size += len (record)
+
+    def close (self):
+        self.f.close ()
+
+
+def filter_capture (source, name, snaplen=0, frames=None, flows=None, maxBytes=0, compress=0):
+    """Copy the pcap stream source (a file object) to name.pcap, keeping only the
+    frames selected by the options.  Returns (frames read, frames kept)."""
+    frames = set (frames or [])
+    flows = [_parse_flow (f) for f in flows or []]
+    header = bytearray (source.read (24))
+    if len (header) < 24:
+        return 0, 0
+    magic = struct.unpack_from ("<I", header)[0]
+    endian = "<" if magic in (0xa1b2c3d4, 0xa1b23c4d) else ">"
+    linkType = struct.unpack_from (endian + "I", header, 20)[0]
+    if snaplen:
+        struct.pack_into (endian + "I", header, 16, snaplen)
+    writer = _Writer (name, bytes (header), maxBytes, compress)
+
+    recordHeader = struct.Struct (endian + "IIII")
+    buf = bytearray ()
+    pos = 0
+    read = kept = 0
+    while True:
+        chunk = source.read (1 << 20)
+        if not chunk:
+            break
+        buf = buf[pos:] + bytearray (chunk)
+        pos = 0
+        while len (buf) - pos >= 16:
+            seconds, micro, length, original = recordHeader.unpack_from (buf, pos)
+            end = pos + 16 + length
+            if end > len (buf):
+                break
+            data = buf[pos + 16:end]
+            pos = end
+            read += 1
+            if frames or flows:
+                kind, sub, flow = classify (linkType, data)
+                if frames and kind not in frames and sub not in frames:
+                    continue
+                if flows and kind == "data" and not _flow_matches (flow, flows):
+                    continue
+            if snaplen and length > snaplen:
+                data = data[:snaplen]
+            writer.write (recordHeader.pack (seconds, micro, len (data), original) + bytes (data))
+            kept += 1
+    writer.close ()
+    return read, kept
+
+
+def main (argv):
+    fifo, name, opts = argv[1], argv[2], json.loads (argv[3])
+    with open (fifo, "rb") as source:
+        # Both ends are open: the FIFO is no longer needed on disk
+        os.remove (fifo)
+        filter_capture (source, name, **opts)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit (main (sys.argv))
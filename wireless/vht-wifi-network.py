@@ -20,12 +20,14 @@
 #  *                      Mohit P. Tahiliani <tahiliani@nitk.edu.in>
 #  */
 
-import ns.core
-import ns.network
-import ns.applications
-import ns.wifi
-import ns.mobility
-import ns.internet
+from ns_lazy import ns
+
+from wifi_sweep import run_points
+from result_cache import ResultCache, ns3_version
+from convergence import ConvergenceMonitor
+from results_sink import TableSink, MultiSink, open_sink
+from threshold_search import max_distance, best_mcs
+import phy_estimate
 
 # This is a simple example in order to show how to configure an IEEE 802.11ac Wi-Fi network.
 #
@@ -43,23 +45,267 @@ import ns.internet
 #
 # Packets in this simulation aren't marked with a QosTag so they are considered
 # belonging to BestEffort Access Class (AC_BE).
+#
+# Every (MCS, channel width, guard interval) point is an independent simulation. With --jobs=N the
+# points are spread over N worker processes (0 means one per CPU); the table is still printed in grid order.
+# With --cacheDir=DIR the result of every point is kept on disk, keyed by its full configuration (including
+# --RngRun and the ns-3 build), so re-running the sweep only simulates the points whose configuration changed.
+# --refresh=True forces every point to be simulated again; --cacheMaxSize (MB) and --cacheMaxAge (days) bound the cache.
+# With --tolerance=T (e.g. 0.01) a point stops as soon as the 95% confidence interval of its throughput is within
+# T of the mean, instead of always running for simulationTime; the simulated time actually used is then reported.
+# With --output=FILE every point is also written as a record to FILE as soon as it completes (JSON lines, CSV or
+# the compact columnar format of results_sink.py, chosen by --format or the file extension: .jsonl, .csv, .col);
+# --table=False drops the printed table.
+#
+# Instead of the goodput at one distance, two threshold searches can be run (see threshold_search.py):
+#  --search=distance  for every (MCS, channel width, guard interval), bisect for the largest distance in
+#                     [minDistance, maxDistance] (down to --resolution meters) still delivering --target Mbit/s
+#  --search=mcs       for every (channel width, guard interval), bisect for the highest MCS delivering
+#                     --target Mbit/s at --distance
+#
+# Before simulating, the sweep can estimate every point analytically (PHY rate and SNR against the SNR its MCS
+# needs, see phy_estimate.py; needs NumPy):
+#  --prefilter=mark   simulate every point, adding the estimate to its results
+#  --prefilter=order  as mark, starting the points with the highest PHY rate (the slowest ones) first
+#  --prefilter=skip   as order, but points predicted to deliver nothing are reported with a zero goodput
+#                     without being simulated, except a random --verifyFraction of them
+# --snrMargin (dB) is how far below the required SNR a point has to be to be predicted to deliver nothing.
+
+# Run a single point of the sweep and return its results
+def run_point(point):
+    mcs = point["mcs"]
+    channelWidth = point["channelWidth"]
+    sgi = point["sgi"]
+    udp = point["udp"]
+    simulationTime = point["simulationTime"]
+    distance = point["distance"]
+
+    payloadSize = point["payloadSize"]
+    if not udp:
+        ns.core.Config.SetDefault ("ns3::TcpSocket::SegmentSize", ns.core.UintegerValue (payloadSize))
+
+    wifiStaNode = ns.network.NodeContainer ()
+    wifiStaNode.Create (1)
+    wifiApNode = ns.network.NodeContainer ()
+    wifiApNode.Create (1)
+
+    channel = ns.wifi.YansWifiChannelHelper.Default ()
+    phy = ns.wifi.YansWifiPhyHelper.Default ()
+    phy.SetChannel (channel.Create ())
+
+    # Set guard interval
+    phy.Set ("ShortGuardEnabled", ns.core.BooleanValue (sgi))
+
+    wifi = ns.wifi.WifiHelper.Default ()
+    wifi.SetStandard (ns.wifi.WIFI_PHY_STANDARD_80211ac)
+    mac = ns.wifi.VhtWifiMacHelper.Default ()
+
+    DataRate = ns.wifi.VhtWifiMacHelper.DataRateForMcs (mcs)
+    wifi.SetRemoteStationManager ("ns3::ConstantRateWifiManager", "DataMode", DataRate,
+                                  "ControlMode", DataRate)
+
+    ssid = ns.wifi.Ssid ("ns3-80211ac")
+    mac.SetType ("ns3::StaWifiMac",
+                 "Ssid", ns.wifi.SsidValue (ssid),
+                 "ActiveProbing", ns.core.BooleanValue (False))
+
+    staDevice = wifi.Install (phy, mac, wifiStaNode)
+
+    mac.SetType ("ns3::ApWifiMac",
+                 "Ssid", ns.wifi.SsidValue (ssid))
+
+    apDevice = wifi.Install (phy, mac, wifiApNode)
+
+    # Set channel width
+    ns.core.Config.Set ("/NodeList/*/DeviceList/*/$ns3::WifiNetDevice/Phy/ChannelWidth", ns.core.UintegerValue (channelWidth))
+
+    mobility = ns.mobility.MobilityHelper ()
+    positionAlloc = ns.mobility.ListPositionAllocator ()
+    positionAlloc.Add (ns.core.Vector3D (0.0, 0.0, 0.0))
+    positionAlloc.Add (ns.core.Vector3D (distance, 0.0, 0.0))
+    mobility.SetPositionAllocator (positionAlloc)
+
+    mobility.SetMobilityModel ("ns3::ConstantPositionMobilityModel")
+
+    mobility.Install (wifiApNode)
+    mobility.Install (wifiStaNode)
+
+    # Internet stack
+    stack = ns.internet.InternetStackHelper ()
+    stack.Install (wifiApNode)
+    stack.Install (wifiStaNode)
+
+    address = ns.internet.Ipv4AddressHelper ()
+
+    address.SetBase (ns.network.Ipv4Address ("192.168.1.0"), ns.network.Ipv4Mask ("255.255.255.0"))
+
+    staNodeInterface = address.Assign (staDevice)
+    apNodeInterface = address.Assign (apDevice)
+
+    # Setting applications
+    serverApp = ns.network.ApplicationContainer ()
+    sinkApp = ns.network.ApplicationContainer ()
+    if udp == "True":
+        # UDP flow
+        myServer = ns.applications.UdpServerHelper (9)
+        serverApp = myServer.Install (ns.network.NodeContainer (wifiStaNode.Get (0)))
+        serverApp.Start (ns.core.Seconds (0.0))
+        serverApp.Stop (ns.core.Seconds (simulationTime + 1))
+
+        myClient = ns.applications.UdpClientHelper (staNodeInterface.GetAddress (0), 9)
+        myClient.SetAttribute ("MaxPackets", ns.core.UintegerValue (4294967295))
+        myClient.SetAttribute ("Interval", ns.core.TimeValue (ns.core.Time ("0.00001")))  # packets/s
+        myClient.SetAttribute ("PacketSize", ns.core.UintegerValue (payloadSize))
+
+        clientApp = myClient.Install (ns.network.NodeContainer (wifiApNode.Get (0)))
+        clientApp.Start (ns.core.Seconds (1.0))
+        clientApp.Stop (ns.core.Seconds (simulationTime + 1))
+    else:
+        # TCP flow
+        port = 50000
+        apLocalAddress = ns.network.Address (ns.network.InetSocketAddress (ns.network.Ipv4Address.GetAny (), port))
+        packetSinkHelper = ns.applications.PacketSinkHelper ("ns3::TcpSocketFactory", apLocalAddress)
+        sinkApp = packetSinkHelper.Install (wifiStaNode.Get (0))
+
+        sinkApp.Start (ns.core.Seconds (0.0))
+        sinkApp.Stop (ns.core.Seconds (simulationTime + 1))
+
+        onoff = ns.applications.OnOffHelper ("ns3::TcpSocketFactory", ns.network.Ipv4Address.GetAny ())
+        onoff.SetAttribute ("OnTime",  ns.core.StringValue ("ns3::ConstantRandomVariable[Constant=1]"))
+        onoff.SetAttribute ("OffTime", ns.core.StringValue ("ns3::ConstantRandomVariable[Constant=0]"))
+        onoff.SetAttribute ("PacketSize", ns.core.UintegerValue (payloadSize))
+        onoff.SetAttribute ("DataRate", ns.network.DataRateValue (ns.network.DataRate (1000000000))) # bit/s
+        apps = ns.network.ApplicationContainer ()
+
+        remoteAddress = ns.network.AddressValue (ns.network.InetSocketAddress (staNodeInterface.GetAddress (0), port))
+        onoff.SetAttribute ("Remote", remoteAddress)
+        apps.Add (onoff.Install (wifiApNode.Get (0)))
+        apps.Start (ns.core.Seconds (1.0))
+        apps.Stop (ns.core.Seconds (simulationTime + 1))
+
+    ns.internet.Ipv4GlobalRoutingHelper.PopulateRoutingTables ()
+
+    monitor = None
+    if point["tolerance"] > 0:
+        if udp == "True":
+            rxBytes = lambda: serverApp.Get (0).GetReceived () * payloadSize
+        else:
+            rxBytes = lambda: sinkApp.Get (0).GetTotalRx ()
+        monitor = ConvergenceMonitor (rxBytes, 1.0, point["tolerance"])
+        monitor.install ()
+
+    ns.core.Simulator.Stop (ns.core.Seconds (simulationTime + 1))
+    ns.core.Simulator.Run ()
+    ns.core.Simulator.Destroy ()
+
+    if monitor is not None and monitor.converged:
+        return {"throughput": monitor.throughput (), "simulationTimeUsed": monitor.elapsed ()}
+
+    throughput = 0
+    if udp == "True":
+        # UDP
+        totalPacketsThrough = serverApp.Get (0).GetReceived ()
+        throughput = totalPacketsThrough * payloadSize * 8 / (simulationTime * 1000000.0)  # Mbit/s
+    else:
+        # TCP
+        totalPacketsThrough = sinkApp.Get (0).GetTotalRx ()
+        throughput = totalPacketsThrough * 8 / (simulationTime * 1000000.0)  # Mbit/s
+
+    return {"throughput": throughput, "simulationTimeUsed": simulationTime}
+
+# Run the threshold search of a single grid point and return its results
+def search_point(point):
+    if point["search"] == "distance":
+        return max_distance (run_point, point, point["target"], point["minDistance"],
+                             point["maxDistance"], point["resolution"])
+    return best_mcs (run_point, point, point["target"], point["mcsValues"])
 
 def main(argv):
     cmd = ns.core.CommandLine ()
     cmd.udp = "True"
     cmd.simulationTime = 10 # seconds
     cmd.distance = 1.0 # meters
+    cmd.search = "none"
+    cmd.target = 0 # Mbit/s
+    cmd.minDistance = 1.0 # meters
+    cmd.maxDistance = 200.0 # meters
+    cmd.resolution = 0.5 # meters
+    cmd.jobs = 1
+    cmd.output = ""
+    cmd.format = ""
+    cmd.table = "True"
+    cmd.tolerance = 0
+    cmd.cacheDir = ""
+    cmd.refresh = "False"
+    cmd.cacheMaxSize = 0 # MB
+    cmd.cacheMaxAge = 0 # days
+    cmd.prefilter = "off"
+    cmd.snrMargin = 3.0 # dB
+    cmd.verifyFraction = 0.1
 
     cmd.AddValue ("distance", "Distance in meters between the station and the access point")
     cmd.AddValue ("simulationTime", "Simulation time in seconds")
     cmd.AddValue ("udp", "UDP if set to True, TCP otherwise")
+    cmd.AddValue ("tolerance", "Stop a point once its throughput is known within this relative tolerance (0: fixed simulationTime)")
+    cmd.AddValue ("search", "Threshold search instead of a sweep: none, distance or mcs")
+    cmd.AddValue ("target", "Goodput in Mbit/s a point has to deliver in a threshold search (0: any)")
+    cmd.AddValue ("minDistance", "Lower end of the distance search in meters")
+    cmd.AddValue ("maxDistance", "Upper end of the distance search in meters")
+    cmd.AddValue ("resolution", "Resolution of the distance search in meters")
+    cmd.AddValue ("output", "File the results are written to, one record per point")
+    cmd.AddValue ("format", "Format of the output file: jsonl, csv or col (default: from the file extension)")
+    cmd.AddValue ("table", "Print the results table")
+    cmd.AddValue ("jobs", "Number of worker processes running the sweep (0: one per CPU)")
+    cmd.AddValue ("cacheDir", "Directory of the sweep result cache (empty: no cache)")
+    cmd.AddValue ("refresh", "Simulate every point again and overwrite its cached result")
+    cmd.AddValue ("cacheMaxSize", "Maximum size of the result cache in MB (0: unlimited)")
+    cmd.AddValue ("cacheMaxAge", "Maximum age of cached results in days (0: unlimited)")
+    cmd.AddValue ("prefilter", "Analytical estimate of the sweep points: off, mark, order or skip")
+    cmd.AddValue ("snrMargin", "Margin in dB below the SNR required by the MCS before a point is predicted to deliver nothing")
+    cmd.AddValue ("verifyFraction", "Fraction of the points skipped by --prefilter=skip that are simulated anyway")
     cmd.Parse (sys.argv)
 
     udp = cmd.udp
     simulationTime = float(cmd.simulationTime)
     distance = float(cmd.distance)
-
-    print "MCS value" , "\t\t", "Channel width", "\t\t", "short GI","\t\t","Throughput" ,'\n'
+    jobs = int(cmd.jobs)
+    tolerance = float(cmd.tolerance)
+    search = cmd.search
+    prefilter = cmd.prefilter
+
+    if udp:
+        payloadSize = 1472 # bytes
+    else:
+        payloadSize = 1448 # bytes
+
+    if search not in ("none", "distance", "mcs"):
+        print "Wrong search value!\n"
+        return 0
+
+    if prefilter not in ("off", "mark", "order", "skip"):
+        print "Wrong prefilter value!\n"
+        return 0
+
+    if prefilter != "off" and search != "none":
+        print "The prefilter only applies to the sweep, ignoring it\n"
+        prefilter = "off"
+
+    if prefilter != "off" and phy_estimate.numpy is None:
+        print "The prefilter needs NumPy!\n"
+        return 1
+
+    rngRun = ns.core.UintegerValue ()
+    ns.core.GlobalValue.GetValueByName ("RngRun", rngRun)
+
+    cache = None
+    if cmd.cacheDir:
+        cache = ResultCache (cmd.cacheDir,
+                             context={"script": "vht-wifi-network.py", "ns3": ns3_version ()},
+                             maxBytes=int(float(cmd.cacheMaxSize) * 1024 * 1024),
+                             maxAge=float(cmd.cacheMaxAge) * 86400,
+                             refresh=str(cmd.refresh) == "True")
+
+    points = []
     for i in range(0, 10): # MCS
         j = 20
         while j <= 160: # channel width
@@ -67,130 +313,77 @@ def main(argv):
                 j *= 2
                 continue
             for k in range(0, 2): # GI: 0 and 1
-                if udp:
-                    payloadSize = 1472 # bytes
-                else:
-                    payloadSize = 1448 # bytes
-                    ns.core.Config.SetDefault ("ns3::TcpSocket::SegmentSize", ns.core.UintegerValue (payloadSize))
-
-                wifiStaNode = ns.network.NodeContainer ()
-                wifiStaNode.Create (1)
-                wifiApNode = ns.network.NodeContainer ()
-                wifiApNode.Create (1)
-
-                channel = ns.wifi.YansWifiChannelHelper.Default ()
-                phy = ns.wifi.YansWifiPhyHelper.Default ()
-                phy.SetChannel (channel.Create ())
-                
-		# Set guard interval
-                phy.Set ("ShortGuardEnabled", ns.core.BooleanValue (k))
-
-                wifi = ns.wifi.WifiHelper.Default ()
-                wifi.SetStandard (ns.wifi.WIFI_PHY_STANDARD_80211ac)
-                mac = ns.wifi.VhtWifiMacHelper.Default ()
-
-                DataRate = ns.wifi.VhtWifiMacHelper.DataRateForMcs (i)
-                wifi.SetRemoteStationManager ("ns3::ConstantRateWifiManager", "DataMode", DataRate,
-                                              "ControlMode", DataRate)
-
-                ssid = ns.wifi.Ssid ("ns3-80211ac")
-                mac.SetType ("ns3::StaWifiMac",
-                             "Ssid", ns.wifi.SsidValue (ssid),
-                             "ActiveProbing", ns.core.BooleanValue (False))
-
-                staDevice = wifi.Install (phy, mac, wifiStaNode)
-
-                mac.SetType ("ns3::ApWifiMac",
-                             "Ssid", ns.wifi.SsidValue (ssid))
-
-                apDevice = wifi.Install (phy, mac, wifiApNode)
-
-                # Set channel width
-                ns.core.Config.Set ("/NodeList/*/DeviceList/*/$ns3::WifiNetDevice/Phy/ChannelWidth", ns.core.UintegerValue (j))
-
-                mobility = ns.mobility.MobilityHelper ()
-                positionAlloc = ns.mobility.ListPositionAllocator ()
-                positionAlloc.Add (ns.core.Vector3D (0.0, 0.0, 0.0))
-                positionAlloc.Add (ns.core.Vector3D (distance, 0.0, 0.0))
-                mobility.SetPositionAllocator (positionAlloc)
-
-                mobility.SetMobilityModel ("ns3::ConstantPositionMobilityModel")
-
-                mobility.Install (wifiApNode)
-                mobility.Install (wifiStaNode)
-
-                # Internet stack
-                stack = ns.internet.InternetStackHelper ()
-                stack.Install (wifiApNode)
-                stack.Install (wifiStaNode)
-
-                address = ns.internet.Ipv4AddressHelper ()
-
-                address.SetBase (ns.network.Ipv4Address ("192.168.1.0"), ns.network.Ipv4Mask ("255.255.255.0"))
-
-                staNodeInterface = address.Assign (staDevice)
-                apNodeInterface = address.Assign (apDevice)
-
-		# Setting applications
-                serverApp = ns.network.ApplicationContainer ()
-                sinkApp = ns.network.ApplicationContainer ()
-                if udp == "True":
-			# UDP flow
-			myServer = ns.applications.UdpServerHelper (9)
-			serverApp = myServer.Install (ns.network.NodeContainer (wifiStaNode.Get (0)))
-			serverApp.Start (ns.core.Seconds (0.0))
-			serverApp.Stop (ns.core.Seconds (simulationTime + 1))
-
-			myClient = ns.applications.UdpClientHelper (staNodeInterface.GetAddress (0), 9)
-			myClient.SetAttribute ("MaxPackets", ns.core.UintegerValue (4294967295))
-			myClient.SetAttribute ("Interval", ns.core.TimeValue (ns.core.Time ("0.00001")))  # packets/s
-			myClient.SetAttribute ("PacketSize", ns.core.UintegerValue (payloadSize))
-
-			clientApp = myClient.Install (ns.network.NodeContainer (wifiApNode.Get (0)))
-			clientApp.Start (ns.core.Seconds (1.0))
-			clientApp.Stop (ns.core.Seconds (simulationTime + 1))
-                else:
-			# TCP flow
-			port = 50000
-			apLocalAddress = ns.network.Address (ns.network.InetSocketAddress (ns.network.Ipv4Address.GetAny (), port))
-			packetSinkHelper = ns.applications.PacketSinkHelper ("ns3::TcpSocketFactory", apLocalAddress)
-			sinkApp = packetSinkHelper.Install (wifiStaNode.Get (0))
-
-			sinkApp.Start (ns.core.Seconds (0.0))
-			sinkApp.Stop (ns.core.Seconds (simulationTime + 1))
-
-			onoff = ns.applications.OnOffHelper ("ns3::TcpSocketFactory", ns.network.Ipv4Address.GetAny ())
-			onoff.SetAttribute ("OnTime",  ns.core.StringValue ("ns3::ConstantRandomVariable[Constant=1]"))
-			onoff.SetAttribute ("OffTime", ns.core.StringValue ("ns3::ConstantRandomVariable[Constant=0]"))
-			onoff.SetAttribute ("PacketSize", ns.core.UintegerValue (payloadSize))
-			onoff.SetAttribute ("DataRate", ns.network.DataRateValue (ns.network.DataRate (1000000000))) # bit/s
-			apps = ns.network.ApplicationContainer ()
-
-			remoteAddress = ns.network.AddressValue (ns.network.InetSocketAddress (staNodeInterface.GetAddress (0), port))
-			onoff.SetAttribute ("Remote", remoteAddress)
-			apps.Add (onoff.Install (wifiApNode.Get (0)))
-			apps.Start (ns.core.Seconds (1.0))
-			apps.Stop (ns.core.Seconds (simulationTime + 1))
-
-                ns.internet.Ipv4GlobalRoutingHelper.PopulateRoutingTables ()
-
-                ns.core.Simulator.Stop (ns.core.Seconds (simulationTime + 1))
-                ns.core.Simulator.Run ()
-                ns.core.Simulator.Destroy ()
-
-                throughput = 0
-                if udp == "True":
-                    # UDP
-                    totalPacketsThrough = serverApp.Get (0).GetReceived ()
-                    throughput = totalPacketsThrough * payloadSize * 8 / (simulationTime * 1000000.0)  # Mbit/s
-                else:
-                    # TCP
-                    totalPacketsThrough = sinkApp.Get (0).GetTotalRx ()
-                    throughput = totalPacketsThrough * 8 / (simulationTime * 1000000.0)  # Mbit/s
-
-                print i , "\t\t\t" , j , "MHz\t\t\t" , k , "\t\t\t" , throughput , " Mbit/s"
-
+                points.append ({"mcs": i, "channelWidth": j, "sgi": k, "udp": udp, "payloadSize": payloadSize,
+                                "simulationTime": simulationTime, "tolerance": tolerance, "distance": distance,
+                                "rngRun": rngRun.Get ()})
             j *= 2
+
+    func = run_point
+    header = "MCS value \t\t Channel width \t\t short GI \t\t Throughput \n"
+    row = "%(mcs)s \t\t\t %(channelWidth)s MHz\t\t\t %(sgi)s \t\t\t %(throughput)s  Mbit/s"
+    if tolerance > 0:
+        header = "MCS value \t\t Channel width \t\t short GI \t\t Throughput \t\t Simulated time \n"
+        row += " \t\t %(simulationTimeUsed)s  s"
+    if prefilter != "off":
+        header = header.rstrip (" \n") + " \t\t Predicted PHY rate \t\t Simulated \n"
+        row += " \t\t %(predictedRate).1f  Mbit/s \t\t %(simulated)s"
+
+    if search == "distance":
+        func = search_point
+        for point in points:
+            del point["distance"]
+            point.update ({"search": search, "target": float(cmd.target), "minDistance": float(cmd.minDistance),
+                           "maxDistance": float(cmd.maxDistance), "resolution": float(cmd.resolution)})
+        header = "MCS value \t\t Channel width \t\t short GI \t\t Max distance \t\t Simulations \n"
+        row = "%(mcs)s \t\t\t %(channelWidth)s MHz\t\t\t %(sgi)s \t\t\t %(maxDistance)s  m \t\t %(simulations)s"
+
+    elif search == "mcs":
+        func = search_point
+        mcsValues = {}
+        for point in points:
+            mcsValues.setdefault (point["channelWidth"], []).append (point["mcs"])
+        points = [point for point in points if point["mcs"] == 0]
+        for point in points:
+            del point["mcs"]
+            point.update ({"search": search, "target": float(cmd.target),
+                           "mcsValues": sorted (set (mcsValues[point["channelWidth"]]))})
+        header = "Channel width \t\t short GI \t\t Best MCS \t\t Throughput \t\t Simulations \n"
+        row = "%(channelWidth)s MHz\t\t\t %(sgi)s \t\t\t %(bestMcs)s \t\t\t %(throughput)s  Mbit/s \t\t %(simulations)s"
+
+    sinks = []
+    if cmd.table == "True":
+        sinks.append (TableSink (row, header))
+    if cmd.output:
+        sinks.append (open_sink (cmd.output, cmd.format))
+    results = MultiSink (sinks)
+
+    if prefilter != "off":
+        sweep = phy_estimate.run_prefiltered (func, points, prefilter, jobs, cache, float(cmd.snrMargin),
+                                              float(cmd.verifyFraction), rngRun.Get ())
+    else:
+        sweep = run_points (func, points, jobs, cache)
+
+    skipped = 0
+    verified = 0
+    mispredicted = 0
+    for point, result in sweep:
+        record = dict ((key, point[key]) for key in ("mcs", "channelWidth", "sgi", "distance") if key in point)
+        record.update (result)
+        results.write (record)
+        if result.get ("predictedZero"):
+            if not result["simulated"]:
+                skipped += 1
+            elif result["throughput"] > 0:
+                mispredicted += 1
+            else:
+                verified += 1
+    results.close ()
+
+    if prefilter != "off":
+        print "%d points skipped, %d predicted-zero points confirmed and %d mispredicted by simulation" % (skipped, verified, mispredicted)
+
+    if cache is not None:
+        cache.evict ()
     return 0
 
 if __name__ == '__main__':
@@ -42,14 +42,15 @@
 #    - the recipient receives a block ack request or a MPDU with ack policy Block Ack. 
 #
 
-import ns.core
-import ns.internet
-import ns.network
-import ns.applications
-import ns.wifi
-import ns.mobility
+from ns_lazy import ns
+import trace_output
 
 def main(argv):
+    cmd = ns.core.CommandLine ()
+    trace_output.add_options (cmd)
+    cmd.Parse (argv)
+    pcap = trace_output.from_command_line (cmd)
+
     ns.core.LogComponentEnable ("EdcaTxopN", ns.core.LOG_LEVEL_DEBUG)
     ns.core.LogComponentEnable ("BlockAckManager", ns.core.LOG_LEVEL_INFO)
 
@@ -134,9 +135,12 @@ def main(argv):
 
     ns.core.Simulator.Stop (ns.core.Seconds (10.0))
 
-    phy.EnablePcap ("wifi-blockack-py", ap.GetId (), 0)
+    if pcap is not None:
+        pcap.enable (phy, "wifi-blockack-py", ap.GetDevice (0))
     ns.core.Simulator.Run ()
     ns.core.Simulator.Destroy ()
+    if pcap is not None:
+        pcap.close ()
 
 if __name__ == '__main__':
     import sys
@@ -31,38 +31,77 @@
 #  - Use of OnOffApplication to generate CBR stream 
 #  - IP flow monitor
 #
+# The experiment generalizes to N nodes: --nNodes=N makes a chain of N nodes, each only reaching its
+# neighbours, and --lossMatrix=FILE reads any topology (see loss_matrix.py for the .npy, .npz and text
+# formats).  Every even-numbered node sends a CBR stream to its closest odd-numbered neighbour, as
+# nodes 0 and 2 both send to node 1 in the 3 node chain.
+#
+# A single run cannot show whether RTS/CTS really helps.  --replicate=True runs both experiments with
+# RngRun 1, 2, ... (the same runs for both: common random numbers, see replication.py) over --jobs worker
+# processes, from --minRuns replications on, until the 95% confidence interval of the difference in total
+# throughput is within --precision Mbit/s or --relPrecision of the difference, or --maxRuns is reached.
+#
+# FlowMonitor on every node costs a lot per packet once there are many nodes.  With --flowStats=counters
+# the CBR streams are UdpClient -> UdpServer flows of the same rate and packet size, and only the
+# counters of the servers are read at the end (see flow_counters.py); --delaySample=F measures the delay
+# of a fraction F of the senders with a FlowMonitor on just those nodes.  See flowstats-benchmark.py.
+#
+# The statistics of all flows are read in one call (see flow_export.py) and the throughput of a flow is
+# measured over its own first sent to last received packet.  With --output=FILE the per-flow statistics of
+# both experiments are written to FILE (JSON lines, CSV or the columnar format of results_sink.py, chosen
+# by --format or the file extension: .jsonl, .csv, .col), with an rtsCts column telling them apart.
+#
+# --timing=True prints, for each experiment, the time spent loading the loss matrix (one SetLoss call per
+# link), the whole setup and the run.  See loss-matrix-benchmark.py.
+#
+
+import array
+import time
+
+from ns_lazy import ns
+import loss_matrix
+from replication import replicate
+from flow_counters import FlowCounters, DelaySampler
+import flow_export
+from results_sink import open_sink
 
-import ns.core
-import ns.propagation
-import ns.network
-import ns.applications
-import ns.wifi
-import ns.mobility
-import ns.internet
-import ns.flow_monitor
+# Senders and receivers of the CBR streams: every even node to its closest odd neighbour
+def flows(lossMatrix):
+    pairs = []
+    for i, links in sorted (lossMatrix.neighbours ().items ()):
+        odd = sorted ((loss, j) for j, loss in links if j % 2 == 1)
+        if i % 2 == 0 and odd:
+            pairs.append ((i, odd[0][1]))
+    return pairs
 
 # Run single 10 seconds experiment with enabled or disabled RTS/CTS mechanism
-def experiment(enableCtsRts):
+def experiment(enableCtsRts, lossMatrix=None, verbose=True, flowStats="monitor", delaySample=0.0, sink=None,
+               timing=False):
+    start = time.time ()
+    if lossMatrix is None:
+        lossMatrix = loss_matrix.chain (3, 50)
+    nNodes = lossMatrix.nNodes
 
     # 0. Enable or disable CTS/RTS
     ctsThr = 100 if enableCtsRts else 2200
     ns.core.Config.SetDefault ("ns3::WifiRemoteStationManager::RtsCtsThreshold", ns.core.UintegerValue (ctsThr))
 
-    # 1. Create 3 nodes
+    # 1. Create the nodes
     nodes = ns.network.NodeContainer ()
-    nodes.Create (3)
+    nodes.Create (nNodes)
 
     # 2. Place nodes somehow, this is required by every wireless simulation
     i = 0
-    while i < 3:
+    while i < nNodes:
         nodes.Get (i).AggregateObject (ns.mobility.ConstantPositionMobilityModel ())
         i += 1
 
     # 3. Create propagation loss matrix
     lossModel = ns.propagation.MatrixPropagationLossModel ()
     lossModel.SetDefaultLoss (200) #set default loss to 200 dB (no link)
-    lossModel.SetLoss (nodes.Get (0).GetObject (ns.mobility.MobilityModel.GetTypeId ()), nodes.Get (1).GetObject (ns.mobility.MobilityModel.GetTypeId ()), 50)
-    lossModel.SetLoss (nodes.Get (2).GetObject (ns.mobility.MobilityModel.GetTypeId ()), nodes.Get (1).GetObject (ns.mobility.MobilityModel.GetTypeId ()), 50)
+    t = time.time ()
+    lossMatrix.apply (lossModel, nodes)
+    lossTime = time.time () - t
 
     # 4. Create & setup wifi channel
     wifiChannel = ns.wifi.YansWifiChannel ()
@@ -94,9 +133,9 @@ def experiment(enableCtsRts):
     internet.Install (nodes)
     ipv4 = ns.internet.Ipv4AddressHelper ()
     ipv4.SetBase (ns.network.Ipv4Address ("10.0.0.0"), ns.network.Ipv4Mask ("255.0.0.0"))
-    ipv4.Assign (devices)
+    interfaces = ipv4.Assign (devices)
 
-    # 7. Install applications: two CBR streams each saturating the channel
+    # 7. Install applications: CBR streams each saturating the channel
     cbrApps = ns.network.ApplicationContainer ()
     cbrPort = 12345
     onOffHelper = ns.applications.OnOffHelper ("ns3::UdpSocketFactory", ns.network.InetSocketAddress (ns.network.Ipv4Address ("10.0.0.2"), cbrPort))
@@ -104,19 +143,32 @@ def experiment(enableCtsRts):
     onOffHelper.SetAttribute ("OnTime", ns.core.StringValue ("ns3::ConstantRandomVariable[Constant=1]"))
     onOffHelper.SetAttribute ("OffTime", ns.core.StringValue ("ns3::ConstantRandomVariable[Constant=0]"))
 
-    # flow 1:  node 0 -> node 1
-    onOffHelper.SetAttribute ("DataRate", ns.core.StringValue ("3000000bps"))
-    onOffHelper.SetAttribute ("StartTime", ns.core.TimeValue (ns.core.Seconds (1.000000)))
-    cbrApps.Add (onOffHelper.Install (nodes.Get (0)))
-
-    # flow 2:  node 2 -> node 1
+    # flow k:  sender -> receiver (node 0 -> node 1, node 2 -> node 1, ...)
     # \internal
     # The slightly different start times and data rates are a workaround
     # for \bugid{388} and \bugid{912}
     #
-    onOffHelper.SetAttribute ("DataRate", ns.core.StringValue ("3001100bps"))
-    onOffHelper.SetAttribute ("StartTime", ns.core.TimeValue (ns.core.Seconds (1.001)))
-    cbrApps.Add (onOffHelper.Install (nodes.Get (2)))
+    pairs = flows (lossMatrix)
+    counters = FlowCounters ()
+    for k, (sender, receiver) in enumerate (pairs):
+        if flowStats == "counters":
+            # Same stream, one server port per flow so that each flow has its own counters
+            rate = 3000000 + 1100 * k
+            server = ns.applications.UdpServerHelper (cbrPort + k).Install (nodes.Get (receiver))
+            client = ns.applications.UdpClientHelper (interfaces.GetAddress (receiver), cbrPort + k)
+            client.SetAttribute ("MaxPackets", ns.core.UintegerValue (4294967295))
+            client.SetAttribute ("Interval", ns.core.TimeValue (ns.core.Seconds (1400 * 8.0 / rate)))
+            client.SetAttribute ("PacketSize", ns.core.UintegerValue (1400))
+            client.SetAttribute ("StartTime", ns.core.TimeValue (ns.core.Seconds (1.0 + 0.001 * k)))
+            clientApps = client.Install (nodes.Get (sender))
+            cbrApps.Add (clientApps)
+            counters.add (interfaces.GetAddress (sender), interfaces.GetAddress (receiver), cbrPort + k,
+                          clientApps.Get (0), server.Get (0), 1400)
+            continue
+        onOffHelper.SetAttribute ("Remote", ns.network.AddressValue (ns.network.InetSocketAddress (interfaces.GetAddress (receiver), cbrPort)))
+        onOffHelper.SetAttribute ("DataRate", ns.core.StringValue ("%dbps" % (3000000 + 1100 * k)))
+        onOffHelper.SetAttribute ("StartTime", ns.core.TimeValue (ns.core.Seconds (1.0 + 0.001 * k)))
+        cbrApps.Add (onOffHelper.Install (nodes.Get (sender)))
 
     # \internal
     # We also use separate UDP applications that will send a single
@@ -124,58 +176,152 @@ def experiment(enableCtsRts):
     # This is a workaround for the lack of perfect ARP, see \bugid{187}
     #
     echoPort = 9
-    echoClientHelper = ns.applications.UdpEchoClientHelper (ns.network.Ipv4Address ("10.0.0.2"), echoPort)
-    echoClientHelper.SetAttribute ("MaxPackets", ns.core.UintegerValue (1))
-    echoClientHelper.SetAttribute ("Interval", ns.core.TimeValue (ns.core.Seconds (0.1)))
-    echoClientHelper.SetAttribute ("PacketSize", ns.core.UintegerValue (10))
     pingApps = ns.network.ApplicationContainer ()
 
     # again using different start times to workaround Bug 388 and Bug 912
-    echoClientHelper.SetAttribute ("StartTime", ns.core.TimeValue (ns.core.Seconds (0.001)))
-    pingApps.Add (echoClientHelper.Install(nodes.Get (0)))
-    echoClientHelper.SetAttribute ("StartTime", ns.core.TimeValue (ns.core.Seconds (0.006)))
-    pingApps.Add (echoClientHelper.Install (nodes.Get (2)))
+    for k, (sender, receiver) in enumerate (pairs):
+        echoClientHelper = ns.applications.UdpEchoClientHelper (interfaces.GetAddress (receiver), echoPort)
+        echoClientHelper.SetAttribute ("MaxPackets", ns.core.UintegerValue (1))
+        echoClientHelper.SetAttribute ("Interval", ns.core.TimeValue (ns.core.Seconds (0.1)))
+        echoClientHelper.SetAttribute ("PacketSize", ns.core.UintegerValue (10))
+        echoClientHelper.SetAttribute ("StartTime", ns.core.TimeValue (ns.core.Seconds (0.001 + 0.005 * k)))
+        pingApps.Add (echoClientHelper.Install (nodes.Get (sender)))
 
-    # 8. Install FlowMonitor on all nodes
-    flowmon = ns.flow_monitor.FlowMonitorHelper ()
-    monitor = flowmon.InstallAll ()
+    # 8. Install FlowMonitor on all nodes, or only on the sampled ones
+    sampler = None
+    if flowStats == "counters":
+        if delaySample > 0:
+            sampler = DelaySampler (nodes, pairs, delaySample, ns.core.RngSeedManager.GetRun ())
+    else:
+        flowmon = ns.flow_monitor.FlowMonitorHelper ()
+        monitor = flowmon.InstallAll ()
 
     # 9. Run simulation for 10 seconds
+    setupTime = time.time () - start
+    t = time.time ()
     ns.core.Simulator.Stop (ns.core.Seconds (10))
     ns.core.Simulator.Run ()
+    if timing:
+        print "Loss matrix: %d links in %.3f s; setup time: %.3f s; run time: %.3f s" % (
+            len (lossMatrix), lossTime, setupTime, time.time () - t)
+
+    if flowStats == "counters":
+        flowTable = counters.export (sampler.delays () if sampler is not None else None)
+        ns.core.Simulator.Destroy ()
+        if sink is not None:
+            flow_export.write (sink, flowTable, rtsCts=enableCtsRts)
+        if verbose:
+            for i in range (len (counters)):
+                print "FlowID %i (%s -> %s)" % (flowTable["flow"][i], ns.network.Ipv4Address (flowTable["src"][i]),
+                                                ns.network.Ipv4Address (flowTable["dst"][i]))
+                print "  Tx Packets: ", flowTable["txPackets"][i]
+                print "  Tx Bytes: ", int (flowTable["txBytes"][i])
+                print "  Rx Packets: ", flowTable["rxPackets"][i]
+                print "  Rx Bytes: ", int (flowTable["rxBytes"][i])
+                print "  Throughput: ", flowTable["throughput"][i], " Mbps"
+                if flowTable["delay"][i] == flowTable["delay"][i]: # not nan: sampled
+                    print "  Mean delay: ", flowTable["delay"][i] * 1000, " ms"
+        return [{"flow": f, "throughput": t} for f, t in zip (flowTable["flow"], flowTable["throughput"])]
 
     # 10. Print per flow statistics
-    monitor.CheckForLostPackets ()
-    classifier = ns.flow_monitor.Ipv4FlowClassifier ()
-    classifier = flowmon.GetClassifier ()
-    stats = monitor.GetFlowStats ()
-    for flow_id, flow_stats in monitor.GetFlowStats ():
-        # first 2 FlowIds are for ECHO apps, we don't want to display them
-
-        # Duration for throughput measurement is 9.0 seconds, since
-        # StartTime of the OnOffApplication is at about "second 1"
-        # and
-        # Simulator::Stops at "second 10".
-        t = classifier.FindFlow(flow_id)
-        if flow_id > 2:
-            print "FlowID %i (%s -> %s)" % \
-            (flow_id-2, t.sourceAddress, t.destinationAddress)
-            print >> sys.stdout, "  Tx Packets: ", flow_stats.txPackets
-            print >> sys.stdout, "  Tx Bytes: ", flow_stats.txBytes
-            print >> sys.stdout, "  TxOffered:  ", flow_stats.txBytes * 8.0 / 9.0 / 1000 / 1000  , " Mbps"
-            print >> sys.stdout, "  Rx Packets: ", flow_stats.rxPackets
-            print >> sys.stdout, "  Rx Bytes: ", flow_stats.rxBytes
-            print >> sys.stdout, "  Throughput: ", flow_stats.rxBytes * 8.0 / 9.0 / 1000 / 1000  , " Mbps"
+    # All flows are exported at once; the ECHO flows are left out and each CBR flow is numbered
+    # after its (sender, receiver) pair, found by its addresses and port, as FlowMonitor numbers
+    # the flows in the order their first packet was seen.  Throughput is measured from the first
+    # packet sent (at about "second 1") to the last one received (before Simulator::Stop at "second 10").
+    allFlows = flow_export.columns (monitor)
+    flowTable = flow_export.select (allFlows, [port == cbrPort for port in allFlows["dstPort"]])
+    pairFlows = dict (((interfaces.GetAddress (sender).Get (), interfaces.GetAddress (receiver).Get (), cbrPort), k + 1)
+                      for k, (sender, receiver) in enumerate (pairs))
+    flowTable["flow"] = array.array ("L", [pairFlows[key] for key in zip (flowTable["src"], flowTable["dst"],
+                                                                          flowTable["dstPort"])])
+    if sink is not None:
+        flow_export.write (sink, flowTable, rtsCts=enableCtsRts)
+    if verbose:
+        for i in range (len (flowTable["flow"])):
+            print "FlowID %i (%s -> %s)" % (flowTable["flow"][i], ns.network.Ipv4Address (flowTable["src"][i]),
+                                            ns.network.Ipv4Address (flowTable["dst"][i]))
+            print "  Tx Packets: ", flowTable["txPackets"][i]
+            print "  Tx Bytes: ", int (flowTable["txBytes"][i])
+            print "  TxOffered:  ", flowTable["offered"][i], " Mbps"
+            print "  Rx Packets: ", flowTable["rxPackets"][i]
+            print "  Rx Bytes: ", int (flowTable["rxBytes"][i])
+            print "  Throughput: ", flowTable["throughput"][i], " Mbps"
+    results = [{"flow": f, "throughput": t} for f, t in zip (flowTable["flow"], flowTable["throughput"])]
 
     # 11. Cleanup
     ns.core.Simulator.Destroy ()
+    return results
+
+# One replication of one experiment, run by the replication workers
+def run_point(point):
+    ns.core.RngSeedManager.SetRun (point["rngRun"])
+    if point["lossMatrix"]:
+        lossMatrix = loss_matrix.load (point["lossMatrix"])
+    else:
+        lossMatrix = loss_matrix.chain (point["nNodes"], 50)
+    results = experiment (point["enableCtsRts"], lossMatrix, False, point["flowStats"], point["delaySample"])
+    return {"throughput": sum (r["throughput"] for r in results)}
 
 def main(argv):
+    cmd = ns.core.CommandLine ()
+    cmd.nNodes = 3
+    cmd.lossMatrix = ""
+    cmd.replicate = "False"
+    cmd.minRuns = 5
+    cmd.maxRuns = 50
+    cmd.precision = 0.0 # Mbit/s
+    cmd.relPrecision = 0.1
+    cmd.jobs = 1
+    cmd.flowStats = "monitor"
+    cmd.delaySample = 0.0
+    cmd.output = ""
+    cmd.format = ""
+    cmd.timing = "False"
+    cmd.AddValue ("nNodes", "Number of nodes in the chain")
+    cmd.AddValue ("lossMatrix", "File of the propagation loss matrix (.npy, .npz or text), instead of a chain")
+    cmd.AddValue ("replicate", "Replicate both experiments until their difference is known")
+    cmd.AddValue ("minRuns", "Replications made before checking the confidence interval")
+    cmd.AddValue ("maxRuns", "Maximum number of replications")
+    cmd.AddValue ("precision", "Half width in Mbit/s of the confidence interval of the difference that is enough")
+    cmd.AddValue ("relPrecision", "Half width of the confidence interval relative to the difference that is enough")
+    cmd.AddValue ("jobs", "Number of worker processes running the replications (0: one per CPU)")
+    cmd.AddValue ("flowStats", "Flow statistics: monitor (FlowMonitor on every node) or counters")
+    cmd.AddValue ("delaySample", "Fraction of the senders whose delay is measured with --flowStats=counters")
+    cmd.AddValue ("output", "File the per-flow statistics are written to")
+    cmd.AddValue ("format", "Format of the output file: jsonl, csv or col (default: from the file extension)")
+    cmd.AddValue ("timing", "Print the loss matrix loading, setup and run times of each experiment")
+    cmd.Parse (argv)
+
+    flowStats = cmd.flowStats
+    delaySample = float (cmd.delaySample)
+    if flowStats not in ("monitor", "counters"):
+        print "Wrong flowStats value!"
+        return 1
+
+    if cmd.replicate == "True":
+        configs = [{"enableCtsRts": enable, "nNodes": int (cmd.nNodes), "lossMatrix": cmd.lossMatrix,
+                    "flowStats": flowStats, "delaySample": delaySample} for enable in (0, 1)]
+        summary = replicate (run_point, configs, "throughput", int (cmd.jobs), int (cmd.minRuns), int (cmd.maxRuns),
+                             float (cmd.precision), float (cmd.relPrecision))
+        for name, c in zip (("disabled", "enabled"), summary["configs"]):
+            print "Total throughput with RTS/CTS %s: %.3f +- %.3f Mbps" % (name, c["mean"], c["halfWidth"])
+        d = summary["differences"][0]
+        print "Difference (enabled - disabled): %.3f +- %.3f Mbps (95%% CI, %d paired runs)" % (d["mean"], d["halfWidth"], summary["runs"])
+        return 0
+
+    if cmd.lossMatrix:
+        lossMatrix = loss_matrix.load (cmd.lossMatrix)
+    else:
+        lossMatrix = loss_matrix.chain (int (cmd.nNodes), 50)
+
+    sink = open_sink (cmd.output, cmd.format) if cmd.output else None
     print "Hidden station experiment with RTS/CTS disabled:"
-    experiment (0)
+    experiment (0, lossMatrix, True, flowStats, delaySample, sink, cmd.timing == "True")
     print "------------------------------------------------"
     print "Hidden station experiment with RTS/CTS enabled:"
-    experiment (1)
+    experiment (1, lossMatrix, True, flowStats, delaySample, sink, cmd.timing == "True")
+    if sink is not None:
+        sink.close ()
 
 if __name__ == '__main__':
     import sys
@@ -30,71 +30,83 @@
 #  * We report the total throughput received during a window of 100ms. 
 #  * The user can specify the application data rate and choose the variant
 #  * of TCP i.e. congestion control algorithm to use.                 
+#  *
+#  * With --output=FILE every 100ms sample is also written as a record to FILE
+#  * (JSON lines, CSV or the columnar format of results_sink.py, chosen by
+#  * --format or the file extension); --table=False drops the printed lines.
+#  *
+#  * The received bytes are sampled every --sampleInterval seconds (100ms by
+#  * default) by ns-3 itself, with a probe on the Rx trace of the sink, and the
+#  * samples are read and written out in chunks after the run (see
+#  * throughput_sampler.py); --sampler=callback restores the original per-sample
+#  * Python callback (see sampler-benchmark.py).
+#  *
+#  * --matrix=True runs every combination of --tcpVariants, --phyRates,
+#  * --dataRates and --payloadSizes over --jobs worker processes and prints the
+#  * average throughput of each; with --output, the throughput samples of all
+#  * the points go to that one file, each tagged with its configuration.
 #  */
 
-import ns.applications
-import ns.core
-import ns.internet
-import ns.mobility 
-import ns.network
-import ns.point_to_point
-import ns.wifi
+from ns_lazy import ns
+from results_sink import TableSink, MultiSink, open_sink
+from throughput_sampler import ThroughputSampler
+from wifi_sweep import run_points
+import trace_output
+
+TCP_VARIANTS = ["TcpNewReno", "TcpHybla", "TcpHighSpeed", "TcpHtcp", "TcpVegas", "TcpScalable", "TcpVeno",
+                "TcpBic", "TcpYeah", "TcpIllinois", "TcpWestwood", "TcpWestwoodPlus"]
 
 
 sink = ns.applications.PacketSink ()                          
 #The value of the last total received bytes
 lastTotalRx = 0              
+#Where the throughput samples go
+results = MultiSink ([])
+#Sampling interval in seconds
+sampleInterval = 0.1
 
 def CalculateThroughput ():
   global lastTotalRx
   #Return the simulator's virtual time. 
   now = ns.core.Simulator.Now ()
   #Convert Application RX Packets to MBits.
-  cur = (sink.GetTotalRx () - lastTotalRx) * 8/1e5
-  print  str (now.GetSeconds ()) + "s: \t" + str (cur) + " Mbit/s"
+  cur = (sink.GetTotalRx () - lastTotalRx) * 8/(sampleInterval * 1e6)
+  results.write ({"time": now.GetSeconds (), "throughput": cur})
   lastTotalRx = sink.GetTotalRx ()
-  ns.core.Simulator.Schedule (ns.core.MilliSeconds (100), CalculateThroughput)
+  ns.core.Simulator.Schedule (ns.core.Seconds (sampleInterval), CalculateThroughput)
 
-def main(argv):
-  #Command line argument parser setup.
-  cmd = ns.core.CommandLine ()
-  #Transport layer payload size in bytes. 
-  cmd.payloadSize = 1472                       
-  #Application layer datarate.
-  cmd.dataRate = "100Mbps"                  
-  #TCP variant type. 
-  cmd.tcpVariant = "TcpNewReno"        
-  #Physical layer bitrate. 
-  cmd.phyRate = "HtMcs7"                    
-  #Simulation time in seconds. 
-  cmd.simulationTime = 10                      
-  #PCAP Tracing is enabled or not.
-  cmd.pcapTracing = "False"                          
+def WriteSamples (first, times, throughput):
+  for t, cur in zip (times, throughput):
+    results.write ({"time": t, "throughput": cur})
 
-  cmd.AddValue ("payloadSize", "Payload size in bytes")
-  cmd.AddValue ("dataRate", "Application data ate")
-  cmd.AddValue ("tcpVariant", "Transport protocol to use: TcpNewReno, "
-                "TcpHybla, TcpHighSpeed, TcpHtcp, TcpVegas, TcpScalable, TcpVeno, "
-                "TcpBic, TcpYeah, TcpIllinois, TcpWestwood, TcpWestwoodPlus ")
-  cmd.AddValue ("phyRate", "Physical layer bitrate")
-  cmd.AddValue ("simulationTime", "Simulation time in seconds")
-  cmd.AddValue ("pcap", "Enable/disable PCAP Tracing")
-  cmd.Parse (sys.argv)
+# Simulate one configuration of the scenario.  The throughput samples go to
+# onChunk (see throughput_sampler.py) if given, and are returned otherwise.
+def run_point (point, onChunk=None):
+  global sink, lastTotalRx, sampleInterval
+  lastTotalRx = 0
+  tcpVariant = point["tcpVariant"]
+  payloadSize = point["payloadSize"]
+  simulationTime = point["simulationTime"]
+  sampleInterval = point["sampleInterval"]
+  ns.core.RngSeedManager.SetRun (point["rngRun"])
 
   #No fragmentation and no RTS/CTS 
   ns.core.Config.SetDefault ("ns3::WifiRemoteStationManager::FragmentationThreshold", ns.core.StringValue ("999999"))
   ns.core.Config.SetDefault ("ns3::WifiRemoteStationManager::RtsCtsThreshold", ns.core.StringValue ("999999"))
   
-  if cmd.tcpVariant == "TcpWestwoodPlus":
+  if tcpVariant == "TcpWestwoodPlus":
     # TcpWestwoodPlus is not an actual TypeId name; we need TcpWestwood here
-    ns.core.Config.SetDefault ("ns3::TcpL4Protocol::SocketType", ns.core.TypeIdValue (ns.core.TcpWestwood.GetTypeId ()))
+    ns.core.Config.SetDefault ("ns3::TcpL4Protocol::SocketType", ns.core.TypeIdValue (ns.internet.TcpWestwood.GetTypeId ()))
     # the default protocol type in ns3::TcpWestwood is WESTWOOD
-    ns.core.Config.SetDefault ("ns3::TcpWestwood::ProtocolType", ns.core.EnumValue (ns.core.TcpWestwood.WESTWOODPLUS))
+    ns.core.Config.SetDefault ("ns3::TcpWestwood::ProtocolType", ns.core.EnumValue (ns.internet.TcpWestwood.WESTWOODPLUS))
   else:
-    ns.core.Config.SetDefault ("ns3::TcpL4Protocol::SocketType", ns.core.TypeIdValue (ns.core.TypeId.LookupByName ("ns3::" + cmd.tcpVariant)))
+    ns.core.Config.SetDefault ("ns3::TcpL4Protocol::SocketType", ns.core.TypeIdValue (ns.core.TypeId.LookupByName ("ns3::" + tcpVariant)))
+    if tcpVariant == "TcpWestwood":
+      # a previous point run in this process may have switched it to WESTWOODPLUS
+      ns.core.Config.SetDefault ("ns3::TcpWestwood::ProtocolType", ns.core.EnumValue (ns.internet.TcpWestwood.WESTWOOD))
   
   #Configure TCP Options 
-  ns.core.Config.SetDefault ("ns3::TcpSocket::SegmentSize", ns.core.UintegerValue (cmd.payloadSize))
+  ns.core.Config.SetDefault ("ns3::TcpSocket::SegmentSize", ns.core.UintegerValue (payloadSize))
 
   wifiMac = ns.wifi.WifiMacHelper ()
   wifiHelper = ns.wifi.WifiHelper ()
@@ -118,7 +130,7 @@ def main(argv):
   wifiPhy.Set ("EnergyDetectionThreshold", ns.core.DoubleValue (-79 + 3))
   wifiPhy.SetErrorRateModel ("ns3::YansErrorRateModel")
   wifiHelper.SetRemoteStationManager ("ns3::ConstantRateWifiManager",
-                                      "DataMode", ns.core.StringValue (cmd.phyRate),
+                                      "DataMode", ns.core.StringValue (point["phyRate"]),
                                       "ControlMode", ns.core.StringValue ("HtMcs0"))
 
   networkNodes = ns.network.NodeContainer ()
@@ -173,34 +185,174 @@ def main(argv):
 
   #Install TCP/UDP Transmitter on the station 
   server = ns.applications.OnOffHelper ("ns3::TcpSocketFactory", (ns.network.InetSocketAddress (apInterface.GetAddress (0), 9)))
-  server.SetAttribute ("PacketSize", ns.core.UintegerValue (cmd.payloadSize))
+  server.SetAttribute ("PacketSize", ns.core.UintegerValue (payloadSize))
   server.SetAttribute ("OnTime", ns.core.StringValue ("ns3::ConstantRandomVariable[Constant=1]"))
   server.SetAttribute ("OffTime", ns.core.StringValue ("ns3::ConstantRandomVariable[Constant=0]"))
-  server.SetAttribute ("DataRate", ns.network.DataRateValue (ns.network.DataRate (cmd.dataRate)))
+  server.SetAttribute ("DataRate", ns.network.DataRateValue (ns.network.DataRate (point["dataRate"])))
   serverApp = ns.network.ApplicationContainer (server.Install (staWifiNode))
 
   #Start Applications 
   sinkApp.Start (ns.core.Seconds (0.0))
   serverApp.Start (ns.core.Seconds (1.0))
-  ns.core.Simulator.Schedule (ns.core.Seconds (1.1), CalculateThroughput)
+  sampler = None
+  if point["sampler"] == "buffered":
+    rxPath = "/NodeList/%d/ApplicationList/%d/$ns3::PacketSink/Rx" % (apWifiNode.GetId (),
+                                                                       apWifiNode.GetNApplications () - 1)
+    sampler = ThroughputSampler (rxPath, sampleInterval, 1.0 + sampleInterval, simulationTime + 1,
+                                 chunkSize=1000 if onChunk else 0, onChunk=onChunk)
+    sampler.install ()
+  else:
+    ns.core.Simulator.Schedule (ns.core.Seconds (1.0 + sampleInterval), CalculateThroughput)
 
   #Enable Traces 
-  if cmd.pcapTracing:
+  pcap = None
+  if point["pcap"] is not None:
+      pcap = trace_output.TraceOutput (**point["pcap"])
       wifiPhy.SetPcapDataLinkType (ns.wifi.YansWifiPhyHelper.DLT_IEEE802_11_RADIO)
-      wifiPhy.EnablePcap ("AccessPoint", apDevice)
-      wifiPhy.EnablePcap ("Station", staDevices)
+      pcap.enable_all (wifiPhy, "AccessPoint", apDevice)
+      pcap.enable_all (wifiPhy, "Station", staDevices)
     
 
   #Start Simulation 
-  ns.core.Simulator.Stop (ns.core.Seconds (cmd.simulationTime + 1))
+  ns.core.Simulator.Stop (ns.core.Seconds (simulationTime + 1))
   ns.core.Simulator.Run ()
   ns.core.Simulator.Destroy ()
+  if pcap is not None:
+    pcap.close ()
+  if sampler is not None:
+    sampler.finish ()
+
+  result = {"averageThroughput": (sink.GetTotalRx () * 8) / (1e6  * simulationTime)}
+  if sampler is not None and onChunk is None:
+    result["time"] = list (sampler.times ())
+    result["throughput"] = list (sampler.throughput ())
+  return result
+
+# Run the whole matrix over worker processes.  Each point gets its own seed,
+# RngRun + the index of its (phyRate, dataRate, payloadSize) cell: the TCP
+# variants of a cell share it, so they are compared on the same random numbers.
+def run_matrix (cmd, simulationTime, sampleInterval, rngRun):
+  tcpVariants = TCP_VARIANTS if cmd.tcpVariants == "all" else cmd.tcpVariants.split (",")
+  phyRates = cmd.phyRates.split (",")
+  dataRates = (cmd.dataRates or cmd.dataRate).split (",")
+  payloadSizes = [int (size) for size in str (cmd.payloadSizes or cmd.payloadSize).split (",")]
+
+  points = []
+  for tcpVariant in tcpVariants:
+    cell = 0
+    for phyRate in phyRates:
+      for dataRate in dataRates:
+        for payloadSize in payloadSizes:
+          points.append ({"tcpVariant": tcpVariant, "phyRate": phyRate, "dataRate": dataRate,
+                          "payloadSize": payloadSize, "simulationTime": simulationTime,
+                          "sampleInterval": sampleInterval, "sampler": "buffered",
+                          "pcap": None, "rngRun": rngRun + cell})
+          cell += 1
+
+  table = MultiSink ([])
+  if cmd.table == "True":
+    table = TableSink ("%(tcpVariant)s \t%(phyRate)s \t%(dataRate)s \t%(payloadSize)s \t%(averageThroughput)s Mbit/s",
+                       "TCP variant \tPHY rate \tData rate \tPayload size \tAverage throughput")
+  output = MultiSink ([])
+  if cmd.output:
+    output = open_sink (cmd.output, cmd.format)
+
+  # One consolidated result set: a record per throughput sample of every point
+  for point, result in run_points (run_point, points, int (cmd.jobs)):
+    record = dict ((key, point[key]) for key in ("tcpVariant", "phyRate", "dataRate", "payloadSize", "rngRun"))
+    record["averageThroughput"] = result["averageThroughput"]
+    table.write (record)
+    for t, cur in zip (result.get ("time", []), result.get ("throughput", [])):
+      output.write (dict (record, time=t, throughput=cur))
+  table.close ()
+  output.close ()
+  return 0
+
+def main(argv):
+  global results
+  #Command line argument parser setup.
+  cmd = ns.core.CommandLine ()
+  #Transport layer payload size in bytes. 
+  cmd.payloadSize = 1472                       
+  #Application layer datarate.
+  cmd.dataRate = "100Mbps"                  
+  #TCP variant type. 
+  cmd.tcpVariant = "TcpNewReno"        
+  #Physical layer bitrate. 
+  cmd.phyRate = "HtMcs7"                    
+  #Simulation time in seconds. 
+  cmd.simulationTime = 10                      
+  #Output file of the throughput samples and its format.
+  cmd.output = ""
+  cmd.format = ""
+  #Print the throughput samples or not.
+  cmd.table = "True"
+  #Throughput sampling: buffered or callback, and its interval in seconds.
+  cmd.sampler = "buffered"
+  cmd.sampleInterval = 0.1
+  #Matrix mode: every combination of the comma separated lists below.
+  cmd.matrix = "False"
+  cmd.tcpVariants = "all"
+  cmd.phyRates = "HtMcs0,HtMcs1,HtMcs2,HtMcs3,HtMcs4,HtMcs5,HtMcs6,HtMcs7"
+  cmd.dataRates = ""
+  cmd.payloadSizes = ""
+  cmd.jobs = 0
+
+  cmd.AddValue ("payloadSize", "Payload size in bytes")
+  cmd.AddValue ("dataRate", "Application data ate")
+  cmd.AddValue ("tcpVariant", "Transport protocol to use: TcpNewReno, "
+                "TcpHybla, TcpHighSpeed, TcpHtcp, TcpVegas, TcpScalable, TcpVeno, "
+                "TcpBic, TcpYeah, TcpIllinois, TcpWestwood, TcpWestwoodPlus ")
+  cmd.AddValue ("phyRate", "Physical layer bitrate")
+  cmd.AddValue ("simulationTime", "Simulation time in seconds")
+  #PCAP tracing (off by default) and the volume of the traces.
+  trace_output.add_options (cmd)
+  cmd.AddValue ("output", "File the throughput samples are written to")
+  cmd.AddValue ("format", "Format of the output file: jsonl, csv or col (default: from the file extension)")
+  cmd.AddValue ("table", "Print the throughput samples")
+  cmd.AddValue ("sampler", "Throughput sampling: buffered or callback (one Python callback per sample)")
+  cmd.AddValue ("sampleInterval", "Throughput sampling interval in seconds")
+  cmd.AddValue ("matrix", "Run every combination of tcpVariants, phyRates, dataRates and payloadSizes")
+  cmd.AddValue ("tcpVariants", "Comma separated TCP variants of the matrix (all: every variant)")
+  cmd.AddValue ("phyRates", "Comma separated physical layer bitrates of the matrix")
+  cmd.AddValue ("dataRates", "Comma separated application data rates of the matrix (default: dataRate)")
+  cmd.AddValue ("payloadSizes", "Comma separated payload sizes of the matrix (default: payloadSize)")
+  cmd.AddValue ("jobs", "Number of worker processes running the matrix (0: one per CPU)")
+  cmd.Parse (argv)
+
+  payloadSize = int (cmd.payloadSize)
+  simulationTime = float (cmd.simulationTime)
+  sampleInterval = float (cmd.sampleInterval)
+
+  if cmd.sampler not in ("buffered", "callback"):
+    print "Wrong sampler value!"
+    return 1
+
+  rngRun = ns.core.UintegerValue ()
+  ns.core.GlobalValue.GetValueByName ("RngRun", rngRun)
+
+  if cmd.matrix == "True":
+    return run_matrix (cmd, simulationTime, sampleInterval, rngRun.Get ())
+
+  sinks = []
+  if cmd.table == "True":
+    sinks.append (TableSink ("%(time)ss: \t%(throughput)s Mbit/s"))
+  if cmd.output:
+    sinks.append (open_sink (cmd.output, cmd.format))
+  results = MultiSink (sinks)
+
+  result = run_point ({"tcpVariant": cmd.tcpVariant, "phyRate": cmd.phyRate, "dataRate": cmd.dataRate,
+                       "payloadSize": payloadSize, "simulationTime": simulationTime,
+                       "sampleInterval": sampleInterval, "sampler": cmd.sampler,
+                       "pcap": trace_output.options (cmd), "rngRun": rngRun.Get ()}, WriteSamples)
+  results.close ()
+
+  averageThroughput = result["averageThroughput"]
 
-  averageThroughput = ((sink.GetTotalRx () * 8) / (1e6  * cmd.simulationTime))
   if averageThroughput < 50:  
       print "Obtained throughput is not in the expected boundaries!"
-      exit (1)
-  print "Average throughput: " + averageThroughput + " Mbit/s"
+      return 1
+  print "Average throughput: " + str (averageThroughput) + " Mbit/s"
   return 0
 
 if __name__ == '__main__':
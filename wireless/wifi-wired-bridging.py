@@ -46,121 +46,236 @@
 //               +---------+              +---------+
 # //
 """
-import ns.core 
-import ns.mobility
-import ns.applications
-import ns.wifi
-import ns.network
-import ns.csma
-import ns.internet
-import ns.bridge
-import ns.visualizer
+# The ns-3 visualizer (and the GTK stack behind it) is only loaded with --visualize=True.
+#
+# The topology is built in bulk (build_topology): all nodes are created, get their internet stack and
+# addresses in single calls, the APs are placed by one ListPositionAllocator and the CSMA backbone is one
+# install.  What is left per BSS is what really differs between BSSs: its channel and SSID (one AP and one
+# STA wifi install), its bridge and the bounds of the random walk of its stations.  With more than 254
+# hosts the addresses come from a /16 (or /8) instead of 192.168.0.0/24.  --timing=True prints the setup
+# time apart from the run time, --buildOnly=True stops after the setup; see bridging-benchmark.py.
+#
+# --writeMobility=True writes the course changes of the stations as fixed-width binary records with an index by
+# node (wifi-wired-bridging.mob and .mob.idx, see mobility_trace.py), keeping at most one course change per
+# node every --mobilityInterval seconds; --mobilityFormat=text writes the ns-3 text trace instead.
+#
+# --distributed=True runs the BSSs on several ranks with the distributed simulator, e.g.
+#
+#   mpirun -np 4 python wifi-wired-bridging.py --distributed=True --nWifis=64 --nStas=20 --timing=True
+#
+# Every rank builds the whole topology; BSS i (its AP and stations) runs on rank i * ranks / nWifis and the
+# backbone hub on rank 0.  Each rank only installs and traces what runs on it: the OnOff source on the rank of
+# BSS 0, the pcap of the AP of BSS 0 and 1 on their ranks, and the course changes of its own BSSs in
+# wifi-wired-bridging-<rank>.mob.  A CSMA segment cannot span ranks, so a distributed run uses --backbone=p2p:
+# each AP has a point-to-point link (--backboneRate, --backboneDelay, which is also the lookahead between
+# ranks) to the hub.  Point-to-point devices cannot be bridged, so with p2p the BSSs are routed instead of
+# bridged: BSS i is the i-th /24 of 10.0.0.0/8 (its AP routing for its stations), every link a /30 of
+# 172.16.0.0 and the hub routes between them, which also means raw packets (--SendIp=False) cannot cross the
+# backbone.  Running --backbone=p2p without --distributed gives the one-rank reference for the speedup, see
+# bridging-benchmark.py --ranks.
+
+import time
+
+import ns_lazy
+from ns_lazy import ns
+import trace_output
+import mobility_trace
+
+# Network and mask giving an address to each of hosts nodes
+def address_base (hosts):
+  if hosts <= 254:
+    return "192.168.0.0", "255.255.255.0"
+  if hosts <= 65534:
+    return "192.168.0.0", "255.255.0.0"
+  return "10.0.0.0", "255.0.0.0"
+
+# Index in the interfaces of build_topology of station j of BSS i (j = -1: its AP)
+def interface_index (i, j, nStas):
+  return i * (nStas + 1) + 1 + j
+
+# Rank of every BSS: contiguous blocks of BSSs per rank
+def partition (nWifis, ranks):
+  return [i * ranks // nWifis for i in range (nWifis)]
+
+# Whether BSS i runs on this rank
+def is_local (i, systemIds, rank):
+  return systemIds is None or systemIds[i] == rank
+
+# Create the backbone and nWifis BSSs of nStas stations each, the nodes of BSS i on systemIds[i] if given.
+# Returns (backboneNodes, staNodes, apDevices, staDevices, interfaces): staNodes, apDevices and staDevices
+# are lists with one container per BSS, interfaces holds every address, BSS by BSS: the AP (its bridge
+# on a CSMA backbone, its wifi device on a p2p one), then its stations.
+def build_topology (nWifis, nStas, wifiPhy, backbone="csma", systemIds=None,
+                    backboneRate="100Mbps", backboneDelay="1ms"):
+  backboneNodes = ns.network.NodeContainer ()
+  if systemIds is None:
+    backboneNodes.Create (nWifis)
+  else:
+    for i in range (nWifis):
+      backboneNodes.Create (1, systemIds[i])
+  allStas = ns.network.NodeContainer ()
+  staNodes = []
+  for i in range (nWifis):
+    sta = ns.network.NodeContainer ()
+    if systemIds is None:
+      sta.Create (nStas)
+    else:
+      sta.Create (nStas, systemIds[i])
+    allStas.Add (sta)
+    staNodes.append (sta)
+
+  stack = ns.internet.InternetStackHelper ()
+  stack.Install (backboneNodes)
+  stack.Install (allStas)
+
+  if backbone == "csma":
+    csma = ns.csma.CsmaHelper ()
+    backboneDevices = csma.Install (backboneNodes)
+  else:
+    hub = ns.network.NodeContainer ()
+    hub.Create (1, 0)
+    stack.Install (hub)
+    p2p = ns.point_to_point.PointToPointHelper ()
+    p2p.SetDeviceAttribute ("DataRate", ns.core.StringValue (backboneRate))
+    p2p.SetChannelAttribute ("Delay", ns.core.StringValue (backboneDelay))
+    links = ns.internet.Ipv4AddressHelper ()
+    links.SetBase (ns.network.Ipv4Address ("172.16.0.0"), ns.network.Ipv4Mask ("255.255.255.252"))
+    for i in range (nWifis):
+      links.Assign (p2p.Install (hub.Get (0), backboneNodes.Get (i)))
+      links.NewNetwork ()
+    subnets = ns.internet.Ipv4AddressHelper ()
+    subnets.SetBase (ns.network.Ipv4Address ("10.0.0.0"), ns.network.Ipv4Mask ("255.255.255.0"))
+    interfaces = ns.internet.Ipv4InterfaceContainer ()
+
+  # Same places as the grid of the original loop: AP i at (20 i, 0), its stations above it every 5 m
+  apPositions = ns.mobility.ListPositionAllocator ()
+  staPositions = ns.mobility.ListPositionAllocator ()
+  for i in range (nWifis):
+    apPositions.Add (ns.core.Vector3D (20.0 * i, 0.0, 0.0))
+    for j in range (nStas):
+      staPositions.Add (ns.core.Vector3D (20.0 * i, 5.0 * (j + 1), 0.0))
+  mobility = ns.mobility.MobilityHelper ()
+  mobility.SetPositionAllocator (apPositions)
+  mobility.SetMobilityModel ("ns3::ConstantPositionMobilityModel")
+  mobility.Install (backboneNodes)
+  mobility.SetPositionAllocator (staPositions)
+
+  wifi = ns.wifi.WifiHelper ()
+  wifiMac = ns.wifi.WifiMacHelper ()
+  wifiChannel = ns.wifi.YansWifiChannelHelper.Default ()
+  bridge = ns.bridge.BridgeHelper ()
+  apDevices = []
+  staDevices = []
+  addressed = ns.network.NetDeviceContainer ()
+  for i in range (nWifis):
+    ssid = ns.wifi.Ssid ("wifi-default-" + str (i))
+    wifiPhy.SetChannel (wifiChannel.Create ())
+    wifiX = 20.0 * i
+
+    wifiMac.SetType ("ns3::ApWifiMac",
+                     "Ssid", ns.wifi.SsidValue (ssid))
+    apDev = wifi.Install (wifiPhy, wifiMac, backboneNodes.Get (i))
+
+    mobility.SetMobilityModel ("ns3::RandomWalk2dMobilityModel",
+                               "Mode", ns.core.StringValue ("Time"),
+                               "Time", ns.core.StringValue ("2s"),
+                               "Speed", ns.core.StringValue ("ns3::ConstantRandomVariable[Constant=1.0]"),
+                               "Bounds", ns.core.RectangleValue (ns.core.Rectangle (wifiX, wifiX+5.0,0.0, (nStas+1)*5.0)))
+    mobility.Install (staNodes[i])
+    wifiMac.SetType ("ns3::StaWifiMac",
+                     "Ssid", ns.wifi.SsidValue (ssid))
+    staDev = wifi.Install (wifiPhy, wifiMac, staNodes[i])
+
+    apDevices.append (apDev)
+    staDevices.append (staDev)
+    if backbone != "csma":
+      interfaces.Add (subnets.Assign (ns.network.NetDeviceContainer (apDev, staDev)))
+      subnets.NewNetwork ()
+      continue
+
+    #assign AP IP address to bridge, not wifi
+    bridgeDev = bridge.Install (backboneNodes.Get (i), ns.network.NetDeviceContainer (apDev, backboneDevices.Get (i)))
+    addressed.Add (bridgeDev)
+    addressed.Add (staDev)
+
+  if backbone != "csma":
+    ns.internet.Ipv4GlobalRoutingHelper.PopulateRoutingTables ()
+    return backboneNodes, staNodes, apDevices, staDevices, interfaces
+  network, mask = address_base (nWifis * (nStas + 1))
+  ip = ns.internet.Ipv4AddressHelper ()
+  ip.SetBase (ns.network.Ipv4Address (network), ns.network.Ipv4Mask (mask))
+  interfaces = ip.Assign (addressed)
+  return backboneNodes, staNodes, apDevices, staDevices, interfaces
 
 def main (argv):
   cmd = ns.core.CommandLine ()
   cmd.nWifis = 2
   cmd.nStas = 2
-  cmd.sendIp = True
-  cmd.writeMobility = False
+  cmd.SendIp = "True"
+  cmd.writeMobility = "False"
+  cmd.visualize = "False"
+  cmd.timing = "False"
+  cmd.buildOnly = "False"
+  cmd.mobilityFormat = "binary"
+  cmd.mobilityInterval = 0.0
+  cmd.distributed = "False"
+  cmd.backbone = "csma"
+  cmd.backboneRate = "100Mbps"
+  cmd.backboneDelay = "1ms"
   cmd.AddValue ("nWifis", "Number of wifi networks")
   cmd.AddValue ("nStas", "Number of stations per wifi network")
   cmd.AddValue ("SendIp", "Send Ipv4 or raw packets")
   cmd.AddValue ("writeMobility", "Write mobility trace")
+  cmd.AddValue ("mobilityFormat", "Format of the mobility trace: binary or text")
+  cmd.AddValue ("mobilityInterval", "Minimum time in seconds between two course changes of a node in the binary mobility trace")
+  cmd.AddValue ("visualize", "Run the simulation in the ns-3 visualizer")
+  cmd.AddValue ("timing", "Print the setup and run times")
+  cmd.AddValue ("distributed", "Run the BSSs on the MPI ranks with the distributed simulator (implies --backbone=p2p)")
+  cmd.AddValue ("backbone", "Backbone: csma (bridged) or p2p (routed, point-to-point links to a hub)")
+  cmd.AddValue ("backboneRate", "Data rate of the p2p backbone links")
+  cmd.AddValue ("backboneDelay", "Delay of the p2p backbone links")
+  cmd.AddValue ("buildOnly", "Stop once the topology is built")
+  trace_output.add_options (cmd)
   cmd.Parse (sys.argv)
 
-  nWifis = cmd.nWifis
-  nStas = cmd.nStas
-  sendIp = cmd.sendIp
-  writeMobility = cmd.writeMobility
+  if cmd.visualize == "True":
+      ns_lazy.load ("visualizer")
+      ns.core.GlobalValue.Bind ("SimulatorImplementationType", ns.core.StringValue ("ns3::VisualSimulatorImpl"))
 
-  backboneNodes = ns.network.NodeContainer ()
-  backboneDevices = ns.network.NetDeviceContainer ()
-  backboneInterfaces = ns.internet.Ipv4InterfaceContainer ()
-  
-  staNodes = ns.network.NodeContainer ()
-  staDevices = ns.network.NetDeviceContainer ()
-  apDevices = ns.network.NetDeviceContainer ()
-  staInterfaces = ns.internet.Ipv4InterfaceContainer ()
-  apInterfaces = ns.internet.Ipv4InterfaceContainer ()
+  nWifis = int (cmd.nWifis)
+  nStas = int (cmd.nStas)
+  sendIp = str (cmd.SendIp) == "True"
+  writeMobility = str (cmd.writeMobility) == "True"
+  if nWifis < 2 or nStas < 2:
+      print "Wrong nWifis or nStas value!"
+      return 1
+  if cmd.mobilityFormat not in ("binary", "text"):
+      print "Wrong mobilityFormat value!"
+      return 1
+  backbone = "p2p" if cmd.distributed == "True" else cmd.backbone
+  if backbone not in ("csma", "p2p") or (backbone == "p2p" and not sendIp):
+      print "Wrong backbone value!"
+      return 1
 
-  stack = ns.internet.InternetStackHelper ()
-  csma = ns.csma.CsmaHelper ()
-  ip = ns.internet.Ipv4AddressHelper ()
-  ip.SetBase (ns.network.Ipv4Address ("192.168.0.0"), ns.network.Ipv4Mask ("255.255.255.0"))
-
-  backboneNodes.Create (cmd.nWifis)
-  stack.Install (backboneNodes)
-
-  backboneDevices = csma.Install (backboneNodes)
-
-  wifiX = 0.0
+  rank = 0
+  ranks = 1
+  systemIds = None
+  if cmd.distributed == "True":
+      ns.core.GlobalValue.Bind ("SimulatorImplementationType", ns.core.StringValue ("ns3::DistributedSimulatorImpl"))
+      ns.mpi.MpiInterface.Enable (argv)
+      rank = ns.mpi.MpiInterface.GetSystemId ()
+      ranks = ns.mpi.MpiInterface.GetSize ()
+      systemIds = partition (nWifis, ranks)
 
+  setupStart = time.time ()
   wifiPhy = ns.wifi.YansWifiPhyHelper.Default ()
   wifiPhy.SetPcapDataLinkType (ns.wifi.YansWifiPhyHelper.DLT_IEEE802_11_RADIO) 
-
-  for i in range (0,cmd.nWifis):
-      #calculate ssid for wifi subnetwork
-      ssid = ns.wifi.Ssid ("wifi-default-" + str (i))
-
-      sta = ns.network.NodeContainer ()
-      staDev = ns.network.NetDeviceContainer ()
-      apDev = ns.network.NetDeviceContainer ()
-      staInterface = ns.internet.Ipv4InterfaceContainer ()
-      apInterface = ns.internet.Ipv4InterfaceContainer ()
-      mobility = ns.mobility.MobilityHelper ()
-      bridge = ns.bridge.BridgeHelper ()
-      wifi = ns.wifi.WifiHelper ()
-      wifiMac = ns.wifi.WifiMacHelper ()
-      wifiChannel = ns.wifi.YansWifiChannelHelper.Default ()
-      wifiPhy.SetChannel (wifiChannel.Create ())
-
-      sta.Create (cmd.nStas)
-      mobility.SetPositionAllocator ("ns3::GridPositionAllocator",
-                                     "MinX", ns.core.DoubleValue (wifiX),
-                                     "MinY", ns.core.DoubleValue (0.0),
-                                     "DeltaX", ns.core.DoubleValue (5.0),
-                                     "DeltaY", ns.core.DoubleValue (5.0),
-                                     "GridWidth", ns.core.UintegerValue (1),
-                                     "LayoutType", ns.core.StringValue ("RowFirst"))
-
-      #setup the AP.
-      mobility.SetMobilityModel ("ns3::ConstantPositionMobilityModel")
-      mobility.Install (backboneNodes.Get (i))
-      wifiMac.SetType ("ns3::ApWifiMac",
-                       "Ssid", ns.wifi.SsidValue (ssid))
-      apDev = wifi.Install (wifiPhy, wifiMac, backboneNodes.Get (i))
-
-      bridgeDev = ns.network.NetDeviceContainer ()
-      bridgeDev = bridge.Install (backboneNodes.Get (i), ns.network.NetDeviceContainer (apDev, backboneDevices.Get (i)))
-
-      #assign AP IP address to bridge, not wifi
-      apInterface = ip.Assign (bridgeDev)
-
-      #setup the STAs
-      stack.Install (sta)
-      mobility.SetMobilityModel ("ns3::RandomWalk2dMobilityModel",
-                                 "Mode", ns.core.StringValue ("Time"),
-                                 "Time", ns.core.StringValue ("2s"),
-                                 "Speed", ns.core.StringValue ("ns3::ConstantRandomVariable[Constant=1.0]"),
-                                 "Bounds", ns.core.RectangleValue (ns.core.Rectangle (wifiX, wifiX+5.0,0.0, (cmd.nStas+1)*5.0)))
-      mobility.Install (sta);
-      wifiMac.SetType ("ns3::StaWifiMac",
-                       "Ssid", ns.wifi.SsidValue (ssid))
-      staDev = wifi.Install (wifiPhy, wifiMac, sta)
-      staInterface = ip.Assign (staDev)
-
-      #save everything in containers.
-      staNodes.push_back (sta)
-      apDevices.push_back (apDev)
-      apInterfaces.push_back (apInterface)
-      staDevices.push_back (staDev)
-      staInterfaces.push_back (staInterface)
-
-      wifiX = wifiX + 20.0
+  backboneNodes, staNodes, apDevices, staDevices, interfaces = build_topology (nWifis, nStas, wifiPhy, backbone, systemIds,
+                                                                               cmd.backboneRate, cmd.backboneDelay)
 
   dest = ns.network.Address ()
-  if cmd.sendIp:
-      dest = ns.network.InetSocketAddress (staInterfaces(1).GetAddress (1), 1025)
+  if sendIp:
+      dest = ns.network.InetSocketAddress (interfaces.GetAddress (interface_index (1, 1, nStas)), 1025)
       protocol = "ns3::UdpSocketFactory"
   else:
       tmp = ns.network.PacketSocketAddress ()
@@ -171,22 +286,57 @@ def main (argv):
       protocol = "ns3::PacketSocketFactory"
 
   onoff = ns.applications.OnOffHelper (protocol, dest)
-  onoff.SetConstantRate (ns.core.DataRateValue (ns.core.DataRate ("500kb/s")))
-  apps = ns.applications.ApplicationContainer (onoff.Install (staNodes[0].Get (0)))
-  apps.Start (ns.core.Seconds (0.5))
-  apps.Stop (ns.core.Seconds (3.0))
+  onoff.SetConstantRate (ns.network.DataRate ("500kb/s"))
+  if is_local (0, systemIds, rank):
+      apps = ns.network.ApplicationContainer (onoff.Install (staNodes[0].Get (0)))
+      apps.Start (ns.core.Seconds (0.5))
+      apps.Stop (ns.core.Seconds (3.0))
 
-  wifiPhy.EnablePcap ("wifi-wired-bridging", apDevices[0])
-  wifiPhy.EnablePcap ("wifi-wired-bridging", apDevices[1])
+  pcap = trace_output.from_command_line (cmd)
+  if pcap is not None:
+    for i in (0, 1):
+      if is_local (i, systemIds, rank):
+        pcap.enable_all (wifiPhy, "wifi-wired-bridging", apDevices[i])
 
-  if cmd.writeMobility:
+  mobilityTrace = None
+  if writeMobility:
+      name = "wifi-wired-bridging-%d.mob" % rank if ranks > 1 else "wifi-wired-bridging.mob"
+      localNodes = ns.network.NodeContainer ()
+      for i in range (nWifis):
+        if is_local (i, systemIds, rank):
+          localNodes.Add (backboneNodes.Get (i))
+          localNodes.Add (staNodes[i])
+  if writeMobility and cmd.mobilityFormat == "text":
       ascii = ns.network.AsciiTraceHelper ()
-      ns.mobility.MobilityHelper.EnableAsciiAll (ascii.CreateFileStream ("wifi-wired-bridging.mob"))
+      ns.mobility.MobilityHelper.EnableAscii (ascii.CreateFileStream (name), localNodes)
+  elif writeMobility:
+      mobilityTrace = mobility_trace.MobilityRecorder (name, float (cmd.mobilityInterval))
+      mobilityTrace.install (localNodes)
+  setupTime = time.time () - setupStart
+  if cmd.timing == "True" and rank == 0:
+      print "Setup time: %.3f s (%d APs, %d stations)" % (setupTime, nWifis, nWifis * nStas)
+  if cmd.buildOnly == "True":
+      ns.core.Simulator.Destroy ()
+      if cmd.distributed == "True":
+          ns.mpi.MpiInterface.Disable ()
+      if mobilityTrace is not None:
+          mobilityTrace.close ()
+      return 0
   
+  runStart = time.time ()
   ns.core.Simulator.Stop (ns.core.Seconds (5.0))
   ns.core.Simulator.Run ()
   ns.core.Simulator.Destroy ()
+  if cmd.distributed == "True":
+      ns.mpi.MpiInterface.Disable ()
+  if cmd.timing == "True" and rank == 0:
+      print "Run time: %.3f s (%d ranks)" % (time.time () - runStart, ranks)
+  if mobilityTrace is not None:
+      mobilityTrace.close ()
+  if pcap is not None:
+    pcap.close ()
+  return 0
 
 if __name__ == '__main__':
   import sys
-  main(sys.argv)
+  sys.exit (main (sys.argv))
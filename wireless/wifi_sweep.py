@@ -0,0 +1,92 @@
+# -*-  Mode: Python; -*-
+# /*
+#  * Copyright (c) 2016
+#  *
+#  * This program is free software; you can redistribute it and/or modify
+#  * it under the terms of the GNU General Public License version 2 as
+#  * published by the Free Software Foundation;
+#  *
+#  * This program is distributed in the hope that it will be useful,
+#  * but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  * GNU General Public License for more details.
+#  *
+#  * You should have received a copy of the GNU General Public License
+#  * along with this program; if not, write to the Free Software
+#  * Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#  */
+
+# Helpers shared by the sweep examples (ht-wifi-network.py, vht-wifi-network.py).
+#
+# A sweep is a list of points, each point being a plain dict holding the full
+# configuration of one simulation run.  The ns-3 Simulator is a process-global
+# singleton and Config::SetDefault values stick for the lifetime of the process,
+# so points can only run side by side in separate processes.  run_points () hands
+# every point to a fresh worker process and gives the results back in grid order,
+# optionally skipping the points already held in a result_cache.ResultCache.
+
+import multiprocessing
+
+
+def run_points (func, points, jobs=1, cache=None, order=None):
+    """Yield (point, func (point)) for every point, in the order of points.
+
+    With jobs == 1 the points run one after the other in this process, exactly
+    like the original nested loops did.  With jobs > 1 (or jobs == 0, meaning one
+    worker per CPU) every point runs in its own worker process, which is thrown
+    away afterwards so no simulator or Config state leaks into the next point.
+    func must be a module-level function so it can be handed to the workers.
+
+    If a result_cache.ResultCache is given, points found in it are not simulated
+    again and freshly simulated points are stored in it.
+
+    order, a list of indices into points, sets the order in which the points are
+    handed to the workers (e.g. longest first); points not listed go last.  The
+    results are still yielded in the order of points.
+    """
+    points = list (points)
+    cached = [None] * len (points)
+    if cache is not None:
+        cached = [cache.get (point) for point in points]
+    missing = [i for i, result in enumerate (cached) if result is None]
+    if order is not None:
+        rank = dict ((index, n) for n, index in enumerate (order))
+        missing.sort (key=lambda i: rank.get (i, len (rank)))
+
+    results = _simulate (func, [points[i] for i in missing], jobs)
+    pending = iter (missing)
+    done = {}
+    try:
+        for i, point in enumerate (points):
+            result = cached[i]
+            if result is None:
+                # Results come back in dispatch order: hold on to the ones ahead
+                while i not in done:
+                    done[next (pending)] = next (results)
+                result = done.pop (i)
+                if cache is not None:
+                    cache.put (point, result)
+            yield point, result
+    finally:
+        results.close ()
+
+
+def _simulate (func, points, jobs):
+    if jobs == 0:
+        jobs = multiprocessing.cpu_count ()
+    jobs = min (jobs, len (points))
+    if jobs <= 1:
+        for point in points:
+            yield func (point)
+        return
+
+    pool = multiprocessing.Pool (jobs, maxtasksperchild=1)
+    try:
+        for result in pool.imap (func, points, 1):
+            yield result
+        pool.close ()
+    except:
+        pool.terminate ()
+        raise
+    finally:
+        pool.join ()